@@ -1,30 +1,38 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import subprocess
+import importlib.util
 import time
 import threading
+import logging
+from logging.handlers import RotatingFileHandler
+import bisect
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-# Функция для установки библиотек
-def install_packages():
-    required_packages = ['pyqt5', 'keyboard', 'mouse']
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            print(f"Устанавливаю {package}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+# Модуль -> пакет pip
+REQUIRED_PACKAGES = {'PyQt5': 'pyqt5', 'keyboard': 'keyboard', 'mouse': 'mouse'}
+
+def check_dependencies():
+    """Проверяет зависимости без импорта (find_spec) и ничего не устанавливает"""
+    missing = [package for module, package in REQUIRED_PACKAGES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"Не установлены пакеты: {', '.join(missing)}")
+        print(f"Установите их: {sys.executable} -m pip install {' '.join(missing)}")
+        sys.exit(1)
 
-# Устанавливаем необходимые библиотеки
-install_packages()
+check_dependencies()
 
 # Теперь импортируем библиотеки
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                             QTextEdit, QCheckBox, QGroupBox, QMessageBox,
-                             QSpinBox, QDoubleSpinBox, QComboBox)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QPalette, QColor
+                             QCheckBox, QGroupBox, QMessageBox,
+                             QSpinBox, QDoubleSpinBox, QComboBox,
+                             QAbstractScrollArea, QToolTip)
+from PyQt5.QtCore import Qt, QEvent, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter, QPalette, QColor
 import keyboard
 import mouse
 
@@ -33,6 +41,214 @@ if os.name == 'nt':
     import ctypes
     ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
 
+# Лог действий: емкость в записях и файл для долгой истории (ротация по размеру)
+LOG_CAPACITY = 5000
+LOG_FILE = Path("logs") / "autoclicker.log"
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+class LogBuffer:
+    """
+    Кольцевой буфер записей лога фиксированной емкости.
+    
+    Запись с номером seq лежит в заранее выделенном списке по индексу
+    seq % capacity, новые записи затирают самые старые, поэтому память и
+    время добавления не растут за сессию.
+    """
+    
+    def __init__(self, capacity: int = LOG_CAPACITY):
+        self.capacity = capacity
+        # (уровень, время создания, сообщение)
+        self.records: List[Optional[Tuple[int, float, str]]] = [None] * capacity
+        self.first = 0  # seq самой старой хранимой записи
+        self.total = 0  # seq следующей записи
+        self.min_level = logging.NOTSET
+        # Номера seq записей, прошедших фильтр по уровню; None - видны все
+        self.rows: Optional[List[int]] = None
+    
+    def __len__(self) -> int:
+        """Число видимых строк"""
+        return self.total - self.first if self.rows is None else len(self.rows)
+    
+    def line(self, row: int) -> Tuple[int, str]:
+        """Уровень и текст видимой строки"""
+        seq = self.first + row if self.rows is None else self.rows[row]
+        level, created, message = self.records[seq % self.capacity]
+        return level, f"[{time.strftime('%H:%M:%S', time.localtime(created))}] {message}"
+    
+    def extend(self, records: List[Tuple[int, float, str]]) -> int:
+        """
+        Добавляет пачку записей, вытесняя самые старые
+        
+        Returns:
+            int: Сколько видимых строк ушло из начала
+        """
+        first = max(self.first, self.total + len(records) - self.capacity)
+        if self.rows is None:
+            dropped = min(first, self.total) - self.first
+        else:
+            dropped = bisect.bisect_left(self.rows, first)
+            del self.rows[:dropped]
+        # Пачка больше буфера: ее начало сразу вытеснилось бы
+        skip = max(0, first - self.total)
+        seq = self.total + skip
+        for s, record in enumerate(records[skip:], seq):
+            self.records[s % self.capacity] = record
+            if self.rows is not None and record[0] >= self.min_level:
+                self.rows.append(s)
+        self.first = first
+        self.total = seq + len(records) - skip
+        return dropped
+    
+    def set_min_level(self, level: int) -> None:
+        """Показывает только записи не ниже level (logging.NOTSET - все)"""
+        self.min_level = level
+        if level <= logging.NOTSET:
+            self.rows = None
+        else:
+            self.rows = [seq for seq in range(self.first, self.total)
+                         if self.records[seq % self.capacity][0] >= level]
+
+class LogView(QAbstractScrollArea):
+    """
+    Просмотр LogBuffer: рисуются только строки, попавшие в окно.
+    
+    Полоса прокрутки считает в строках, поэтому добавление пачки не
+    перестраивает разметку всего лога, а перерисовка не зависит от его длины.
+    """
+    
+    LEVEL_COLORS = {logging.WARNING: QColor("#FFA726"), logging.ERROR: QColor("#ef5350")}
+    MARGIN = 4
+    
+    def __init__(self, buffer: LogBuffer, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.verticalScrollBar().setSingleStep(1)
+    
+    def refresh(self, dropped: int = 0) -> None:
+        """
+        Буфер изменился: у нижнего края держимся за последней строкой,
+        иначе остаемся на тех же строках, несмотря на вытеснение
+        """
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        value = scrollbar.value() - dropped
+        self.update_scroll_range()
+        scrollbar.setValue(scrollbar.maximum() if at_bottom else value)
+        self.viewport().update()
+    
+    def update_scroll_range(self) -> None:
+        page = max(1, self.viewport().height() // self.fontMetrics().height())
+        scrollbar = self.verticalScrollBar()
+        scrollbar.setPageStep(page)
+        scrollbar.setRange(0, max(0, len(self.buffer) - page))
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.refresh()
+    
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setFont(self.font())
+        metrics = self.fontMetrics()
+        height = metrics.height()
+        width = self.viewport().width() - 2 * self.MARGIN
+        color = self.palette().color(QPalette.Text)
+        first = self.verticalScrollBar().value()
+        visible = min(len(self.buffer) - first, self.viewport().height() // height + 1)
+        for i in range(visible):
+            level, text = self.buffer.line(first + i)
+            painter.setPen(self.LEVEL_COLORS.get(level, color))
+            painter.drawText(self.MARGIN, i * height + metrics.ascent(),
+                             metrics.elidedText(text, Qt.ElideRight, width))
+    
+    def viewportEvent(self, event):
+        # Обрезанная строка целиком - во всплывающей подсказке
+        if event.type() == QEvent.ToolTip:
+            row = self.verticalScrollBar().value() + event.pos().y() // self.fontMetrics().height()
+            if row < len(self.buffer):
+                QToolTip.showText(event.globalPos(), self.buffer.line(row)[1], self.viewport())
+            else:
+                QToolTip.hideText()
+            return True
+        return super().viewportEvent(event)
+
+class GuiUpdateQueue(QObject):
+    """
+    Обновления интерфейса из фоновых потоков.
+    
+    post() вызывается из любого потока: запись добавляется в deque (append
+    атомарен, блокировок нет). GUI-поток разбирает очередь таймером не чаще
+    max_rate раз в секунду. Значения одного ключа схлопываются до последнего,
+    пакетные ключи получают все значения списком, поэтому спам горячими
+    клавишами дает не больше одной перерисовки за тик.
+    """
+    
+    # Очередь ожила (испускается из потока, вызвавшего post)
+    _wakeup = pyqtSignal()
+    
+    def __init__(self, max_rate: int = 20, parent: Optional[QObject] = None):
+        """
+        Args:
+            max_rate: Максимум разборов очереди в секунду
+            parent: Владелец из GUI-потока
+        """
+        super().__init__(parent)
+        self._queue = deque()
+        self._handlers: Dict[str, Tuple[Callable[[Any], None], bool]] = {}
+        self._scheduled = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(max(1, round(1000 / max_rate)))
+        self.timer.timeout.connect(self.flush)
+        self._wakeup.connect(self._on_wakeup)
+    
+    def register(self, key: str, handler: Callable[[Any], None], batch: bool = False) -> None:
+        """
+        Назначает обработчик ключа
+        
+        Args:
+            key: Ключ обновления
+            handler: Получает последнее значение, а при batch - список всех по порядку
+            batch: Не схлопывать значения (например, строки лога)
+        """
+        self._handlers[key] = (handler, batch)
+    
+    def post(self, key: str, value: Any) -> None:
+        """Ставит обновление в очередь (любой поток)"""
+        self._queue.append((key, value))
+        if not self._scheduled:
+            self._scheduled = True
+            self._wakeup.emit()
+    
+    def _on_wakeup(self) -> None:
+        # Таймер стоит - с прошлого разбора прошел хотя бы интервал, разбираем сразу
+        if not self.timer.isActive():
+            self.timer.start()
+            self.flush()
+    
+    def flush(self) -> None:
+        """Применяет накопленные обновления (GUI-поток)"""
+        self._scheduled = False
+        queue = self._queue
+        if not queue:
+            # Тик без обновлений: таймер не крутится в простое
+            self.timer.stop()
+            return
+        pending: Dict[str, Any] = {}
+        # Только уже поставленное: поток, который пишет без остановки, не задержит GUI
+        for _ in range(len(queue)):
+            key, value = queue.popleft()
+            if self._handlers[key][1]:
+                pending.setdefault(key, []).append(value)
+            else:
+                pending[key] = value
+        for key, value in pending.items():
+            self._handlers[key][0](value)
+
 class BeautifulAutoClicker(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -174,11 +390,32 @@ class BeautifulAutoClicker(QMainWindow):
         layout.addWidget(log_group)
         
         log_layout = QVBoxLayout(log_group)
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setStyleSheet("color: #e0e0e0; background-color: #1e1e1e;")
-        self.log_text.setFont(QFont("Consolas", 10))
-        log_layout.addWidget(self.log_text)
+        log_controls = QHBoxLayout()
+        log_controls.addWidget(QLabel("Показывать:"))
+        self.log_level = QComboBox()
+        self.log_level.addItem("Все", logging.NOTSET)
+        self.log_level.addItem("Предупреждения и ошибки", logging.WARNING)
+        self.log_level.addItem("Только ошибки", logging.ERROR)
+        self.log_level.currentIndexChanged.connect(self.change_log_level)
+        log_controls.addWidget(self.log_level)
+        self.log_to_file = QCheckBox(f"Писать в файл ({LOG_FILE})")
+        self.log_to_file.toggled.connect(self.set_log_file)
+        log_controls.addWidget(self.log_to_file)
+        log_controls.addStretch()
+        log_layout.addLayout(log_controls)
+        
+        # Последние LOG_CAPACITY записей; рисуются только видимые строки
+        self.log_buffer = LogBuffer()
+        self.log_view = LogView(self.log_buffer)
+        self.log_view.setStyleSheet("color: #e0e0e0; background-color: #1e1e1e;")
+        self.log_view.setFont(QFont("Consolas", 10))
+        log_layout.addWidget(self.log_view)
+        self.log_file_handler: Optional[RotatingFileHandler] = None
+        
+        # Лог пишут и потоки кликера и горячих клавиш: записи копятся и
+        # добавляются пачкой, до 20 раз в секунду
+        self.ui_updates = GuiUpdateQueue(parent=self)
+        self.ui_updates.register("log", self.append_log_records, batch=True)
         
         # Инициализация кликера
         self.clicker_active = False
@@ -229,9 +466,51 @@ class BeautifulAutoClicker(QMainWindow):
             }}
         """
     
-    def log(self, message):
-        timestamp = time.strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
+    def log(self, message, level: int = logging.INFO):
+        """Добавляет запись в лог (из любого потока, через очередь обновлений)"""
+        self.ui_updates.post("log", (level, time.time(), message))
+    
+    def append_log_records(self, records: List[Tuple[int, float, str]]):
+        """Пачка записей из очереди: в кольцевой буфер и, если включено, в файл"""
+        self.log_view.refresh(self.log_buffer.extend(records))
+        
+        if self.log_file_handler is not None:
+            for level, created, message in records:
+                record = logging.LogRecord("autoclicker", level, __file__, 0, message, None, None)
+                record.created = created
+                self.log_file_handler.handle(record)
+    
+    def change_log_level(self):
+        """Фильтр лога по уровню"""
+        self.log_buffer.set_min_level(self.log_level.currentData())
+        # После смены фильтра показываем самые новые записи
+        scrollbar = self.log_view.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+        self.log_view.refresh()
+    
+    def set_log_file(self, enabled: bool):
+        """Включает запись лога в файл с ротацией по размеру"""
+        if enabled and self.log_file_handler is None:
+            try:
+                LOG_FILE.parent.mkdir(exist_ok=True)
+                handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES,
+                                              backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+            except OSError as e:
+                self.log(f"Файл лога недоступен: {str(e)}", logging.ERROR)
+                self.log_to_file.setChecked(False)
+                return
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+            self.log_file_handler = handler
+            self.log(f"Лог пишется в {LOG_FILE}")
+        elif not enabled and self.log_file_handler is not None:
+            self.log_file_handler.close()
+            self.log_file_handler = None
+    
+    def closeEvent(self, event):
+        """Дописывает последние записи лога в файл перед выходом"""
+        self.ui_updates.flush()
+        self.set_log_file(False)
+        super().closeEvent(event)
     
     def start_clicker(self):
         try:
@@ -343,7 +622,7 @@ class BeautifulAutoClicker(QMainWindow):
                 else:
                     time.sleep(0.0001)
             except Exception as e:
-                self.log(f"Ошибка в цикле кликера: {str(e)}")
+                self.log(f"Ошибка в цикле кликера: {str(e)}", logging.ERROR)
                 break
 
 class Clicker:
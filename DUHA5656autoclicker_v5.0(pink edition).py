@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import subprocess
+import importlib.util
 import time
 import threading
 import json
@@ -9,18 +9,19 @@ from pathlib import Path
 from typing import Any, Dict, Optional
 import logging
 
-# Функция для установки библиотек
-def install_packages():
-    required_packages = ['pyqt5', 'keyboard', 'mouse']
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            print(f"Устанавливаю {package}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+# Модуль -> пакет pip
+REQUIRED_PACKAGES = {'PyQt5': 'pyqt5', 'keyboard': 'keyboard', 'mouse': 'mouse'}
+
+def check_dependencies():
+    """Проверяет зависимости без импорта (find_spec) и ничего не устанавливает"""
+    missing = [package for module, package in REQUIRED_PACKAGES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"Не установлены пакеты: {', '.join(missing)}")
+        print(f"Установите их: {sys.executable} -m pip install {' '.join(missing)}")
+        sys.exit(1)
 
-# Устанавливаем необходимые библиотеки
-install_packages()
+check_dependencies()
 
 # Теперь импортируем библиотеки
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
@@ -1,39 +1,58 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import subprocess
+import importlib.util
+import ctypes
+import fcntl
+import functools
+import select
+import selectors
+import socket
 import time
 import threading
 import json
+import bisect
+import math
+import pwd
+import re
+import struct
+from array import array
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional, List, Tuple, Union
 import logging
+from logging.handlers import RotatingFileHandler
 
-# Функция для установки библиотек
-def install_packages():
-    required_packages = ['pyqt5', 'evdev', 'python-xlib']
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            print(f"Устанавливаю {package}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+# Модуль -> пакет pip
+REQUIRED_PACKAGES = {'PyQt5': 'pyqt5', 'evdev': 'evdev', 'Xlib': 'python-xlib'}
+
+def check_dependencies():
+    """Проверяет зависимости без импорта (find_spec) и ничего не устанавливает"""
+    missing = [package for module, package in REQUIRED_PACKAGES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"Не установлены пакеты: {', '.join(missing)}")
+        print(f"Установите их: {sys.executable} -m pip install {' '.join(missing)}")
+        sys.exit(1)
 
-# Устанавливаем необходимые библиотеки
-install_packages()
+check_dependencies()
 
 # Теперь импортируем библиотеки
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                             QTextEdit, QCheckBox, QGroupBox, QMessageBox,
-                             QSpinBox, QDoubleSpinBox, QComboBox, QFileDialog)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QPalette, QColor
+                             QCheckBox, QGroupBox, QMessageBox,
+                             QSpinBox, QDoubleSpinBox, QComboBox, QFileDialog,
+                             QAbstractScrollArea, QToolTip)
+from PyQt5.QtCore import Qt, QEvent, QObject, QPoint, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter, QPalette, QColor
 
 # Linux-специфичные импорты
 try:
-    from evdev import InputDevice, list_devices, ecodes
+    from evdev import InputDevice, list_devices, ecodes, UInput, AbsInfo
     import Xlib.display
+    import Xlib.error
+    from Xlib import X
+    from Xlib.ext import xtest, record
     LINUX_SUPPORT = True
 except ImportError:
     LINUX_SUPPORT = False
@@ -46,24 +65,44 @@ class LinuxMouseController:
         self.display = Xlib.display.Display()
         self.screen = self.display.screen()
         self.root = self.screen.root
+        # Кэш позиции указателя (создается при первом запросе позиции)
+        self.tracker: Optional['PointerTracker'] = None
         
     def click(self, button=1):
         """Эмулирует клик мыши"""
         try:
             # Нажатие
-            self.root.press_button(button)
-            self.display.sync()
+            self.press(button)
             time.sleep(0.01)
             
             # Отпускание
-            self.root.release_button(button)
-            self.display.sync()
+            self.release(button)
             
         except Exception as e:
             print(f"Ошибка эмуляции клика: {e}")
     
+    def press(self, button=1):
+        """Нажимает кнопку мыши через XTest"""
+        xtest.fake_input(self.display, X.ButtonPress, button)
+        self.display.sync()
+    
+    def release(self, button=1):
+        """Отпускает кнопку мыши через XTest"""
+        xtest.fake_input(self.display, X.ButtonRelease, button)
+        self.display.sync()
+    
+    def screen_size(self):
+        """Возвращает размер корневого окна (всех мониторов вместе)"""
+        return self.screen.width_in_pixels, self.screen.height_in_pixels
+    
     def get_position(self):
-        """Возвращает текущую позицию мыши"""
+        """Возвращает текущую позицию мыши (из кэша трекера, без запроса к X)"""
+        if self.tracker is None:
+            self.tracker = PointerTracker(self.query_position)
+        return self.tracker.position()
+    
+    def query_position(self):
+        """Запрашивает позицию мыши у X-сервера (синхронный round-trip)"""
         try:
             query = self.root.query_pointer()
             return query.root_x, query.root_y
@@ -75,16 +114,264 @@ class LinuxMouseController:
         try:
             self.root.warp_pointer(x, y)
             self.display.sync()
+            if self.tracker is not None:
+                self.tracker.update(x, y)
         except Exception as e:
             print(f"Ошибка перемещения мыши: {e}")
+    
+    def close(self):
+        """Останавливает трекер и закрывает соединение с X"""
+        if self.tracker is not None:
+            self.tracker.stop()
+            self.tracker = None
+        self.display.close()
+
+# struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+INPUT_EVENT = struct.Struct('llHHi')
+
+# Кнопки макросов и их коды в X11 (индексы совпадают)
+MACRO_BUTTONS = ('left', 'right', 'middle', 'x', 'x2')
+X_BUTTONS = (1, 3, 2, 8, 9)
+
+class UInputMouse:
+    """
+    Виртуальная мышь с абсолютными координатами (EV_ABS) через uinput.
+    
+    События копятся в текущем кадре и уходят в ядро одним write() вместе
+    с SYN_REPORT. Перемещения внутри кадра схлопываются: в кадре остается
+    одна пара ABS_X/ABS_Y с последней позицией. Кнопки закрывают кадр сразу.
+    """
+    
+    NAME = "DUHA5656 virtual pointer"
+    
+    def __init__(self, width: int, height: int):
+        self.button_codes = (ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE,
+                             ecodes.BTN_SIDE, ecodes.BTN_EXTRA)
+        self.device = UInput({
+            ecodes.EV_KEY: list(self.button_codes),
+            ecodes.EV_ABS: [
+                (ecodes.ABS_X, AbsInfo(value=0, min=0, max=width - 1, fuzz=0, flat=0, resolution=0)),
+                (ecodes.ABS_Y, AbsInfo(value=0, min=0, max=height - 1, fuzz=0, flat=0, resolution=0)),
+            ],
+        }, name=self.NAME)
+        self.fd = self.device.fd
+        self._frame = bytearray(INPUT_EVENT.size * 8)
+        self._length = 0
+        self._move_offset = -1
+        self.writes = 0
+    
+    def _put(self, ev_type: int, code: int, value: int) -> None:
+        INPUT_EVENT.pack_into(self._frame, self._length, 0, 0, ev_type, code, value)
+        self._length += INPUT_EVENT.size
+    
+    def move(self, x: int, y: int) -> None:
+        """Перемещает указатель (в текущем кадре)"""
+        if self._move_offset >= 0:
+            INPUT_EVENT.pack_into(self._frame, self._move_offset, 0, 0, ecodes.EV_ABS, ecodes.ABS_X, x)
+            INPUT_EVENT.pack_into(self._frame, self._move_offset + INPUT_EVENT.size, 0, 0,
+                                  ecodes.EV_ABS, ecodes.ABS_Y, y)
+        else:
+            self._move_offset = self._length
+            self._put(ecodes.EV_ABS, ecodes.ABS_X, x)
+            self._put(ecodes.EV_ABS, ecodes.ABS_Y, y)
+    
+    def press(self, button: int) -> None:
+        """Нажимает кнопку (индекс в MACRO_BUTTONS)"""
+        self._put(ecodes.EV_KEY, self.button_codes[button], 1)
+        self.flush()
+    
+    def release(self, button: int) -> None:
+        """Отпускает кнопку (индекс в MACRO_BUTTONS)"""
+        self._put(ecodes.EV_KEY, self.button_codes[button], 0)
+        self.flush()
+    
+    def click(self, button: int) -> None:
+        """Клик: два кадра (нажатие и отпускание) одной записью"""
+        self._put(ecodes.EV_KEY, self.button_codes[button], 1)
+        self._put(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        self._put(ecodes.EV_KEY, self.button_codes[button], 0)
+        self.flush()
+    
+    def flush(self) -> None:
+        """Закрывает кадр SYN_REPORT и отправляет накопленные события"""
+        if not self._length:
+            return
+        self._put(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        os.write(self.fd, memoryview(self._frame)[:self._length])
+        self.writes += 1
+        self._length = 0
+        self._move_offset = -1
+    
+    def close(self) -> None:
+        self.device.close()
+
+class XlibMacroBackend:
+    """Запасной бэкенд макросов через XTest/warp_pointer (один запрос к X на событие)"""
+    
+    def __init__(self, controller: LinuxMouseController):
+        self.controller = controller
+    
+    def move(self, x: int, y: int) -> None:
+        self.controller.move_to(x, y)
+    
+    def press(self, button: int) -> None:
+        self.controller.press(X_BUTTONS[button])
+    
+    def release(self, button: int) -> None:
+        self.controller.release(X_BUTTONS[button])
+    
+    def click(self, button: int) -> None:
+        self.press(button)
+        self.release(button)
+    
+    def flush(self) -> None:
+        pass
+
+# EVIOCSMASK = _IOW('E', 0x93, struct input_mask {__u32 type; __u32 codes_size; __u64 codes_ptr;})
+EVIOCSMASK = 0x40104593
+INPUT_MASK = struct.Struct('IIQ')
+KEY_CNT = 0x300
+
+def set_event_mask(fd: int, ev_type: int, codes, code_count: int) -> None:
+    """
+    Устанавливает фильтр событий evdev в ядре (EVIOCSMASK, Linux 4.4+)
+    
+    ev_type=0 задает маску типов событий, иначе - маску кодов этого типа.
+    Отфильтрованные события не будят читателя и не копируются в user space.
+    """
+    bitmap = bytearray((code_count + 7) // 8)
+    for code in codes:
+        bitmap[code // 8] |= 1 << (code % 8)
+    buffer = ctypes.create_string_buffer(bytes(bitmap), len(bitmap))
+    fcntl.ioctl(fd, EVIOCSMASK, INPUT_MASK.pack(ev_type, len(bitmap), ctypes.addressof(buffer)))
+
+class Inotify:
+    """Минимальная обертка над inotify(7) через ctypes"""
+    
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    # struct inotify_event: int wd, uint32 mask, uint32 cookie, uint32 len, char name[len]
+    EVENT = struct.Struct('iIII')
+    
+    def __init__(self):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+    
+    def add_watch(self, path: str, mask: int) -> int:
+        """Добавляет наблюдение за путем"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+    
+    def read(self) -> List[Tuple[int, str]]:
+        """Читает накопившиеся события: список (mask, имя файла)"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        
+        events = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].split(b"\0", 1)[0].decode(errors="replace")
+            offset += length
+            events.append((mask, name))
+        return events
+    
+    def close(self) -> None:
+        os.close(self.fd)
+
+def evdev_key_names() -> Dict[int, str]:
+    """
+    Таблица: код клавиши evdev -> каноническое имя (как в parse_hotkey)
+    
+    У части кодов несколько имен (113 - KEY_MIN_INTERESTING и KEY_MUTE).
+    Каноническим берется первое имя, не отмечающее границу диапазона, а
+    остальные добавляются в KEY_ALIASES - горячая клавиша, записанная
+    любым из имен, совпадет с тем же кодом.
+    """
+    names = {}
+    for code, name in ecodes.KEY.items():
+        aliases = [normalize_key_name(alias.split('_', 1)[1]) for alias in (name if isinstance(name, list) else [name])]
+        canonical = next((alias for alias in aliases if not alias.startswith(('min_', 'max_'))), aliases[0])
+        for alias in aliases:
+            if alias != canonical:
+                KEY_ALIASES.setdefault(alias, canonical)
+        names[code] = canonical
+    mouse_codes = (ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE, ecodes.BTN_SIDE, ecodes.BTN_EXTRA)
+    names.update(zip(mouse_codes, MOUSE_TRIGGER_NAMES))
+    return names
 
 class LinuxKeyboardListener:
-    """Слушатель клавиатуры для Linux"""
+    """
+    Слушатель клавиатуры для Linux
+    
+    Слушает все устройства с клавишами (по возможностям EV_KEY, а не по
+    имени) через один selectors/epoll и спит в ядре до прихода событий.
+    Мыши подключаются, если среди горячих клавиш есть их кнопки; своя
+    виртуальная мышь (UInputMouse) не слушается никогда.
+    Каталог /dev/input отслеживается через inotify в том же epoll, поэтому
+    подключенные и отключенные устройства подхватываются без перезапуска.
+    
+    В пассивном режиме клавиатуры не захватываются (grab), а ядро через
+    EVIOCSMASK пропускает в user space только клавиши из hotkey_codes.
+    Иначе захватывается одна клавиатура - выбранная (grab_device) или
+    первая найденная; остальные устройства слушаются с фильтром.
+    """
+    
+    INPUT_DIR = "/dev/input"
     
-    def __init__(self, callback):
+    def __init__(self, callback, on_devices_changed: Optional[Callable[[List[str]], None]] = None,
+                 hotkey_codes=(), passive: bool = True, grab_device: str = ""):
+        """
+        Args:
+            callback: Обработчик (код клавиши, value) из потока слушателя
+            on_devices_changed: Новый список имен слушаемых устройств
+            hotkey_codes: Коды клавиш, которые пропускает фильтр ядра
+            passive: Не захватывать клавиатуры
+            grab_device: Имя (или начало имени) захватываемой клавиатуры;
+                         пусто - первая найденная
+        """
         self.callback = callback
+        self.on_devices_changed = on_devices_changed
+        self.hotkey_codes = frozenset(hotkey_codes)
+        self.passive = passive
+        self.grab_device = grab_device
+        # Путь захваченного устройства
+        self.grabbed: Optional[str] = None
         self.running = False
         self.thread = None
+        self.selector = None
+        self.devices: Dict[str, Any] = {}
+        self._inotify = None
+        self._wake_r = self._wake_w = -1
+    
+    @staticmethod
+    def is_keyboard(device) -> bool:
+        """Есть ли у устройства обычные клавиши (коды до BTN_MISC)"""
+        keys = device.capabilities(absinfo=False).get(ecodes.EV_KEY, [])
+        return any(code < ecodes.BTN_MISC for code in keys)
+    
+    def wants(self, device) -> bool:
+        """Нужно ли слушать устройство: клавиатура или источник кнопок-триггеров"""
+        if device.name == UInputMouse.NAME:
+            return False
+        keys = device.capabilities(absinfo=False).get(ecodes.EV_KEY, [])
+        return any(code < ecodes.BTN_MISC for code in keys) or not self.hotkey_codes.isdisjoint(keys)
         
     def start(self):
         """Запускает слушатель клавиатуры"""
@@ -92,6 +379,7 @@ class LinuxKeyboardListener:
             return False
             
         self.running = True
+        self._wake_r, self._wake_w = os.pipe()
         self.thread = threading.Thread(target=self._listen)
         self.thread.daemon = True
         self.thread.start()
@@ -100,134 +388,2116 @@ class LinuxKeyboardListener:
     def stop(self):
         """Останавливает слушатель"""
         self.running = False
+        if self._wake_w >= 0:
+            os.write(self._wake_w, b"\0")
         if self.thread:
             self.thread.join(timeout=1.0)
+        if self._wake_w >= 0 and not (self.thread and self.thread.is_alive()):
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._wake_r = self._wake_w = -1
+    
+    def attach(self, path: str) -> bool:
+        """Открывает устройство и добавляет его в epoll, если это клавиатура"""
+        if path in self.devices:
+            return True
+        try:
+            device = InputDevice(path)
+        except OSError:
+            return False
+        if not self.wants(device):
+            device.close()
+            return False
+        
+        if self._should_grab(device):
+            try:
+                device.grab()
+                self.grabbed = path
+            except OSError as e:
+                print(f"Не удалось захватить {device.name}: {e}")
+        if self.grabbed != path:
+            self._apply_filter(device)
+        self.selector.register(device.fd, selectors.EVENT_READ, device)
+        self.devices[path] = device
+        print(f"Прослушивание устройства: {device.name} ({path})")
+        self._notify_devices()
+        return True
+    
+    def _should_grab(self, device) -> bool:
+        """Захватывать ли устройство: только одна клавиатура и только вне пассивного режима"""
+        if self.passive or self.grabbed is not None or not self.is_keyboard(device):
+            return False
+        # Имена от помощника приходят обрезанными, поэтому сравнивается начало имени
+        return not self.grab_device or device.name.startswith(self.grab_device)
+    
+    def detach(self, path: str) -> None:
+        """Убирает устройство из epoll и закрывает его"""
+        device = self.devices.pop(path, None)
+        if device is None:
+            return
+        if path == self.grabbed:
+            self.grabbed = None
+        try:
+            self.selector.unregister(device.fd)
+        except (KeyError, ValueError):
+            pass
+        try:
+            device.close()
+        except OSError:
+            pass
+        self._notify_devices()
+    
+    def _apply_filter(self, device) -> None:
+        """Оставляет в потоке устройства только EV_KEY с кодами горячих клавиш"""
+        try:
+            set_event_mask(device.fd, 0, (ecodes.EV_KEY,), 32)
+            set_event_mask(device.fd, ecodes.EV_KEY, self.hotkey_codes, KEY_CNT)
+        except OSError as e:
+            # Старое ядро без EVIOCSMASK - фильтруем в Python
+            print(f"Фильтр событий ядра недоступен для {device.name}: {e}")
+    
+    def set_hotkey_codes(self, codes) -> None:
+        """Меняет набор пропускаемых клавиш на всех устройствах"""
+        self.hotkey_codes = frozenset(codes)
+        for path, device in list(self.devices.items()):
+            if path != self.grabbed:
+                self._apply_filter(device)
+        # Могли понадобиться новые устройства (например, мышь для mouse4) или
+        # стать лишними старые - набор пересобирает поток слушателя
+        if self._wake_w >= 0:
+            os.write(self._wake_w, b"r")
+    
+    def device_names(self) -> List[str]:
+        """Имена слушаемых устройств"""
+        return [device.name for device in list(self.devices.values())]
+    
+    def _notify_devices(self) -> None:
+        if self.on_devices_changed is not None and self.running:
+            self.on_devices_changed(self.device_names())
+    
+    def _handle_hotplug(self) -> None:
+        """Подключает и отключает устройства по событиям inotify"""
+        for mask, name in self._inotify.read():
+            if not name.startswith("event"):
+                continue
+            path = os.path.join(self.INPUT_DIR, name)
+            if mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+                self.detach(path)
+            elif path not in self.devices:
+                # IN_ATTRIB повторяет попытку, когда udev выставит права на узел
+                self.attach(path)
     
     def _listen(self):
         """Основной цикл прослушивания клавиатуры"""
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
         try:
-            devices = [InputDevice(path) for path in list_devices()]
-            keyboard_devices = []
+            try:
+                self._inotify = Inotify()
+                self._inotify.add_watch(self.INPUT_DIR, Inotify.IN_CREATE | Inotify.IN_ATTRIB | Inotify.IN_DELETE
+                                        | Inotify.IN_MOVED_TO | Inotify.IN_MOVED_FROM)
+                self.selector.register(self._inotify.fd, selectors.EVENT_READ, self._inotify)
+            except OSError as e:
+                print(f"Горячее подключение устройств недоступно: {e}")
+                self._inotify = None
             
-            for device in devices:
-                if 'keyboard' in device.name.lower() or 'key' in device.name.lower():
-                    keyboard_devices.append(device)
+            for path in list_devices():
+                self.attach(path)
             
-            if not keyboard_devices:
+            if not self.devices:
                 print("Клавиатурные устройства не найдены")
-                return
-            
-            # Используем первое найденное клавиатурное устройство
-            device = keyboard_devices[0]
-            device.grab()
-            
-            print(f"Прослушивание клавиатуры: {device.name}")
             
             while self.running:
+                for key, _ in self.selector.select():
+                    device = key.data
+                    if device is None:
+                        if b"r" in os.read(self._wake_r, 64) and self.running:
+                            for path, listened in list(self.devices.items()):
+                                if not self.wants(listened):
+                                    self.detach(path)
+                            for path in list_devices():
+                                self.attach(path)
+                        continue
+                    if device is self._inotify:
+                        self._handle_hotplug()
+                        continue
+                    try:
+                        for event in device.read():
+                            # Нажатия и отпускания; автоповтор (value=2) не нужен
+                            if event.type == ecodes.EV_KEY and event.value != 2:
+                                try:
+                                    self.callback(event.code, event.value)
+                                except Exception as e:
+                                    # Ошибка обработчика не должна останавливать слушатель
+                                    print(f"Ошибка обработки клавиши {event.code}: {e}")
+                    except BlockingIOError:
+                        pass
+                    except OSError:
+                        # Устройство отключено
+                        self.detach(device.path)
+                    
+        except Exception as e:
+            print(f"Ошибка слушателя клавиатуры: {e}")
+        finally:
+            for path in list(self.devices):
+                self.detach(path)
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self.selector.close()
+
+# EVIOCSCLOCKID = _IOW('E', 0xa0, int): часы для меток времени событий устройства
+EVIOCSCLOCKID = 0x400445a0
+
+class LatencyProbe:
+    """
+    Замер задержки от нажатия горячей клавиши до первого клика.
+    
+    Нажатие отправляется через виртуальную клавиатуру uinput и проходит
+    весь обычный путь: слушатель evdev -> автомат горячих клавиш -> цикл
+    кликера. На время замера кликер ЛКМ кликает через виртуальную мышь
+    (UInputMouse), а ее узел /dev/input читается обратно с метками времени
+    CLOCK_MONOTONIC - так видно момент, когда клик дошел до ядра.
+    """
+    
+    NAME = "DUHA5656 latency probe"
+    # (начало, конец, подпись) для этапов отчета
+    STAGES = (
+        ("inject", "listener", "ядро -> слушатель"),
+        ("listener", "matched", "автомат горячих клавиш"),
+        ("matched", "click", "передача в поток кликера"),
+        ("click", "delivered", "клик -> событие evdev"),
+        ("inject", "delivered", "итого"),
+    )
+    
+    def __init__(self, key_codes: List[int], pointer: UInputMouse, hold: bool, trials: int = 200):
+        """
+        Args:
+            key_codes: Коды evdev горячей клавиши (модификаторы, затем клавиша)
+            pointer: Виртуальная мышь, через которую кликает кликер во время замера
+            hold: Режим удержания (клик идет, пока клавиша зажата)
+            trials: Количество замеров
+        """
+        self.key_codes = key_codes
+        self.pointer = pointer
+        self.hold = hold
+        self.trials = trials
+        self.trial: Optional[Dict[str, int]] = None
+        self.keyboard = UInput({ecodes.EV_KEY: list(key_codes)}, name=self.NAME)
+        self.reader = None
+        for path in list_devices():
+            device = InputDevice(path)
+            if device.name == UInputMouse.NAME and self.reader is None:
+                self.reader = device
+            else:
+                device.close()
+        if self.reader is None:
+            self.keyboard.close()
+            raise OSError("Узел виртуальной мыши не найден")
+        fcntl.ioctl(self.reader.fd, EVIOCSCLOCKID, struct.pack('i', time.CLOCK_MONOTONIC))
+    
+    def mark(self, stage: str) -> None:
+        """Отмечает момент прохождения этапа в текущем замере (любой поток)"""
+        trial = self.trial
+        if trial is not None:
+            trial.setdefault(stage, time.monotonic_ns())
+    
+    # Интерфейс контроллера мыши для Clicker (кнопки в кодах X)
+    def press(self, button: int) -> None:
+        self.mark("click")
+        self.pointer.press(X_BUTTONS.index(button))
+    
+    def release(self, button: int) -> None:
+        self.pointer.release(X_BUTTONS.index(button))
+    
+    def _send_keys(self, value: int) -> None:
+        codes = self.key_codes if value else reversed(self.key_codes)
+        for code in codes:
+            self.keyboard.write(ecodes.EV_KEY, code, value)
+        self.keyboard.syn()
+    
+    def _wait_click(self, timeout: float) -> Optional[int]:
+        """Ждет нажатие ЛКМ на виртуальной мыши; возвращает метку ядра, нс"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.reader.fd], [], [], remaining)[0]:
+                return None
+            for event in self.reader.read():
+                if event.type == ecodes.EV_KEY and event.code == ecodes.BTN_LEFT and event.value == 1:
+                    return event.sec * 1_000_000_000 + event.usec * 1000
+    
+    def _drain(self, quiet: float = 0.05) -> None:
+        """Вычитывает хвост событий, пока устройство не замолчит"""
+        while select.select([self.reader.fd], [], [], quiet)[0]:
+            self.reader.read()
+    
+    def run(self) -> List[Dict[str, int]]:
+        """Выполняет замеры (в фоновом потоке); возвращает метки этапов, нс"""
+        results = []
+        for _ in range(self.trials):
+            self._drain()
+            self.trial = trial = {"inject": time.monotonic_ns()}
+            self._send_keys(1)
+            if not self.hold:
+                self._send_keys(0)
+            delivered = self._wait_click(1.0)
+            self.trial = None
+            # Выключаем кликер: отпускание в режиме удержания, повторное нажатие - иначе
+            if self.hold:
+                self._send_keys(0)
+            else:
+                self._send_keys(1)
+                self._send_keys(0)
+            if delivered is None:
+                break
+            trial["delivered"] = delivered
+            results.append(trial)
+        self._drain()
+        return results
+    
+    def close(self) -> None:
+        self.keyboard.close()
+        self.reader.close()
+    
+    @classmethod
+    def summarize(cls, results: List[Dict[str, int]]) -> List[str]:
+        """Строки отчета: min/медиана/p95/p99/max по каждому этапу, мкс"""
+        lines = []
+        for start, end, title in cls.STAGES:
+            samples = sorted((trial[end] - trial[start]) / 1000
+                             for trial in results if start in trial and end in trial)
+            if not samples:
+                continue
+            pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+            lines.append(f"{title}: min {samples[0]:.0f}, медиана {pick(0.5):.0f}, "
+                         f"p95 {pick(0.95):.0f}, p99 {pick(0.99):.0f}, max {samples[-1]:.0f} мкс")
+        return lines
+
+# Протокол привилегированного помощника: сообщения фиксированного размера (64 байта)
+# op, button, code, a, b, t_ns, text (имя устройства, UTF-8; в HELPER_LISTEN - захватываемая клавиатура)
+HELPER_MESSAGE = struct.Struct('<BBHiiq44s')
+HELPER_PING = 1
+HELPER_PONG = 2
+HELPER_POINTER_OPEN = 3
+HELPER_ACK = 4
+HELPER_MOVE = 5
+HELPER_PRESS = 6
+HELPER_RELEASE = 7
+HELPER_CLICK = 8
+HELPER_FLUSH = 9
+HELPER_LISTEN = 10
+HELPER_UNLISTEN = 11
+HELPER_CODES_RESET = 12
+HELPER_CODE = 13
+HELPER_CODES_APPLY = 14
+# Сообщения помощника в канал событий
+HELPER_KEY = 15
+HELPER_DEVICES = 16
+HELPER_DEVICE = 17
+
+def run_input_helper(commands: socket.socket, events: socket.socket) -> None:
+    """
+    Цикл привилегированного помощника (процесс с правами root)
+    
+    Владеет устройствами ввода: слушателем evdev и виртуальной мышью uinput.
+    Команды приходят по commands, нажатия и список устройств уходят в events.
+    Завершается, когда GUI закрывает свой конец сокета.
+    """
+    pointer: Optional[UInputMouse] = None
+    listener: Optional[LinuxKeyboardListener] = None
+    codes = set()
+    buffer = bytearray(HELPER_MESSAGE.size)
+    
+    def send_event(op: int, code: int = 0, a: int = 0, text: bytes = b"") -> None:
+        try:
+            events.send(HELPER_MESSAGE.pack(op, 0, code, a, 0, 0, text))
+        except OSError:
+            pass
+    
+    def send_devices(names: List[str]) -> None:
+        send_event(HELPER_DEVICES, a=len(names))
+        for name in names:
+            send_event(HELPER_DEVICE, text=name.encode('utf-8')[:HELPER_MESSAGE.size - 20])
+    
+    while True:
+        try:
+            if not commands.recv_into(buffer):
+                break
+        except OSError:
+            break
+        op, button, code, a, b, t_ns, text = HELPER_MESSAGE.unpack(buffer)
+        
+        if op == HELPER_MOVE:
+            if pointer is not None:
+                pointer.move(a, b)
+        elif op == HELPER_PRESS:
+            if pointer is not None:
+                pointer.press(button)
+        elif op == HELPER_RELEASE:
+            if pointer is not None:
+                pointer.release(button)
+        elif op == HELPER_CLICK:
+            if pointer is not None:
+                pointer.click(button)
+        elif op == HELPER_FLUSH:
+            if pointer is not None:
+                pointer.flush()
+        elif op == HELPER_PING:
+            commands.send(HELPER_MESSAGE.pack(HELPER_PONG, 0, 0, 0, 0, t_ns, b""))
+        elif op == HELPER_POINTER_OPEN:
+            ok = 1
+            if pointer is None:
                 try:
-                    for event in device.read():
-                        if event.type == ecodes.EV_KEY and event.value == 1:  # Key press
-                            key_code = event.code
-                            self.callback(key_code)
-                except BlockingIOError:
-                    time.sleep(0.01)
+                    pointer = UInputMouse(a, b)
                 except Exception as e:
-                    print(f"Ошибка чтения клавиатуры: {e}")
-                    time.sleep(1)
-                    
+                    print(f"Помощник: uinput недоступен: {e}")
+                    ok = 0
+            commands.send(HELPER_MESSAGE.pack(HELPER_ACK, 0, 0, ok, 0, 0, b""))
+        elif op == HELPER_CODES_RESET:
+            codes = set()
+        elif op == HELPER_CODE:
+            codes.add(code)
+        elif op == HELPER_CODES_APPLY:
+            if listener is not None:
+                listener.set_hotkey_codes(codes)
+        elif op == HELPER_LISTEN:
+            if listener is None:
+                listener = LinuxKeyboardListener(
+                    lambda key_code, value: send_event(HELPER_KEY, key_code, value),
+                    send_devices, hotkey_codes=codes, passive=bool(button),
+                    grab_device=text.rstrip(b"\0").decode('utf-8', 'ignore'))
+                if not listener.start():
+                    listener = None
+            commands.send(HELPER_MESSAGE.pack(HELPER_ACK, 0, 0, int(listener is not None), 0, 0, b""))
+        elif op == HELPER_UNLISTEN:
+            if listener is not None:
+                listener.stop()
+                listener = None
+            commands.send(HELPER_MESSAGE.pack(HELPER_ACK, 0, 0, 1, 0, 0, b""))
+    
+    if listener is not None:
+        listener.stop()
+    if pointer is not None:
+        pointer.close()
+
+class HelperClient:
+    """
+    Непривилегированная сторона протокола помощника (процесс GUI)
+    
+    Команды мыши отправляются без ожидания ответа - одно send() на
+    событие; ответ ждут только PING, открытие мыши и запуск слушателя.
+    События помощника читает отдельный поток.
+    """
+    
+    def __init__(self, commands: socket.socket, events: socket.socket):
+        self.commands = commands
+        self.events = events
+        self.on_key: Optional[Callable[[int, int], None]] = None
+        self.on_devices: Optional[Callable[[List[str]], None]] = None
+        self._request_lock = threading.Lock()
+        self._reply = bytearray(HELPER_MESSAGE.size)
+        self._event_thread = threading.Thread(target=self._event_loop)
+        self._event_thread.daemon = True
+        self._event_thread.start()
+    
+    def send(self, op: int, button: int = 0, code: int = 0, a: int = 0, b: int = 0) -> None:
+        self.commands.send(HELPER_MESSAGE.pack(op, button, code, a, b, 0, b""))
+    
+    def request(self, op: int, button: int = 0, a: int = 0, b: int = 0, t_ns: int = 0,
+                text: bytes = b"") -> Tuple[int, int, int]:
+        """Команда с ответом; возвращает (op, a, t_ns) ответа"""
+        with self._request_lock:
+            self.commands.send(HELPER_MESSAGE.pack(op, button, 0, a, b, t_ns, text))
+            if not self.commands.recv_into(self._reply):
+                raise OSError("Помощник завершился")
+            reply_op, _, _, reply_a, _, reply_t_ns, _ = HELPER_MESSAGE.unpack(self._reply)
+            return reply_op, reply_a, reply_t_ns
+    
+    def ping(self) -> int:
+        """Время полного обмена сообщениями с помощником, нс"""
+        start = time.perf_counter_ns()
+        self.request(HELPER_PING, t_ns=start)
+        return time.perf_counter_ns() - start
+    
+    def open_pointer(self, width: int, height: int) -> Optional['HelperPointer']:
+        """Создает виртуальную мышь в помощнике; None если uinput недоступен"""
+        _, ok, _ = self.request(HELPER_POINTER_OPEN, a=width, b=height)
+        return HelperPointer(self) if ok else None
+    
+    def set_hotkey_codes(self, codes) -> None:
+        self.send(HELPER_CODES_RESET)
+        for code in codes:
+            self.send(HELPER_CODE, code=code)
+        self.send(HELPER_CODES_APPLY)
+    
+    def _event_loop(self) -> None:
+        buffer = bytearray(HELPER_MESSAGE.size)
+        names: List[str] = []
+        expected = 0
+        while True:
+            try:
+                if not self.events.recv_into(buffer):
+                    break
+            except OSError:
+                break
+            op, _, code, a, _, _, text = HELPER_MESSAGE.unpack(buffer)
+            if op == HELPER_KEY:
+                callback = self.on_key
+                if callback is not None:
+                    callback(code, a)
+            elif op == HELPER_DEVICES:
+                names, expected = [], a
+            elif op == HELPER_DEVICE:
+                names.append(text.rstrip(b"\0").decode('utf-8', 'ignore'))
+            if op in (HELPER_DEVICES, HELPER_DEVICE) and len(names) == expected:
+                callback = self.on_devices
+                if callback is not None:
+                    callback(names)
+    
+    def close(self) -> None:
+        self.commands.close()
+        self.events.close()
+
+class HelperPointer:
+    """Виртуальная мышь помощника с интерфейсом UInputMouse"""
+    
+    def __init__(self, client: HelperClient):
+        self.client = client
+        self.writes = 0
+    
+    def move(self, x: int, y: int) -> None:
+        self.client.send(HELPER_MOVE, a=x, b=y)
+    
+    def press(self, button: int) -> None:
+        self.client.send(HELPER_PRESS, button)
+        self.writes += 1
+    
+    def release(self, button: int) -> None:
+        self.client.send(HELPER_RELEASE, button)
+        self.writes += 1
+    
+    def click(self, button: int) -> None:
+        self.client.send(HELPER_CLICK, button)
+        self.writes += 1
+    
+    def flush(self) -> None:
+        self.client.send(HELPER_FLUSH)
+        self.writes += 1
+    
+    def close(self) -> None:
+        pass
+
+class HelperKeyboardListener:
+    """Слушатель клавиатуры в помощнике с интерфейсом LinuxKeyboardListener"""
+    
+    def __init__(self, client: HelperClient, callback,
+                 on_devices_changed: Optional[Callable[[List[str]], None]] = None,
+                 hotkey_codes=(), passive: bool = True, grab_device: str = ""):
+        self.client = client
+        self.callback = callback
+        self.on_devices_changed = on_devices_changed
+        self.hotkey_codes = frozenset(hotkey_codes)
+        self.passive = passive
+        self.grab_device = grab_device
+        self.names: List[str] = []
+    
+    def _devices_changed(self, names: List[str]) -> None:
+        self.names = names
+        if self.on_devices_changed is not None:
+            self.on_devices_changed(names)
+    
+    def start(self) -> bool:
+        self.client.on_key = self.callback
+        self.client.on_devices = self._devices_changed
+        self.client.set_hotkey_codes(self.hotkey_codes)
+        name = self.grab_device.encode('utf-8')[:HELPER_MESSAGE.size - 20]
+        _, ok, _ = self.client.request(HELPER_LISTEN, button=int(self.passive), text=name)
+        return bool(ok)
+    
+    def stop(self) -> None:
+        self.client.request(HELPER_UNLISTEN)
+        self.client.on_key = None
+        self.client.on_devices = None
+    
+    def set_hotkey_codes(self, codes) -> None:
+        self.hotkey_codes = frozenset(codes)
+        self.client.set_hotkey_codes(self.hotkey_codes)
+    
+    def device_names(self) -> List[str]:
+        return list(self.names)
+
+def _spawn_helper() -> Tuple[int, HelperClient]:
+    """Запускает помощника в дочернем процессе; возвращает (pid, клиент)"""
+    commands, helper_commands = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    events, helper_events = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    pid = os.fork()
+    if pid == 0:
+        commands.close()
+        events.close()
+        try:
+            run_input_helper(helper_commands, helper_events)
+        finally:
+            os._exit(0)
+    helper_commands.close()
+    helper_events.close()
+    return pid, HelperClient(commands, events)
+
+def drop_privileges() -> None:
+    """Переходит от root к пользователю, запустившему sudo"""
+    uid = int(os.environ["SUDO_UID"])
+    gid = int(os.environ.get("SUDO_GID", uid))
+    user = pwd.getpwuid(uid)
+    os.initgroups(user.pw_name, gid)
+    os.setgid(gid)
+    os.setuid(uid)
+    os.environ.update(HOME=user.pw_dir, USER=user.pw_name, LOGNAME=user.pw_name)
+
+def start_input_helper() -> Optional[HelperClient]:
+    """
+    Разделение привилегий: устройства ввода остаются у root-помощника,
+    а GUI продолжает работу с правами пользователя sudo
+    
+    Returns:
+        Optional[HelperClient]: Клиент помощника или None (запуск не через sudo)
+    """
+    if not LINUX_SUPPORT or os.geteuid() != 0 or "SUDO_UID" not in os.environ:
+        return None
+    _, client = _spawn_helper()
+    drop_privileges()
+    return client
+
+def benchmark_ipc(count: int = 20000) -> None:
+    """Замер обмена с помощником: задержка PING и поток команд без ответа"""
+    pid, client = _spawn_helper()
+    for _ in range(1000):
+        client.ping()
+    
+    samples = sorted(client.ping() for _ in range(count))
+    pick = lambda q: samples[min(count - 1, int(q * count))] / 1000
+    print(f"PING ({count}): min {samples[0] / 1000:.1f}, медиана {pick(0.5):.1f}, "
+          f"p99 {pick(0.99):.1f}, max {samples[-1] / 1000:.1f} мкс")
+    
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        client.send(HELPER_FLUSH)
+    client.ping()
+    elapsed = time.perf_counter_ns() - start
+    print(f"Команды без ответа: {count / (elapsed / 1e9):.0f} сообщений/с, "
+          f"{elapsed / count / 1000:.2f} мкс на сообщение")
+    
+    client.close()
+    os.waitpid(pid, 0)
+
+class ConfigManager:
+    """
+    Менеджер конфигураций для сохранения и загрузки настроек в формате JSON
+    """
+    
+    def __init__(self, config_dir: str = "config", default_filename: str = "autoclicker_config.json",
+                 save_delay: float = 0.5, max_save_delay: float = 3.0):
+        """
+        Args:
+            config_dir: Директория конфигураций
+            default_filename: Файл конфигурации по умолчанию
+            save_delay: Пауза без изменений, после которой отложенная запись уходит на диск, сек
+            max_save_delay: Предел откладывания при непрерывных изменениях, сек
+        """
+        self.config_dir = Path(config_dir)
+        self.default_filename = default_filename
+        self.config_path = self.config_dir / default_filename
+        self._ensure_config_dir()
+        self._watch_thread = None
+        self._stop_watch = threading.Event()
+        
+        # Отложенная запись: последние данные по именам файлов и фоновый писатель
+        self.save_delay = save_delay
+        self.max_save_delay = max_save_delay
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._save_event = threading.Event()
+        self._writer_thread = None
+        # Файл -> mtime_ns нашей последней записи (слежение их пропускает)
+        self._own_writes: Dict[str, int] = {}
+        
+        # Настройка логирования
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    def _ensure_config_dir(self) -> None:
+        """Создает директорию для конфигураций, если она не существует"""
+        self.config_dir.mkdir(exist_ok=True, parents=True)
+    
+    def save_config(self, config_data: Dict[str, Any], filename: Optional[str] = None) -> bool:
+        """
+        Сохраняет конфигурацию в JSON файл
+        
+        Args:
+            config_data: Словарь с данными конфигурации
+            filename: Имя файла (если None, используется имя по умолчанию)
+        
+        Returns:
+            bool: True если сохранение успешно, False в противном случае
+        """
+        try:
+            config_path = self.config_dir / (filename or self.default_filename)
+            self._write_atomic(config_path, json.dumps(config_data, indent=4, ensure_ascii=False))
+            self.logger.info(f"Конфигурация сохранена: {config_path}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения конфигурации: {e}")
+            return False
+    
+    def _write_atomic(self, config_path: Path, text: str) -> None:
+        """
+        Пишет файл целиком или не пишет вовсе: временный файл, fsync, rename
+        
+        Временное имя не оканчивается на .json, поэтому слежение видит
+        только готовый файл после переименования.
+        """
+        tmp_path = config_path.with_name(f".{config_path.name}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            # rename сохраняет mtime, поэтому отметку можно поставить заранее
+            self._own_writes[config_path.name] = os.stat(tmp_path).st_mtime_ns
+            os.replace(tmp_path, config_path)
+        except BaseException:
+            self._own_writes.pop(config_path.name, None)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        
+        # Запись о переименовании тоже должна пережить сбой питания
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.config_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def save_config_later(self, config_data: Dict[str, Any], filename: Optional[str] = None) -> None:
+        """
+        Откладывает сохранение: частые изменения схлопываются в одну запись
+        
+        Не блокирует вызывающий поток: файл пишет фоновый поток, когда
+        изменения затихнут на save_delay (но не позже max_save_delay).
+        
+        Args:
+            config_data: Словарь с данными конфигурации (дальше не изменяется)
+            filename: Имя файла (если None, используется имя по умолчанию)
+        """
+        with self._pending_lock:
+            self._pending[filename or self.default_filename] = config_data
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._writer_loop)
+                self._writer_thread.daemon = True
+                self._writer_thread.start()
+        self._save_event.set()
+    
+    def flush(self) -> None:
+        """Сразу записывает отложенные конфигурации (например, при выходе)"""
+        # Писатель и выход не должны писать один файл одновременно
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for filename, config_data in pending.items():
+                self.save_config(config_data, filename)
+    
+    def _writer_loop(self) -> None:
+        while True:
+            self._save_event.wait()
+            first = time.monotonic()
+            # Каждое новое изменение продлевает паузу
+            while True:
+                self._save_event.clear()
+                remaining = self.max_save_delay - (time.monotonic() - first)
+                if remaining <= 0 or not self._save_event.wait(min(self.save_delay, remaining)):
+                    break
+            self.flush()
+    
+    def _is_own_write(self, name: str) -> bool:
+        """Файл не менялся с нашей последней записи"""
+        mtime = self._own_writes.get(name)
+        if mtime is None:
+            return False
+        try:
+            return os.stat(self.config_dir / name).st_mtime_ns == mtime
+        except OSError:
+            return False
+    
+    def load_config(self, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Загружает конфигурацию из JSON файла
+        
+        Args:
+            filename: Имя файла (если None, используется имя по умолчанию)
+        
+        Returns:
+            Optional[Dict]: Словарь с данными конфигурации или None при ошибке
+        """
+        try:
+            config_path = self.config_dir / (filename or self.default_filename)
+            
+            if not config_path.exists():
+                self.logger.warning(f"Файл конфигурации не найден: {config_path}")
+                return None
+            
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config_data = json.load(f)
+            
+            self.logger.info(f"Конфигурация загружена: {config_path}")
+            return config_data
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка загрузки конфигурации: {e}")
+            return None
+    
+    def watch(self, callback: Callable[[str], None], poll_interval: float = 0.5) -> None:
+        """
+        Следит за директорией конфигураций в фоновом потоке
+        
+        Args:
+            callback: Вызывается с именем измененного .json файла (из фонового потока);
+                      собственные записи менеджера не сообщаются
+            poll_interval: Период опроса, если inotify недоступен
+        """
+        if self._watch_thread is not None:
+            return
+        self._stop_watch.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, args=(callback, poll_interval))
+        self._watch_thread.daemon = True
+        self._watch_thread.start()
+    
+    def stop_watching(self) -> None:
+        """Останавливает слежение за директорией"""
+        self._stop_watch.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=1.0)
+            self._watch_thread = None
+    
+    def _watch_loop(self, callback: Callable[[str], None], poll_interval: float) -> None:
+        try:
+            inotify = Inotify()
+            inotify.add_watch(str(self.config_dir), Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO)
+        except (OSError, AttributeError) as e:
+            self.logger.info(f"inotify недоступен, опрос директории конфигураций: {e}")
+            self._poll_loop(callback, poll_interval)
+            return
+        
+        try:
+            while not self._stop_watch.is_set():
+                # Таймаут - только чтобы заметить остановку
+                if not select.select([inotify.fd], [], [], poll_interval)[0]:
+                    continue
+                for name in {name for _, name in inotify.read() if name.endswith(".json")}:
+                    if not self._is_own_write(name):
+                        callback(name)
+        finally:
+            inotify.close()
+    
+    def _poll_loop(self, callback: Callable[[str], None], poll_interval: float) -> None:
+        """Запасной вариант: сравнение mtime файлов раз в poll_interval"""
+        def snapshot() -> Dict[str, int]:
+            try:
+                return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(self.config_dir)
+                        if entry.name.endswith(".json")}
+            except OSError:
+                return {}
+        
+        known = snapshot()
+        while not self._stop_watch.wait(poll_interval):
+            current = snapshot()
+            for name, mtime in current.items():
+                if known.get(name) != mtime and not self._is_own_write(name):
+                    callback(name)
+            known = current
+    
+    def get_config_list(self) -> list:
+        """Возвращает список доступных конфигурационных файлов"""
+        config_files = []
+        for file in self.config_dir.glob("*.json"):
+            config_files.append(file.name)
+        return sorted(config_files)
+
+class ProfileStore:
+    """
+    Профили - все конфигурации директории, заранее загруженные в память.
+    
+    Файлы проверяются при загрузке и обновляются по событиям слежения,
+    поэтому переключение профиля не читает диск и не разбирает JSON.
+    Словарь профилей заменяется целиком, и потоки хуков читают его без блокировок.
+    """
+    
+    def __init__(self, config_manager: ConfigManager, parse: Callable[[Dict[str, Any]], Any]):
+        """
+        Args:
+            config_manager: Источник файлов конфигураций
+            parse: Проверка словаря конфигурации (ValueError - файл пропускается)
+        """
+        self.config_manager = config_manager
+        self.parse = parse
+        self.profiles: Dict[str, Any] = {}
+    
+    def load_all(self) -> None:
+        """Загружает все конфигурации директории"""
+        profiles = {}
+        for name in self.config_manager.get_config_list():
+            profile = self._load(name)
+            if profile is not None:
+                profiles[name] = profile
+        self.profiles = profiles
+    
+    def reload(self, name: str) -> Optional[Any]:
+        """Перечитывает один файл; некорректный или удаленный файл убирается из профилей"""
+        profile = self._load(name)
+        profiles = dict(self.profiles)
+        if profile is None:
+            profiles.pop(name, None)
+        else:
+            profiles[name] = profile
+        self.profiles = profiles
+        return profile
+    
+    def put(self, name: str, profile: Any) -> Optional[Any]:
+        """Обновляет профиль без чтения файла; возвращает прежний"""
+        profiles = dict(self.profiles)
+        old = profiles.get(name)
+        profiles[name] = profile
+        self.profiles = profiles
+        return old
+    
+    def get(self, name: str) -> Optional[Any]:
+        return self.profiles.get(name)
+    
+    def _load(self, name: str) -> Optional[Any]:
+        config_data = self.config_manager.load_config(name)
+        if config_data is None:
+            return None
+        try:
+            return self.parse(config_data)
+        except ValueError as e:
+            self.config_manager.logger.warning(f"Профиль {name} пропущен: {e}")
+            return None
+
+class WindowProfileIndex:
+    """
+    Индекс профилей по окнам для автовыбора.
+    
+    Шаблон из window_match профиля совпадает с WM_CLASS окна целиком или
+    с фразой из целых слов заголовка (без учета регистра). WM_CLASS ищется
+    в словаре, фраза - по первому слову, поэтому смена фокуса стоит
+    несколько поисков в словаре, сколько бы ни было профилей.
+    """
+    
+    WORD = re.compile(r"\w+")
+    
+    def __init__(self, profiles: Dict[str, Dict[str, Any]]):
+        self.by_class: Dict[str, str] = {}
+        self.by_word: Dict[str, List[Tuple[str, str]]] = {}
+        for name, profile in profiles.items():
+            for pattern in profile.get("window_match", ()):
+                pattern = pattern.strip().lower()
+                words = self.WORD.findall(pattern)
+                if not words:
+                    continue
+                self.by_class.setdefault(pattern, name)
+                self.by_word.setdefault(words[0], []).append((f" {' '.join(words)} ", name))
+    
+    def __bool__(self) -> bool:
+        return bool(self.by_class)
+    
+    def lookup(self, wm_class: Tuple[str, ...], title: str) -> Optional[str]:
+        """Имя профиля для окна или None"""
+        for value in wm_class:
+            name = self.by_class.get(value.lower())
+            if name is not None:
+                return name
+        words = self.WORD.findall(title.lower())
+        if not words:
+            return None
+        normalized = f" {' '.join(words)} "
+        for word in words:
+            for phrase, name in self.by_word.get(word, ()):
+                if phrase in normalized:
+                    return name
+        return None
+
+class MacroManager:
+    """Менеджер для работы с макросами"""
+    
+    def __init__(self, macro_dir: str = "macros"):
+        self.macro_dir = Path(macro_dir)
+        self._ensure_macro_dir()
+        
+    def _ensure_macro_dir(self) -> None:
+        """Создает директорию для макросов, если она не существует"""
+        self.macro_dir.mkdir(exist_ok=True, parents=True)
+    
+    def save_macro(self, macro: Union[List[Dict], Dict[str, Any]], filename: str) -> bool:
+        """Сохраняет макрос в файл (список событий или структуру с блоками)"""
+        try:
+            macro_path = self.macro_dir / filename
+            with open(macro_path, 'w', encoding='utf-8') as f:
+                json.dump(macro, f, indent=4, ensure_ascii=False)
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения макроса: {e}")
+            return False
+    
+    def load_macro(self, filename: str) -> Optional[Union[List[Dict], Dict[str, Any]]]:
+        """Загружает макрос из файла"""
+        try:
+            macro_path = self.macro_dir / filename
+            with open(macro_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
         except Exception as e:
-            print(f"Ошибка инициализации клавиатуры: {e}")
+            logging.error(f"Ошибка загрузки макроса: {e}")
+            return None
+    
+    def get_macro_list(self) -> list:
+        """Возвращает список доступных макросов"""
+        macro_files = []
+        for file in self.macro_dir.glob("*.json"):
+            macro_files.append(file.name)
+        return sorted(macro_files)
+
+# Коды операций скомпилированного макроса
+OP_PRESS = 0
+OP_RELEASE = 1
+OP_CLICK = 2
+OP_MOVE = 3
+OP_WAIT = 4
+OP_LOOP = 5
+OP_CALL = 6
+
+EVENT_OPS = {'press': OP_PRESS, 'release': OP_RELEASE, 'click': OP_CLICK, 'move': OP_MOVE}
+
+class MacroBlock:
+    """
+    Скомпилированный блок макроса.
+    
+    Операции хранятся по колонкам в массивах array, а циклы и вызовы
+    под-макросов ссылаются на вложенные блоки. Повторы исполняются
+    движком воспроизведения и не копируют события в памяти.
+    """
+    
+    __slots__ = ('ops', 'delays', 'args_a', 'args_b', 'children')
+    
+    def __init__(self):
+        self.ops = array('B')      # код операции
+        self.delays = array('d')   # задержка перед операцией, сек
+        self.args_a = array('i')   # x / индекс кнопки / индекс вложенного блока
+        self.args_b = array('i')   # y / число повторов вложенного блока
+        self.children: List['MacroBlock'] = []
+    
+    def __len__(self) -> int:
+        return len(self.ops)
+    
+    def add(self, op: int, delay: float, a: int = 0, b: int = 0) -> None:
+        """Добавляет операцию в конец блока"""
+        self.ops.append(op)
+        self.delays.append(delay)
+        self.args_a.append(a)
+        self.args_b.append(b)
+    
+    def add_block(self, op: int, delay: float, block: 'MacroBlock', count: int) -> None:
+        """Добавляет цикл или вызов под-макроса"""
+        self.children.append(block)
+        self.add(op, delay, len(self.children) - 1, count)
+
+def compile_macro(macro: Union[List[Dict], Dict[str, Any]],
+                  loader: Optional[Callable[[str], Any]] = None) -> MacroBlock:
+    """
+    Компилирует макрос в дерево блоков MacroBlock
+    
+    Макрос - либо список записанных событий, либо словарь {"body": [...]},
+    где кроме событий допускаются элементы:
+        {"type": "loop", "count": N, "body": [...]}  - повтор N раз (0 - до остановки)
+        {"type": "wait", "duration": сек}            - пауза
+        {"type": "call", "macro": "имя.json", "count": N} - вызов под-макроса
+    Метки "timestamp" отсчитываются от начала своего блока; пока исполняется
+    вложенный элемент, часы родительского блока стоят.
+    
+    Args:
+        macro: Данные макроса
+        loader: Функция загрузки под-макроса по имени файла
+    
+    Raises:
+        ValueError: Некорректная структура макроса или рекурсивный вызов
+    """
+    body = macro.get('body') if isinstance(macro, dict) else macro
+    return _compile_body(body, loader, {}, ())
+
+def _compile_body(body, loader, called: Dict[str, MacroBlock], stack: Tuple[str, ...]) -> MacroBlock:
+    """Компилирует список элементов одного блока"""
+    if not isinstance(body, list):
+        raise ValueError("Тело блока макроса должно быть списком")
+    
+    block = MacroBlock()
+    prev = 0.0
+    pending = 0.0  # задержка пропущенных пустых блоков переносится на следующую операцию
+    for item in body:
+        kind = item.get('type')
+        timestamp = float(item.get('timestamp', prev))
+        delay = pending + max(0.0, timestamp - prev)
+        prev = max(prev, timestamp)
+        pending = 0.0
+        
+        if kind in EVENT_OPS:
+            op = EVENT_OPS[kind]
+            if op == OP_MOVE:
+                block.add(op, delay, int(item['x']), int(item['y']))
+            else:
+                button = item.get('button') or 'left'
+                if button not in MACRO_BUTTONS:
+                    raise ValueError(f"Неизвестная кнопка мыши: {button}")
+                block.add(op, delay, MACRO_BUTTONS.index(button))
+        elif kind == 'wait':
+            block.add(OP_WAIT, delay + max(0.0, float(item.get('duration', 0))))
+        elif kind in ('loop', 'call'):
+            count = int(item.get('count', 0 if kind == 'loop' else 1))
+            if count < 0:
+                raise ValueError("Число повторов не может быть отрицательным")
+            if kind == 'loop':
+                child = _compile_body(item.get('body'), loader, called, stack)
+            else:
+                child = _compile_call(item.get('macro'), loader, called, stack)
+            if len(child):
+                block.add_block(OP_LOOP if kind == 'loop' else OP_CALL, delay, child, count)
+            else:
+                pending = delay
+        else:
+            raise ValueError(f"Неизвестный тип элемента макроса: {kind}")
+    
+    if pending and len(block):
+        block.add(OP_WAIT, pending)
+    return block
+
+def _compile_call(name, loader, called: Dict[str, MacroBlock], stack: Tuple[str, ...]) -> MacroBlock:
+    """Компилирует под-макрос один раз; повторные вызовы разделяют один блок"""
+    if not name or loader is None:
+        raise ValueError("Вызов под-макроса недоступен: не указано имя или загрузчик")
+    if name in stack:
+        raise ValueError(f"Рекурсивный вызов макроса: {' -> '.join(stack + (name,))}")
+    if name not in called:
+        macro = loader(name)
+        if macro is None:
+            raise ValueError(f"Под-макрос не найден: {name}")
+        body = macro.get('body') if isinstance(macro, dict) else macro
+        called[name] = _compile_body(body, loader, called, stack + (name,))
+    return called[name]
+
+class MacroPlayer:
+    """
+    Воспроизведение макросов через бэкенд мыши (UInputMouse или XlibMacroBackend)
+    
+    Все операции, срок которых уже наступил, копятся в кадре бэкенда и
+    отправляются одной записью перед следующим ожиданием.
+    """
+    
+    def __init__(self, backend, injection_log: Optional['InjectionLog'] = None,
+                 on_finished: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            backend: Бэкенд мыши
+            injection_log: Журнал синтетических событий
+            on_finished: Вызывается из потока воспроизведения, когда макрос
+                         закончился или был остановлен
+        """
+        self.backend = backend
+        self.injection_log = injection_log
+        self.on_finished = on_finished
+        self.playing = False
+        self.paused = False
+        self.macro = None
+        self.program: Optional[MacroBlock] = None
+        self.thread = None
+        self._generation = 0
+    
+    def load(self, macro: Union[List[Dict], Dict[str, Any]],
+             loader: Optional[Callable[[str], Any]] = None) -> None:
+        """Загружает и компилирует макрос (ValueError при ошибке структуры)"""
+        program = compile_macro(macro, loader)
+        self.macro = macro
+        self.program = program
+    
+    def load_recorded(self, columns: 'EventColumns') -> None:
+        """Берет для воспроизведения только что записанные события"""
+        self.macro = columns.to_events()
+        self.program = columns.compile()
+    
+    def has_macro(self) -> bool:
+        """Есть ли что воспроизводить"""
+        return self.program is not None and len(self.program) > 0
+    
+    def play_macro(self, repeat: bool = False):
+        """Воспроизводит загруженный макрос (repeat - повторять до остановки)"""
+        if self.has_macro():
+            self.play_program(self.program, repeat)
+    
+    def play_program(self, program: MacroBlock, repeat: bool = False):
+        """Запускает скомпилированный макрос, прерывая текущее воспроизведение"""
+        if not len(program):
+            return
+        
+        self._generation += 1
+        self.playing = True
+        self.paused = False
+        
+        self.thread = threading.Thread(target=self._play_thread, args=(program, 0 if repeat else 1, self._generation))
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def _is_current(self, generation: int) -> bool:
+        """Проверяет, что поток воспроизведения не остановлен и не заменен новым"""
+        return self.playing and self._generation == generation
+    
+    def _play_thread(self, program: MacroBlock, count: int, generation: int):
+        """
+        Исполняет скомпилированный макрос.
+        
+        Вложенные блоки исполняются через явный стек кадров [блок, позиция,
+        оставшиеся повторы], поэтому циклы не разворачиваются в памяти.
+        """
+        backend = self.backend
+        note = self.injection_log.note if self.injection_log is not None else (lambda *args: None)
+        stack = [[program, 0, count]]
+        deadline = time.perf_counter()
+        
+        while stack and self._is_current(generation):
+            frame = stack[-1]
+            block, pc = frame[0], frame[1]
+            
+            if pc >= len(block.ops):
+                if frame[2] == 1:
+                    stack.pop()
+                else:
+                    if frame[2] > 1:
+                        frame[2] -= 1
+                    frame[1] = 0
+                continue
+            
+            frame[1] = pc + 1
+            deadline += block.delays[pc]
+            if self.paused or deadline > time.perf_counter():
+                # Все наступившие события уходят одной записью до ожидания
+                backend.flush()
+                deadline = self._wait_until(deadline, generation)
+                if deadline is None:
+                    break
+            
+            op = block.ops[pc]
+            if op == OP_MOVE:
+                note(OP_MOVE, -1, block.args_a[pc], block.args_b[pc])
+                backend.move(block.args_a[pc], block.args_b[pc])
+            elif op == OP_PRESS:
+                note(OP_PRESS, block.args_a[pc])
+                backend.press(block.args_a[pc])
+            elif op == OP_RELEASE:
+                note(OP_RELEASE, block.args_a[pc])
+                backend.release(block.args_a[pc])
+            elif op == OP_CLICK:
+                note(OP_PRESS, block.args_a[pc])
+                note(OP_RELEASE, block.args_a[pc])
+                backend.click(block.args_a[pc])
+            elif op == OP_LOOP or op == OP_CALL:
+                stack.append([block.children[block.args_a[pc]], 0, block.args_b[pc]])
+        
+        backend.flush()
+        if self._generation == generation:
+            self.playing = False
+            self.paused = False
+            if self.on_finished is not None:
+                self.on_finished()
+    
+    def _wait_until(self, deadline: float, generation: int) -> Optional[float]:
+        """
+        Ждет наступления момента deadline (perf_counter).
+        
+        Время, проведенное на паузе, сдвигает deadline. Возвращает
+        скорректированный deadline или None, если воспроизведение остановлено.
+        """
+        while self._is_current(generation):
+            if self.paused:
+                paused_at = time.perf_counter()
+                while self.paused and self._is_current(generation):
+                    time.sleep(0.01)
+                deadline += time.perf_counter() - paused_at
+                continue
+            
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return deadline
+            time.sleep(min(remaining, 0.01))
+        return None
+    
+    def pause_macro(self):
+        """Приостанавливает воспроизведение макроса"""
+        self.paused = True
+    
+    def resume_macro(self):
+        """Возобновляет воспроизведение макроса"""
+        self.paused = False
+    
+    def stop_macro(self):
+        """Останавливает воспроизведение макроса"""
+        self.playing = False
+        self.paused = False
+
+class InjectionLog:
+    """
+    Журнал событий, которые программа сама отправила в систему.
+    
+    XRecord видит и синтетические события кликера и макросов (XTest и
+    uinput неотличимы от настоящих). Перед инъекцией событие отмечается в
+    журнале, а запись отбрасывает событие, если находит для него пару не
+    старше window секунд. Время - в шкале time.monotonic().
+    """
+    
+    def __init__(self, capacity: int = 256, window: float = 0.05):
+        self.window = window
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def note(self, kind: int, button: int = -1, x: int = 0, y: int = 0) -> None:
+        """Отмечает событие перед инъекцией"""
+        entry = (time.monotonic(), kind, button, x, y)
+        with self._lock:
+            self._entries.append(entry)
+    
+    def consume(self, kind: int, button: int, x: int, y: int, event_time: float) -> bool:
+        """
+        Ищет и удаляет запись о синтетическом событии
+        
+        Returns:
+            bool: True если событие было отправлено самой программой
+        """
+        with self._lock:
+            entries = self._entries
+            # Устаревшие записи (событие так и не пришло) выбрасываем
+            while entries and entries[0][0] < event_time - self.window:
+                entries.popleft()
+            for entry in entries:
+                if entry[0] - self.window > event_time:
+                    break
+                if entry[1] == kind and (entry[2] == button if kind != OP_MOVE else entry[3:] == (x, y)):
+                    entries.remove(entry)
+                    return True
+        return False
+
+class EventColumns:
+    """
+    Колоночное хранилище записываемых событий.
+    
+    Время хранится в наносекундах от начала записи.
+    """
+    
+    __slots__ = ('kinds', 'buttons', 'xs', 'ys', 'times')
+    
+    def __init__(self):
+        self.kinds = array('B')    # OP_PRESS / OP_RELEASE / OP_CLICK / OP_MOVE
+        self.buttons = array('b')  # индекс в MACRO_BUTTONS, -1 - без кнопки
+        self.xs = array('i')
+        self.ys = array('i')
+        self.times = array('q')    # нс от начала записи
+    
+    def __len__(self) -> int:
+        return len(self.kinds)
+    
+    def append(self, kind: int, button: int, x: int, y: int, t_ns: int) -> None:
+        """Добавляет событие; время не может идти назад"""
+        if self.times and t_ns < self.times[-1]:
+            t_ns = self.times[-1]
+        self.kinds.append(kind)
+        self.buttons.append(button)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.times.append(t_ns)
+    
+    def compile(self) -> MacroBlock:
+        """Компилирует запись в блок макроса без промежуточных словарей"""
+        block = MacroBlock()
+        prev = 0
+        for kind, button, x, y, t_ns in zip(self.kinds, self.buttons, self.xs, self.ys, self.times):
+            if kind == OP_MOVE:
+                block.add(kind, (t_ns - prev) / 1e9, x, y)
+            else:
+                block.add(kind, (t_ns - prev) / 1e9, button)
+            prev = t_ns
+        return block
+    
+    def to_events(self) -> List[Dict]:
+        """Возвращает события в формате JSON-файла макроса"""
+        kind_names = {op: name for name, op in EVENT_OPS.items()}
+        return [
+            {
+                'type': kind_names[kind],
+                'button': MACRO_BUTTONS[button] if button >= 0 else None,
+                'x': x if kind == OP_MOVE else None,
+                'y': y if kind == OP_MOVE else None,
+                'timestamp': t_ns / 1e9
+            }
+            for kind, button, x, y, t_ns in zip(self.kinds, self.buttons, self.xs, self.ys, self.times)
+        ]
+
+# Событие ядра X11 (32 байта): type, detail, sequence, time, root, event, child,
+# root_x, root_y, event_x, event_y, state, same_screen
+X_CORE_EVENT = struct.Struct('=BBHIIIIhhhhHBx')
+
+class XRecordStream:
+    """
+    Контекст XRecord для событий устройств в отдельном соединении с X.
+    
+    record_enable_context блокирует свой поток и вызывает on_block на
+    каждую пачку данных от сервера; stop() выключает контекст из второго
+    соединения, после чего поток завершается.
+    """
+    
+    def __init__(self, first_event: int, last_event: int, on_block: Callable[[Any], None]):
+        self.events = (first_event, last_event)
+        self.on_block = on_block
+        self.running = False
+        self._display = None
+        self._context = None
+        self._thread = None
+    
+    def start(self) -> None:
+        self._display = Xlib.display.Display()
+        if not self._display.has_extension('RECORD'):
+            self._display.close()
+            raise OSError("X-сервер не поддерживает расширение RECORD")
+        self._context = self._display.record_create_context(
+            0, [record.AllClients], [{
+                'core_requests': (0, 0),
+                'core_replies': (0, 0),
+                'ext_requests': (0, 0, 0, 0),
+                'ext_replies': (0, 0, 0, 0),
+                'delivered_events': (0, 0),
+                'device_events': self.events,
+                'errors': (0, 0),
+                'client_started': False,
+                'client_died': False,
+            }])
+        self.running = True
+        self._thread = threading.Thread(target=self._record_thread)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        control = Xlib.display.Display()
+        try:
+            control.record_disable_context(self._context)
+            control.flush()
+        finally:
+            control.close()
+        self._thread.join(timeout=1.0)
+    
+    def _record_thread(self) -> None:
+        display = self._display
+        try:
+            display.record_enable_context(self._context, self._filter)
+        finally:
+            self.running = False
+            display.record_free_context(self._context)
+            display.close()
+    
+    def _filter(self, reply) -> None:
+        if reply.category == record.FromServer and not reply.client_swapped and reply.data:
+            self.on_block(reply.data)
+
+class XRecordRecorder:
+    """
+    Запись мыши через расширение XRecord.
+    
+    Сервер присылает события устройств блоками (одна запись XRecord может
+    содержать много событий), а блок целиком разбирается struct.iter_unpack
+    прямо в колонки EventColumns - без объекта и обработчика на событие.
+    Время событий - серверное (мс), отсчитывается от первого события записи.
+    
+    XRecord видит и нажатия на кнопки самой программы (остановка записи
+    мышью). Нажатия внутри прямоугольников exclude (x, y, ширина, высота в
+    координатах корневого окна) не записываются вместе с их отпусканием.
+    """
+    
+    def __init__(self, injection_log: Optional[InjectionLog] = None):
+        self.injection_log = injection_log
+        self.recorded = EventColumns()
+        self.recording = False
+        self.blocks = 0
+        # Заменяется целиком из GUI-потока; поток XRecord только читает
+        self.exclude: Tuple[Tuple[int, int, int, int], ...] = ()
+        # Кнопки, нажатие которых отброшено: их отпускание тоже не пишется
+        self._swallowed = set()
+        self._stream = XRecordStream(X.ButtonPress, X.MotionNotify, self._on_block)
+        self._base_time: Optional[int] = None
+    
+    def start(self) -> None:
+        """Начинает запись (отдельное соединение с X и поток XRecord)"""
+        if self.recording:
+            return
+        self.recorded = EventColumns()
+        self.blocks = 0
+        self._base_time = None
+        self._swallowed.clear()
+        self._stream.start()
+        self.recording = True
+    
+    def stop(self) -> None:
+        """Останавливает запись"""
+        if not self.recording:
+            return
+        self.recording = False
+        self._stream.stop()
+    
+    def _on_block(self, data: bytes) -> None:
+        """Разбирает блок событий от сервера в колонки"""
+        data = data[:len(data) - len(data) % X_CORE_EVENT.size]
+        self.blocks += 1
+        
+        columns = self.recorded
+        kinds, buttons, xs, ys, times = columns.kinds, columns.buttons, columns.xs, columns.ys, columns.times
+        # Пустой журнал - проверять нечего
+        injection_log = self.injection_log
+        if injection_log is not None and not len(injection_log):
+            injection_log = None
+        arrived = time.monotonic()
+        exclude = self.exclude
+        swallowed = self._swallowed
+        base = self._base_time
+        last = times[-1] if times else 0
+        
+        for ev_type, detail, _, server_time, _, _, _, x, y, _, _, _, _ in X_CORE_EVENT.iter_unpack(data):
+            ev_type &= 0x7f
+            if ev_type == X.MotionNotify:
+                kind, button = OP_MOVE, -1
+            elif ev_type == X.ButtonPress or ev_type == X.ButtonRelease:
+                if detail not in X_BUTTONS:
+                    continue  # колесо (кнопки 4-7)
+                kind = OP_PRESS if ev_type == X.ButtonPress else OP_RELEASE
+                button = X_BUTTONS.index(detail)
+            else:
+                continue
+            if injection_log is not None and injection_log.consume(kind, button, x, y, arrived):
+                continue
+            if kind == OP_PRESS and any(left <= x < left + width and top <= y < top + height
+                                        for left, top, width, height in exclude):
+                swallowed.add(button)
+                continue
+            if kind == OP_RELEASE and button in swallowed:
+                swallowed.discard(button)
+                continue
+            
+            if base is None:
+                base = self._base_time = server_time
+            # Серверное время - 32-битные миллисекунды с переполнением
+            t_ns = ((server_time - base) & 0xFFFFFFFF) * 1_000_000
+            if t_ns < last:
+                t_ns = last
+            last = t_ns
+            kinds.append(kind)
+            buttons.append(button)
+            xs.append(x if kind == OP_MOVE else 0)
+            ys.append(y if kind == OP_MOVE else 0)
+            times.append(t_ns)
+
+class PointerTracker:
+    """
+    Последняя позиция указателя в памяти.
+    
+    Позицию обновляет поток XRecord (только MotionNotify; из каждого блока
+    берется одно последнее событие) и собственные перемещения программы.
+    Пока поток работает, кэш всегда актуален; без него позиция считается
+    устаревшей через max_age секунд и запрашивается у X-сервера.
+    """
+    
+    def __init__(self, query: Callable[[], Tuple[int, int]], max_age: float = 0.05):
+        self.query = query
+        self.max_age = max_age
+        self.queries = 0
+        # (x, y, время monotonic) - заменяется целиком одним присваиванием
+        self.state: Optional[Tuple[int, int, float]] = None
+        self._stream = None
+        if LINUX_SUPPORT:
+            try:
+                self._stream = XRecordStream(X.MotionNotify, X.MotionNotify, self._on_block)
+                self._stream.start()
+            except Exception as e:
+                print(f"Трекер указателя без XRecord: {e}")
+                self._stream = None
+    
+    def update(self, x: int, y: int) -> None:
+        self.state = (x, y, time.monotonic())
+    
+    def position(self) -> Tuple[int, int]:
+        """Текущая позиция; запрос к X только при устаревшем кэше"""
+        state = self.state
+        if state is not None and ((self._stream is not None and self._stream.running) or
+                                  time.monotonic() - state[2] <= self.max_age):
+            return state[0], state[1]
+        self.queries += 1
+        x, y = self.query()
+        self.update(x, y)
+        return x, y
+    
+    def _on_block(self, data: bytes) -> None:
+        # Важно только последнее перемещение в блоке
+        offset = len(data) - len(data) % X_CORE_EVENT.size - X_CORE_EVENT.size
+        while offset >= 0:
+            event = X_CORE_EVENT.unpack_from(data, offset)
+            if event[0] & 0x7f == X.MotionNotify:
+                self.update(event[7], event[8])
+                return
+            offset -= X_CORE_EVENT.size
+    
+    def stop(self) -> None:
+        """Выключает контекст XRecord; поток трекера закрывает свое соединение"""
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream = None
+
+class ActiveWindowWatcher:
+    """
+    Следит за активным окном X11 по событиям, без опроса.
+    
+    На корневом окне выбирается PropertyChangeMask: оконный менеджер
+    меняет _NET_ACTIVE_WINDOW при каждой смене фокуса. У активного окна
+    отслеживается еще и заголовок (вкладки браузера меняют его без смены
+    фокуса). Отдельное соединение с X; поток спит в select.
+    """
+    
+    def __init__(self, on_change: Callable[[Tuple[str, ...], str], None]):
+        """
+        Args:
+            on_change: Вызывается с (WM_CLASS, заголовок) активного окна (поток слежения)
+        """
+        self.on_change = on_change
+        self.running = False
+        self._display = None
+        self._thread = None
+        self._wake_r = self._wake_w = -1
+        self._window = None
+        # WM_CLASS окна не меняется - читаем один раз на окно
+        self._classes: Dict[int, Tuple[str, ...]] = {}
+    
+    def start(self) -> None:
+        display = Xlib.display.Display()
+        self._root = display.screen().root
+        self._active_atom = display.intern_atom('_NET_ACTIVE_WINDOW')
+        self._name_atom = display.intern_atom('_NET_WM_NAME')
+        self._utf8_atom = display.intern_atom('UTF8_STRING')
+        self._title_atoms = (self._name_atom, display.intern_atom('WM_NAME'))
+        self._root.change_attributes(event_mask=X.PropertyChangeMask)
+        display.flush()
+        self._display = display
+        self.running = True
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._watch_thread)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self.running = False
+        if self._wake_w >= 0:
+            os.write(self._wake_w, b"q")
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        if self._wake_w >= 0 and not (self._thread and self._thread.is_alive()):
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._wake_r = self._wake_w = -1
+    
+    def _watch_thread(self) -> None:
+        display = self._display
+        try:
+            self._report()
+            while self.running:
+                readable = select.select([display.fileno(), self._wake_r], [], [])[0]
+                if self._wake_r in readable:
+                    break
+                changed = False
+                # Пачка событий - одна проверка окна
+                for _ in range(display.pending_events()):
+                    event = display.next_event()
+                    if event.type != X.PropertyNotify:
+                        continue
+                    if event.atom == self._active_atom or (
+                            self._window is not None and event.window.id == self._window.id and
+                            event.atom in self._title_atoms):
+                        changed = True
+                if changed:
+                    self._report()
+        except Exception as e:
+            print(f"Слежение за активным окном остановлено: {e}")
+        finally:
+            self.running = False
+            display.close()
+    
+    def _report(self) -> None:
+        try:
+            prop = self._root.get_full_property(self._active_atom, X.AnyPropertyType)
+            window_id = prop.value[0] if prop is not None and len(prop.value) else 0
+            if self._window is None or self._window.id != window_id:
+                self._follow(window_id)
+            if not window_id:
+                self.on_change((), "")
+                return
+            
+            wm_class = self._classes.get(window_id)
+            if wm_class is None:
+                wm_class = tuple(self._window.get_wm_class() or ())
+                if len(self._classes) > 256:
+                    self._classes.clear()
+                self._classes[window_id] = wm_class
+            name = self._window.get_full_property(self._name_atom, self._utf8_atom)
+            title = name.value if name is not None else (self._window.get_wm_name() or "")
+        except Xlib.error.XError:
+            return  # окно успело закрыться - следующее событие придет
+        if isinstance(title, bytes):
+            title = title.decode('utf-8', 'replace')
+        self.on_change(wm_class, title)
+    
+    def _follow(self, window_id: int) -> None:
+        """Переносит подписку на заголовок на новое активное окно"""
+        ignore = lambda *args: None
+        if self._window is not None:
+            self._window.change_attributes(event_mask=X.NoEventMask, onerror=ignore)
+        self._window = self._display.create_resource_object('window', window_id) if window_id else None
+        if self._window is not None:
+            self._window.change_attributes(event_mask=X.PropertyChangeMask, onerror=ignore)
+
+# Модификаторы горячих клавиш: имя -> бит маски
+MODIFIER_BITS = {'ctrl': 1, 'shift': 2, 'alt': 4, 'win': 8}
+KEY_ALIASES = {
+    'control': 'ctrl', 'left ctrl': 'ctrl', 'right ctrl': 'ctrl', 'leftctrl': 'ctrl', 'rightctrl': 'ctrl',
+    'left shift': 'shift', 'right shift': 'shift', 'leftshift': 'shift', 'rightshift': 'shift',
+    'left alt': 'alt', 'right alt': 'alt', 'alt gr': 'alt', 'leftalt': 'alt', 'rightalt': 'alt',
+    'windows': 'win', 'left windows': 'win', 'right windows': 'win', 'super': 'win', 'meta': 'win',
+    'leftmeta': 'win', 'rightmeta': 'win', 'cmd': 'win', 'command': 'win',
+    'escape': 'esc', 'return': 'enter',
+}
+# Кнопки мыши как триггеры (в порядке MACRO_BUTTONS)
+MOUSE_TRIGGER_NAMES = ('mouse1', 'mouse2', 'mouse3', 'mouse4', 'mouse5')
+
+def normalize_key_name(name: str) -> str:
+    """Приводит имя клавиши к каноническому виду"""
+    name = name.strip().lower()
+    return KEY_ALIASES.get(name, name)
+
+def parse_hotkey(spec: str) -> List[Tuple[int, str]]:
+    """
+    Разбирает запись горячей клавиши
+    
+    Примеры: "F6", "ctrl+shift+x", "mouse4", последовательность "ctrl+k, ctrl+c".
+    
+    Returns:
+        List[Tuple[int, str]]: Шаги (маска модификаторов, основная клавиша)
+    
+    Raises:
+        ValueError: Некорректная запись
+    """
+    steps = []
+    for step in spec.split(','):
+        names = [normalize_key_name(part) for part in step.split('+')]
+        *modifiers, key = names
+        if not key or not all(modifiers):
+            raise ValueError(f"Пустая клавиша в '{spec}'")
+        if key in MODIFIER_BITS:
+            raise ValueError(f"Шаг '{step.strip()}' должен заканчиваться не модификатором")
+        mods = 0
+        for name in modifiers:
+            if name not in MODIFIER_BITS:
+                raise ValueError(f"В шаге '{step.strip()}' больше одной основной клавиши")
+            mods |= MODIFIER_BITS[name]
+        steps.append((mods, key))
+    return steps
+
+class HotkeyMatcher:
+    """
+    Инкрементальный автомат сопоставления горячих клавиш.
+    
+    Привязки компилируются в префиксное дерево по шагам (модификаторы,
+    клавиша). Автомат хранит маску зажатых модификаторов и текущий узел
+    дерева, поэтому любое событие обходится одним-двумя поисками в словаре.
+    Источник событий не важен: хуки keyboard/mouse и evdev подают сюда
+    одинаково нормализованные имена.
+    
+    Привязка с действием на отпускание работает как удержание: действие
+    нажатия вызывается сразу при нажатии, действие отпускания - при
+    отпускании последней клавиши привязки.
+    """
+    
+    def __init__(self, bindings: List[Tuple], sequence_timeout: float = 1.0):
+        """
+        Args:
+            bindings: Кортежи (запись горячей клавиши, действие) или
+                      (запись, действие нажатия, действие отпускания);
+                      при совпадении записей срабатывает привязка, указанная раньше
+            sequence_timeout: Максимальная пауза между шагами последовательности, сек
+        
+        Raises:
+            ValueError: Некорректная или конфликтующая запись
+        """
+        self.root: Dict[Tuple[int, str], Any] = {}
+        self.keys = set()
+        for spec, action, *on_release in bindings:
+            steps = parse_hotkey(spec)
+            node = self.root
+            for step in steps[:-1]:
+                node = node.setdefault(step, {})
+                if not isinstance(node, dict):
+                    raise ValueError(f"Последовательность '{spec}' начинается с другой горячей клавиши")
+            if isinstance(node.get(steps[-1]), dict):
+                raise ValueError(f"Горячая клавиша '{spec}' - начало другой последовательности")
+            node.setdefault(steps[-1], (action, on_release[0] if on_release else None))
+            for mods, key in steps:
+                self.keys.add(key)
+                self.keys.update(name for name, bit in MODIFIER_BITS.items() if mods & bit)
+        
+        self.uses_mouse = any(key in MOUSE_TRIGGER_NAMES for key in self.keys)
+        self.sequence_timeout = sequence_timeout
+        self.node = self.root
+        self.mods = 0
+        self.pressed = set()
+        self.held: Dict[str, Callable[[], None]] = {}
+        self.step_time = 0.0
+        self._lock = threading.Lock()
+    
+    def feed(self, key: str, down: bool, before_action: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Обрабатывает нажатие или отпускание (имя уже нормализовано)
+        
+        Args:
+            key: Имя клавиши
+            down: Нажатие (True) или отпускание
+            before_action: Вызывается после совпадения, но до действия привязки
+        
+        Returns:
+            bool: True если событие вызвало действие
+        """
+        bit = MODIFIER_BITS.get(key)
+        with self._lock:
+            if bit:
+                self.mods = (self.mods | bit) if down else (self.mods & ~bit)
+                return False
+            if not down:
+                self.pressed.discard(key)
+                action = self.held.pop(key, None)
+            elif key in self.pressed:
+                return False  # автоповтор зажатой клавиши
+            else:
+                self.pressed.add(key)
+                action = self._match(key)
+        
+        if action is None:
+            return False
+        if before_action is not None:
+            before_action()
+        action()
+        return True
+    
+    def adopt(self, other: Optional['HotkeyMatcher']) -> None:
+        """
+        Перенимает состояние клавиш у заменяемого автомата
+        
+        Зажатые клавиши остаются зажатыми: автоповтор не сработает повторно,
+        а отпускание выполнит действие отпускания старой привязки.
+        """
+        if other is None:
+            return
+        with other._lock:
+            self.mods = other.mods
+            self.pressed = set(other.pressed)
+            self.held = dict(other.held)
+    
+    def _match(self, key: str) -> Optional[Callable[[], None]]:
+        """Шаг автомата по нажатию (под блокировкой); возвращает действие"""
+        step = (self.mods, key)
+        node = self.node
+        if node is not self.root and time.monotonic() - self.step_time > self.sequence_timeout:
+            node = self.root
+        target = node.get(step)
+        if target is None and node is not self.root:
+            target = self.root.get(step)
+        
+        if isinstance(target, dict):
+            self.node = target
+            self.step_time = time.monotonic()
+            return None
+        self.node = self.root
+        if target is None:
+            return None
+        action, on_release = target
+        if on_release is not None:
+            self.held[key] = on_release
+        return action
 
-class ConfigManager:
+# Ключи конфигурации, от которых зависит работающий движок
+INTERVAL_CONFIG_KEYS = frozenset(("acceleration", "start_interval", "min_interval", "base_interval"))
+HOTKEY_CONFIG_KEYS = frozenset(("acceleration", "hold_mode", "reset_key", "lkm_key", "pkm_key", "profile_key"))
+
+# Лог действий: емкость в записях и файл для долгой истории (ротация по размеру)
+LOG_CAPACITY = 5000
+LOG_FILE = Path("logs") / "autoclicker.log"
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+class LogBuffer:
     """
-    Менеджер конфигураций для сохранения и загрузки настроек в формате JSON
+    Кольцевой буфер записей лога фиксированной емкости.
+    
+    Запись с номером seq лежит в заранее выделенном списке по индексу
+    seq % capacity, новые записи затирают самые старые, поэтому память и
+    время добавления не растут за сессию.
     """
     
-    def __init__(self, config_dir: str = "config", default_filename: str = "autoclicker_config.json"):
-        self.config_dir = Path(config_dir)
-        self.default_filename = default_filename
-        self.config_path = self.config_dir / default_filename
-        self._ensure_config_dir()
-        
-        # Настройка логирования
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
+    def __init__(self, capacity: int = LOG_CAPACITY):
+        self.capacity = capacity
+        # (уровень, время создания, сообщение)
+        self.records: List[Optional[Tuple[int, float, str]]] = [None] * capacity
+        self.first = 0  # seq самой старой хранимой записи
+        self.total = 0  # seq следующей записи
+        self.min_level = logging.NOTSET
+        # Номера seq записей, прошедших фильтр по уровню; None - видны все
+        self.rows: Optional[List[int]] = None
     
-    def _ensure_config_dir(self) -> None:
-        """Создает директорию для конфигураций, если она не существует"""
-        self.config_dir.mkdir(exist_ok=True, parents=True)
+    def __len__(self) -> int:
+        """Число видимых строк"""
+        return self.total - self.first if self.rows is None else len(self.rows)
     
-    def save_config(self, config_data: Dict[str, Any], filename: Optional[str] = None) -> bool:
+    def line(self, row: int) -> Tuple[int, str]:
+        """Уровень и текст видимой строки"""
+        seq = self.first + row if self.rows is None else self.rows[row]
+        level, created, message = self.records[seq % self.capacity]
+        return level, f"[{time.strftime('%H:%M:%S', time.localtime(created))}] {message}"
+    
+    def extend(self, records: List[Tuple[int, float, str]]) -> int:
         """
-        Сохраняет конфигурацию в JSON файл
-        
-        Args:
-            config_data: Словарь с данными конфигурации
-            filename: Имя файла (если None, используется имя по умолчанию)
+        Добавляет пачку записей, вытесняя самые старые
         
         Returns:
-            bool: True если сохранение успешно, False в противном случае
+            int: Сколько видимых строк ушло из начала
         """
-        try:
-            config_path = self.config_dir / (filename or self.default_filename)
-            
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=4, ensure_ascii=False)
-            
-            self.logger.info(f"Конфигурация сохранена: {config_path}")
+        first = max(self.first, self.total + len(records) - self.capacity)
+        if self.rows is None:
+            dropped = min(first, self.total) - self.first
+        else:
+            dropped = bisect.bisect_left(self.rows, first)
+            del self.rows[:dropped]
+        # Пачка больше буфера: ее начало сразу вытеснилось бы
+        skip = max(0, first - self.total)
+        seq = self.total + skip
+        for s, record in enumerate(records[skip:], seq):
+            self.records[s % self.capacity] = record
+            if self.rows is not None and record[0] >= self.min_level:
+                self.rows.append(s)
+        self.first = first
+        self.total = seq + len(records) - skip
+        return dropped
+    
+    def set_min_level(self, level: int) -> None:
+        """Показывает только записи не ниже level (logging.NOTSET - все)"""
+        self.min_level = level
+        if level <= logging.NOTSET:
+            self.rows = None
+        else:
+            self.rows = [seq for seq in range(self.first, self.total)
+                         if self.records[seq % self.capacity][0] >= level]
+
+class LogView(QAbstractScrollArea):
+    """
+    Просмотр LogBuffer: рисуются только строки, попавшие в окно.
+    
+    Полоса прокрутки считает в строках, поэтому добавление пачки не
+    перестраивает разметку всего лога, а перерисовка не зависит от его длины.
+    """
+    
+    LEVEL_COLORS = {logging.WARNING: QColor("#FFA726"), logging.ERROR: QColor("#ef5350")}
+    MARGIN = 4
+    
+    def __init__(self, buffer: LogBuffer, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.verticalScrollBar().setSingleStep(1)
+    
+    def refresh(self, dropped: int = 0) -> None:
+        """
+        Буфер изменился: у нижнего края держимся за последней строкой,
+        иначе остаемся на тех же строках, несмотря на вытеснение
+        """
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        value = scrollbar.value() - dropped
+        self.update_scroll_range()
+        scrollbar.setValue(scrollbar.maximum() if at_bottom else value)
+        self.viewport().update()
+    
+    def update_scroll_range(self) -> None:
+        page = max(1, self.viewport().height() // self.fontMetrics().height())
+        scrollbar = self.verticalScrollBar()
+        scrollbar.setPageStep(page)
+        scrollbar.setRange(0, max(0, len(self.buffer) - page))
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.refresh()
+    
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setFont(self.font())
+        metrics = self.fontMetrics()
+        height = metrics.height()
+        width = self.viewport().width() - 2 * self.MARGIN
+        color = self.palette().color(QPalette.Text)
+        first = self.verticalScrollBar().value()
+        visible = min(len(self.buffer) - first, self.viewport().height() // height + 1)
+        for i in range(visible):
+            level, text = self.buffer.line(first + i)
+            painter.setPen(self.LEVEL_COLORS.get(level, color))
+            painter.drawText(self.MARGIN, i * height + metrics.ascent(),
+                             metrics.elidedText(text, Qt.ElideRight, width))
+    
+    def viewportEvent(self, event):
+        # Обрезанная строка целиком - во всплывающей подсказке
+        if event.type() == QEvent.ToolTip:
+            row = self.verticalScrollBar().value() + event.pos().y() // self.fontMetrics().height()
+            if row < len(self.buffer):
+                QToolTip.showText(event.globalPos(), self.buffer.line(row)[1], self.viewport())
+            else:
+                QToolTip.hideText()
             return True
-            
-        except Exception as e:
-            self.logger.error(f"Ошибка сохранения конфигурации: {e}")
-            return False
+        return super().viewportEvent(event)
+
+class GuiUpdateQueue(QObject):
+    """
+    Обновления интерфейса из фоновых потоков.
     
-    def load_config(self, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    post() вызывается из любого потока: запись добавляется в deque (append
+    атомарен, блокировок нет). GUI-поток разбирает очередь таймером не чаще
+    max_rate раз в секунду. Значения одного ключа схлопываются до последнего,
+    пакетные ключи получают все значения списком, поэтому спам горячими
+    клавишами дает не больше одной перерисовки за тик.
+    """
+    
+    # Очередь ожила (испускается из потока, вызвавшего post)
+    _wakeup = pyqtSignal()
+    
+    def __init__(self, max_rate: int = 20, parent: Optional[QObject] = None):
         """
-        Загружает конфигурацию из JSON файла
-        
         Args:
-            filename: Имя файла (если None, используется имя по умолчанию)
+            max_rate: Максимум разборов очереди в секунду
+            parent: Владелец из GUI-потока
+        """
+        super().__init__(parent)
+        self._queue = deque()
+        self._handlers: Dict[str, Tuple[Callable[[Any], None], bool]] = {}
+        self._scheduled = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(max(1, round(1000 / max_rate)))
+        self.timer.timeout.connect(self.flush)
+        self._wakeup.connect(self._on_wakeup)
+    
+    def register(self, key: str, handler: Callable[[Any], None], batch: bool = False) -> None:
+        """
+        Назначает обработчик ключа
         
-        Returns:
-            Optional[Dict]: Словарь с данными конфигурации или None при ошибке
+        Args:
+            key: Ключ обновления
+            handler: Получает последнее значение, а при batch - список всех по порядку
+            batch: Не схлопывать значения (например, строки лога)
         """
-        try:
-            config_path = self.config_dir / (filename or self.default_filename)
-            
-            if not config_path.exists():
-                self.logger.warning(f"Файл конфигурации не найден: {config_path}")
-                return None
-            
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
-            
-            self.logger.info(f"Конфигурация загружена: {config_path}")
-            return config_data
-            
-        except Exception as e:
-            self.logger.error(f"Ошибка загрузки конфигурации: {e}")
-            return None
+        self._handlers[key] = (handler, batch)
     
-    def get_config_list(self) -> list:
-        """Возвращает список доступных конфигурационных файлов"""
-        config_files = []
-        for file in self.config_dir.glob("*.json"):
-            config_files.append(file.name)
-        return sorted(config_files)
+    def post(self, key: str, value: Any) -> None:
+        """Ставит обновление в очередь (любой поток)"""
+        self._queue.append((key, value))
+        if not self._scheduled:
+            self._scheduled = True
+            self._wakeup.emit()
+    
+    def _on_wakeup(self) -> None:
+        # Таймер стоит - с прошлого разбора прошел хотя бы интервал, разбираем сразу
+        if not self.timer.isActive():
+            self.timer.start()
+            self.flush()
+    
+    def flush(self) -> None:
+        """Применяет накопленные обновления (GUI-поток)"""
+        self._scheduled = False
+        queue = self._queue
+        if not queue:
+            # Тик без обновлений: таймер не крутится в простое
+            self.timer.stop()
+            return
+        pending: Dict[str, Any] = {}
+        # Только уже поставленное: поток, который пишет без остановки, не задержит GUI
+        for _ in range(len(queue)):
+            key, value = queue.popleft()
+            if self._handlers[key][1]:
+                pending.setdefault(key, []).append(value)
+            else:
+                pending[key] = value
+        for key, value in pending.items():
+            self._handlers[key][0](value)
 
 class BeautifulAutoClicker(QMainWindow):
-    def __init__(self):
+    # Список клавиатур изменился (испускается из потока слушателя)
+    devices_changed = pyqtSignal(list)
+    # Замер задержки завершен (из фонового потока)
+    latency_probe_finished = pyqtSignal()
+    # Файл в директории конфигураций изменился (из потока слежения)
+    config_changed = pyqtSignal(str)
+    # Профиль переключен по горячей клавише (испускается из потока слушателя)
+    profile_switched = pyqtSignal(str)
+    # Воспроизведение макроса закончилось (из потока воспроизведения)
+    macro_finished = pyqtSignal()
+    # Сменилось активное окно X11 (из потока слежения)
+    active_window_changed = pyqtSignal(tuple, str)
+    
+    def __init__(self, helper: Optional[HelperClient] = None):
         super().__init__()
         self.setWindowTitle("DUHA5656 Autoclicker - Linux")
+        # Автосохранение включается в конце __init__, когда виджеты заполнены
+        self.autosave = False
         self.setGeometry(100, 100, 800, 700)
         
         # Инициализация менеджера конфигураций
         self.config_manager = ConfigManager()
+        # Профили: все конфигурации загружаются заранее и переключаются по клавише
+        self.profiles = ProfileStore(self.config_manager, self.parse_profile)
+        self.profiles.load_all()
+        self.window_index = WindowProfileIndex(self.profiles.profiles)
+        # Профиль, выбранный вручную: к нему возвращаемся из окна без профиля
+        self.manual_profile: Optional[str] = None
         
         # Инициализация Linux-компонентов
         self.linux_mouse = LinuxMouseController() if LINUX_SUPPORT else None
+        # Привилегированный помощник: через него идут evdev и uinput (запуск через sudo)
+        self.helper = helper
         self.keyboard_listener = None
-        self.hotkeys = {}
+        self.latency_probe: Optional[LatencyProbe] = None
+        # Автомат горячих клавиш (заменяется целиком при смене настроек)
+        self.hotkey_matcher: Optional[HotkeyMatcher] = None
+        self.key_names: Dict[int, str] = evdev_key_names() if LINUX_SUPPORT else {}
+        self.key_codes: Dict[str, List[int]] = {}
+        for code, name in self.key_names.items():
+            self.key_codes.setdefault(name, []).append(code)
         
         # Текущая тема (по умолчанию фиолетовая)
         self.current_theme = "purple"
@@ -337,13 +2607,95 @@ class BeautifulAutoClicker(QMainWindow):
         pkm_layout.addWidget(self.pkm_key)
         hotkey_layout.addLayout(pkm_layout)
         
+        # Клавиша профиля: из любого профиля переключает на этот файл конфигурации
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Клавиша профиля:"))
+        self.profile_key = QComboBox()
+        self.profile_key.addItems(["", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9", "F10", "F11", "F12"])
+        profile_layout.addWidget(self.profile_key)
+        hotkey_layout.addLayout(profile_layout)
+        
+        # Окна профиля: при фокусе на таком окне профиль выбирается сам
+        window_match_layout = QHBoxLayout()
+        window_match_layout.addWidget(QLabel("Окна профиля:"))
+        self.window_match = QLineEdit()
+        self.window_match.setPlaceholderText("WM_CLASS или слова заголовка через запятую")
+        self.window_match.setToolTip("Например: Minecraft, lunarclient. Окно без профиля возвращает выбранный вручную")
+        window_match_layout.addWidget(self.window_match)
+        hotkey_layout.addLayout(window_match_layout)
+        
+        # Режим удержания: кликает, только пока клавиша ЛКМ/ПКМ зажата
+        self.hold_mode = QCheckBox("Кликать только при удержании клавиши")
+        self.hold_mode.setToolTip("Клавиши ЛКМ/ПКМ (например, mouse4) включают кликер на время удержания")
+        self.hold_mode.toggled.connect(self.rebuild_hotkey_matcher)
+        hotkey_layout.addWidget(self.hold_mode)
+        
         # Оптимизация
         self.optimization = QCheckBox("Включить оптимизацию (меньше КПС, но стабильнее)")
         self.optimization.setChecked(True)
         hotkey_layout.addWidget(self.optimization)
         
+        self.passive_hotkeys = QCheckBox("Пассивный режим (не захватывать клавиатуру)")
+        self.passive_hotkeys.setChecked(True)
+        hotkey_layout.addWidget(self.passive_hotkeys)
+        
+        # Без пассивного режима захватывается только эта клавиатура
+        grab_layout = QHBoxLayout()
+        grab_layout.addWidget(QLabel("Захватывать:"))
+        self.grab_device = QComboBox()
+        self.grab_device.addItem("первую найденную клавиатуру", "")
+        self.grab_device.setToolTip("Список заполняется устройствами, которые слушает запущенный кликер")
+        self.grab_device.setEnabled(False)
+        self.passive_hotkeys.toggled.connect(lambda passive: self.grab_device.setEnabled(not passive))
+        grab_layout.addWidget(self.grab_device, 1)
+        hotkey_layout.addLayout(grab_layout)
+        
+        self.latency_btn = QPushButton("⏱ Замер задержки")
+        self.latency_btn.setToolTip("Нажимает клавишу ЛКМ через виртуальную клавиатуру и меряет время до первого клика")
+        self.latency_btn.clicked.connect(self.run_latency_probe)
+        self.latency_probe_finished.connect(lambda: self.latency_btn.setEnabled(True))
+        hotkey_layout.addWidget(self.latency_btn)
+        
+        # Слушаемые устройства (обновляется при горячем подключении)
+        self.devices_label = QLabel("Устройства ввода: слушатель не запущен")
+        self.devices_label.setWordWrap(True)
+        hotkey_layout.addWidget(self.devices_label)
+        self.devices_changed.connect(self.update_devices)
+        
         layout.addWidget(hotkey_group)
         
+        # Управление макросами
+        macro_group = QGroupBox("Макросы")
+        macro_layout = QHBoxLayout(macro_group)
+        
+        self.load_macro_btn = QPushButton("📂 Загрузить макрос")
+        self.load_macro_btn.clicked.connect(self.load_macro)
+        macro_layout.addWidget(self.load_macro_btn)
+        
+        self.play_macro_btn = QPushButton("▶️ Воспроизвести")
+        self.play_macro_btn.clicked.connect(self.play_macro)
+        macro_layout.addWidget(self.play_macro_btn)
+        
+        self.pause_macro_btn = QPushButton("⏸️ Пауза")
+        self.pause_macro_btn.clicked.connect(self.pause_macro)
+        self.pause_macro_btn.setEnabled(False)
+        macro_layout.addWidget(self.pause_macro_btn)
+        
+        self.stop_macro_btn = QPushButton("⏹️ Стоп")
+        self.stop_macro_btn.clicked.connect(self.stop_macro)
+        self.stop_macro_btn.setEnabled(False)
+        macro_layout.addWidget(self.stop_macro_btn)
+        
+        self.record_macro_btn = QPushButton("⏺️ Запись")
+        self.record_macro_btn.clicked.connect(self.toggle_macro_recording)
+        macro_layout.addWidget(self.record_macro_btn)
+        
+        self.save_macro_btn = QPushButton("💾 Сохранить")
+        self.save_macro_btn.clicked.connect(self.save_macro)
+        macro_layout.addWidget(self.save_macro_btn)
+        
+        layout.addWidget(macro_group)
+        
         # Кнопки управления конфигурациями
         config_layout = QHBoxLayout()
         
@@ -379,30 +2731,113 @@ class BeautifulAutoClicker(QMainWindow):
         # Лог
         log_group = QGroupBox("Лог действий")
         log_layout = QVBoxLayout(log_group)
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setFont(QFont("Consolas", 10))
-        log_layout.addWidget(self.log_text)
+        log_controls = QHBoxLayout()
+        log_controls.addWidget(QLabel("Показывать:"))
+        self.log_level = QComboBox()
+        self.log_level.addItem("Все", logging.NOTSET)
+        self.log_level.addItem("Предупреждения и ошибки", logging.WARNING)
+        self.log_level.addItem("Только ошибки", logging.ERROR)
+        self.log_level.currentIndexChanged.connect(self.change_log_level)
+        log_controls.addWidget(self.log_level)
+        self.log_to_file = QCheckBox(f"Писать в файл ({LOG_FILE})")
+        self.log_to_file.toggled.connect(self.set_log_file)
+        log_controls.addWidget(self.log_to_file)
+        log_controls.addStretch()
+        log_layout.addLayout(log_controls)
+        
+        # Последние LOG_CAPACITY записей; рисуются только видимые строки
+        self.log_buffer = LogBuffer()
+        self.log_view = LogView(self.log_buffer)
+        self.log_view.setFont(QFont("Consolas", 10))
+        log_layout.addWidget(self.log_view)
         layout.addWidget(log_group)
+        self.log_file_handler: Optional[RotatingFileHandler] = None
+        
+        # Лог пишут и фоновые потоки: записи копятся и добавляются пачкой, до 20 раз в секунду
+        self.ui_updates = GuiUpdateQueue(parent=self)
+        self.ui_updates.register("log", self.append_log_records, batch=True)
         
         # Инициализация кликера
         self.clicker_active = False
         self.left_clicker = None
         self.right_clicker = None
+        # Будит цикл кликера при включении (без опроса в простое)
+        self.clicker_wake = threading.Event()
+        # Пауза цикла кликера (читается на каждой итерации, меняется на лету)
+        self.loop_sleep = 0.001
+        
+        # Макросы: виртуальная мышь uinput, при недоступности - Xlib
+        self.macro_manager = MacroManager()
+        # Свои клики и события макросов не попадают в запись
+        self.injection_log = InjectionLog()
+        self.uinput_mouse = None
+        macro_backend = None
+        if LINUX_SUPPORT:
+            try:
+                if self.helper is not None:
+                    self.uinput_mouse = self.helper.open_pointer(*self.linux_mouse.screen_size())
+                    if self.uinput_mouse is None:
+                        raise OSError("помощник не смог открыть /dev/uinput")
+                else:
+                    self.uinput_mouse = UInputMouse(*self.linux_mouse.screen_size())
+                macro_backend = self.uinput_mouse
+            except Exception as e:
+                self.log(f"uinput недоступен, макросы через Xlib: {str(e)}", logging.WARNING)
+                macro_backend = XlibMacroBackend(self.linux_mouse)
+        self.macro_player = MacroPlayer(macro_backend, self.injection_log, self.macro_finished.emit)
+        self.macro_finished.connect(self.on_macro_finished)
+        self.macro_recorder = XRecordRecorder(self.injection_log)
         
         # Применяем тему по умолчанию
         self.apply_theme("purple")
         
+        # Горячие клавиши можно вводить вручную; введенная во время работы запись попадает
+        # в автомат по Enter, уходу фокуса или выбору из списка - недописанная не привязывается
+        # (до загрузки конфигурации, иначе свои сочетания из файла не встанут)
+        for combo in (self.lkm_key, self.pkm_key, self.reset_key, self.profile_key):
+            combo.setEditable(True)
+            combo.setToolTip("F6, ctrl+shift+x, mouse4 или последовательность: ctrl+k, ctrl+c")
+            combo.lineEdit().editingFinished.connect(self.rebuild_hotkey_matcher)
+            combo.activated.connect(self.rebuild_hotkey_matcher)
+        
         # Загрузка конфигурации по умолчанию при запуске
         self.load_default_config()
         
+        # Горячая перезагрузка: изменения активного файла конфигурации применяются на лету
+        self.active_config = self.config_manager.default_filename
+        self.config_reload_timer = QTimer(self)
+        self.config_reload_timer.setSingleShot(True)
+        self.config_reload_timer.setInterval(100)
+        self.config_reload_timer.timeout.connect(self.reload_active_config)
+        self.config_changed.connect(self.on_config_file_changed)
+        self.config_manager.watch(self.config_changed.emit)
+        self.profile_switched.connect(self.on_profile_switched)
+        
+        # Автовыбор профиля по активному окну X11 (события, без опроса)
+        self.window_watcher = None
+        self.active_window_changed.connect(self.on_active_window)
+        if LINUX_SUPPORT:
+            try:
+                self.window_watcher = ActiveWindowWatcher(self.active_window_changed.emit)
+                self.window_watcher.start()
+            except Exception as e:
+                self.window_watcher = None
+                self.log(f"Автовыбор профиля по окну недоступен: {str(e)}", logging.WARNING)
+        
         self.log("Программа инициализирована. Настройте параметры и нажмите 'Запуск кликера'")
         
-        # Таблица соответствия клавиш F-ряда для Linux
-        self.f_key_mapping = {
-            'F1': 59, 'F2': 60, 'F3': 61, 'F4': 62, 'F5': 63, 'F6': 64,
-            'F7': 65, 'F8': 66, 'F9': 67, 'F10': 68, 'F11': 87, 'F12': 88
-        }
+        # Изменения настроек сохраняются в активный файл отложенно, в фоновом потоке
+        for combo in (self.theme_combo, self.grab_device):
+            combo.currentIndexChanged.connect(self.schedule_config_save)
+        for checkbox in (self.accel_checkbox, self.hold_mode, self.optimization, self.passive_hotkeys):
+            checkbox.toggled.connect(self.schedule_config_save)
+        for spinbox in (self.start_interval, self.min_interval, self.base_interval):
+            spinbox.valueChanged.connect(self.schedule_config_save)
+        for combo in (self.lkm_key, self.pkm_key, self.reset_key, self.profile_key):
+            combo.lineEdit().editingFinished.connect(self.schedule_config_save)
+            combo.activated.connect(self.schedule_config_save)
+        self.window_match.textChanged.connect(self.schedule_config_save)
+        self.autosave = True
     
     def apply_theme(self, theme_name):
         """Применяет выбранную тему оформления"""
@@ -486,7 +2921,7 @@ class BeautifulAutoClicker(QMainWindow):
         """
         
         input_style = """
-            QComboBox, QDoubleSpinBox, QTextEdit {
+            QComboBox, QDoubleSpinBox, LogView {
                 color: #e0e0e0;
                 background-color: #2d2b55;
                 border: 1px solid #7b1fa2;
@@ -498,7 +2933,7 @@ class BeautifulAutoClicker(QMainWindow):
         for group in self.findChildren(QGroupBox):
             group.setStyleSheet(group_style)
         
-        for widget in self.findChildren((QComboBox, QDoubleSpinBox, QTextEdit)):
+        for widget in self.findChildren((QComboBox, QDoubleSpinBox, LogView)):
             widget.setStyleSheet(input_style)
         
         for checkbox in self.findChildren(QCheckBox):
@@ -523,7 +2958,7 @@ class BeautifulAutoClicker(QMainWindow):
         """
         
         input_style = """
-            QComboBox, QDoubleSpinBox, QTextEdit {
+            QComboBox, QDoubleSpinBox, LogView {
                 color: #4b0082;
                 background-color: #ffffff;
                 border: 1px solid #ffb6c1;
@@ -535,22 +2970,65 @@ class BeautifulAutoClicker(QMainWindow):
         for group in self.findChildren(QGroupBox):
             group.setStyleSheet(group_style)
         
-        for widget in self.findChildren((QComboBox, QDoubleSpinBox, QTextEdit)):
+        for widget in self.findChildren((QComboBox, QDoubleSpinBox, LogView)):
             widget.setStyleSheet(input_style)
         
         for checkbox in self.findChildren(QCheckBox):
             checkbox.setStyleSheet("color: #4b0082;")
     
-    def keyboard_callback(self, key_code):
-        """Обработчик нажатий клавиш для Linux"""
-        for key_name, expected_code in self.f_key_mapping.items():
-            if key_code == expected_code:
-                if key_name == self.lkm_key.currentText():
-                    self.toggle_left_clicker()
-                elif key_name == self.pkm_key.currentText():
-                    self.toggle_right_clicker()
-                elif key_name == self.reset_key.currentText():
-                    self.reset_acceleration()
+    def keyboard_callback(self, key_code, value):
+        """Обработчик нажатий клавиш для Linux (поток слушателя)"""
+        name = self.key_names.get(key_code)
+        matcher = self.hotkey_matcher
+        probe = self.latency_probe
+        if probe is not None:
+            probe.mark("listener")
+        if name is not None and matcher is not None:
+            # Отметка ставится до действия: оно будит поток кликера, и "click" может опередить ее
+            matcher.feed(name, value == 1, functools.partial(probe.mark, "matched") if probe is not None else None)
+    
+    def build_hotkey_matcher(self) -> HotkeyMatcher:
+        """
+        Собирает автомат горячих клавиш из настроек (только в GUI-потоке)
+        
+        Raises:
+            ValueError: Некорректная запись горячей клавиши
+        """
+        # При совпадении клавиш приоритет: ЛКМ, ПКМ, сброс ускорения
+        if self.hold_mode.isChecked():
+            bindings = [
+                (self.lkm_key.currentText(), lambda: self.hold_clicker(self.left_clicker, True),
+                 lambda: self.hold_clicker(self.left_clicker, False)),
+                (self.pkm_key.currentText(), lambda: self.hold_clicker(self.right_clicker, True),
+                 lambda: self.hold_clicker(self.right_clicker, False)),
+            ]
+        else:
+            bindings = [
+                (self.lkm_key.currentText(), self.toggle_left_clicker),
+                (self.pkm_key.currentText(), self.toggle_right_clicker),
+            ]
+        bindings.append((self.reset_key.currentText(), self.reset_acceleration))
+        bindings += [(profile.get("profile_key", ""), lambda name=name: self.switch_profile(name))
+                     for name, profile in self.profiles.profiles.items()]
+        return HotkeyMatcher([binding for binding in bindings if binding[0]])
+    
+    def hotkey_codes(self, matcher: HotkeyMatcher) -> List[int]:
+        """Коды evdev всех клавиш автомата (для фильтра в ядре)"""
+        return [code for name in matcher.keys for code in self.key_codes.get(name, ())]
+    
+    def rebuild_hotkey_matcher(self):
+        """Пересобирает автомат и подменяет его одной операцией присваивания"""
+        if not self.clicker_active:
+            return
+        try:
+            matcher = self.build_hotkey_matcher()
+        except ValueError:
+            # Запись еще набирается - оставляем прежний автомат
+            return
+        matcher.adopt(self.hotkey_matcher)
+        self.hotkey_matcher = matcher
+        if self.keyboard_listener:
+            self.keyboard_listener.set_hotkey_codes(self.hotkey_codes(matcher))
     
     def change_theme(self):
         """Обработчик изменения темы"""
@@ -570,7 +3048,12 @@ class BeautifulAutoClicker(QMainWindow):
             "reset_key": self.reset_key.currentText(),
             "lkm_key": self.lkm_key.currentText(),
             "pkm_key": self.pkm_key.currentText(),
+            "profile_key": self.profile_key.currentText(),
+            "window_match": [part.strip() for part in self.window_match.text().split(",") if part.strip()],
+            "hold_mode": self.hold_mode.isChecked(),
             "optimization": self.optimization.isChecked(),
+            "passive_hotkeys": self.passive_hotkeys.isChecked(),
+            "grab_device": self.grab_device.currentData(),
             "window_geometry": {
                 "x": self.x(),
                 "y": self.y(),
@@ -581,6 +3064,8 @@ class BeautifulAutoClicker(QMainWindow):
     
     def apply_config(self, config_data: Dict[str, Any]) -> bool:
         """Применяет настройки из словаря конфигурации"""
+        # Конфигурация пришла из файла - записывать ее обратно незачем
+        autosave, self.autosave = self.autosave, False
         try:
             theme = config_data.get("theme", "purple")
             self.apply_theme(theme)
@@ -594,19 +3079,16 @@ class BeautifulAutoClicker(QMainWindow):
             self.min_interval.setValue(config_data.get("min_interval", 10))
             self.base_interval.setValue(config_data.get("base_interval", 100))
             
-            reset_key = config_data.get("reset_key", "")
-            if reset_key in [self.reset_key.itemText(i) for i in range(self.reset_key.count())]:
-                self.reset_key.setCurrentText(reset_key)
-            
-            lkm_key = config_data.get("lkm_key", "F6")
-            if lkm_key in [self.lkm_key.itemText(i) for i in range(self.lkm_key.count())]:
-                self.lkm_key.setCurrentText(lkm_key)
-            
-            pkm_key = config_data.get("pkm_key", "F7")
-            if pkm_key in [self.pkm_key.itemText(i) for i in range(self.pkm_key.count())]:
-                self.pkm_key.setCurrentText(pkm_key)
+            self.set_hotkey_text(self.reset_key, config_data.get("reset_key", ""))
+            self.set_hotkey_text(self.lkm_key, config_data.get("lkm_key", "F6"))
+            self.set_hotkey_text(self.pkm_key, config_data.get("pkm_key", "F7"))
+            self.set_hotkey_text(self.profile_key, config_data.get("profile_key", ""))
+            self.window_match.setText(", ".join(config_data.get("window_match", [])))
             
+            self.hold_mode.setChecked(config_data.get("hold_mode", False))
             self.optimization.setChecked(config_data.get("optimization", True))
+            self.passive_hotkeys.setChecked(config_data.get("passive_hotkeys", True))
+            self.set_grab_device(config_data.get("grab_device", ""))
             
             geometry = config_data.get("window_geometry")
             if geometry:
@@ -621,8 +3103,86 @@ class BeautifulAutoClicker(QMainWindow):
             return True
             
         except Exception as e:
-            self.log(f"Ошибка применения конфигурации: {str(e)}")
+            self.log(f"Ошибка применения конфигурации: {str(e)}", logging.ERROR)
             return False
+        finally:
+            self.autosave = autosave
+    
+    def set_hotkey_text(self, combo: QComboBox, value: str) -> None:
+        """Ставит горячую клавишу в комбобокс, если запись корректна"""
+        try:
+            if value:
+                parse_hotkey(value)
+        except ValueError:
+            return
+        combo.setCurrentText(value)
+    
+    def set_grab_device(self, name: str) -> None:
+        """Выбирает захватываемую клавиатуру (устройство может быть еще не подключено)"""
+        index = self.grab_device.findData(name)
+        if index < 0:
+            self.grab_device.addItem(name, name)
+            index = self.grab_device.count() - 1
+        self.grab_device.setCurrentIndex(index)
+    
+    def schedule_config_save(self, *_):
+        """
+        Отложенное автосохранение сеанса (GUI-поток не ждет диск)
+        
+        Пишется только файл по умолчанию. Именованные профили меняются лишь
+        кнопкой сохранения; пока загружен такой профиль, в файл по умолчанию
+        уходит только положение окна.
+        """
+        if not self.autosave:
+            return
+        default = self.config_manager.default_filename
+        config_data = self.get_current_config()
+        if self.active_config != default:
+            session = self.profiles.get(default)
+            if session is None:
+                return
+            config_data = dict(session, window_geometry=config_data["window_geometry"])
+        # Недописанную горячую клавишу не сохраняем
+        if self.check_config(config_data) is None:
+            self.update_profile(default, config_data)
+            self.config_manager.save_config_later(config_data, default)
+    
+    def update_profile(self, name: str, config_data: Dict[str, Any]):
+        """Свои записи слежение не сообщает - профиль в памяти обновляем сами"""
+        old = self.profiles.put(name, config_data)
+        if old is None or old.get("profile_key", "") != config_data.get("profile_key", ""):
+            self.rebuild_hotkey_matcher()
+        if old is None or old.get("window_match", []) != config_data.get("window_match", []):
+            self.window_index = WindowProfileIndex(self.profiles.profiles)
+    
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        if self.macro_recorder.recording:
+            self.update_record_exclusion()
+        self.schedule_config_save()
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.macro_recorder.recording:
+            self.update_record_exclusion()
+        self.schedule_config_save()
+    
+    def closeEvent(self, event):
+        """Дописывает отложенную конфигурацию перед выходом"""
+        if self.window_watcher is not None:
+            self.window_watcher.stop()
+        # Кликер и макрос больше не пользуются мышью: закрываем трекер и соединение с X
+        if self.clicker_active:
+            self.stop_clicker()
+        self.macro_player.stop_macro()
+        if self.linux_mouse is not None:
+            self.linux_mouse.close()
+        self.config_manager.stop_watching()
+        self.config_manager.flush()
+        # Последние записи лога еще в очереди - дописываем их в файл
+        self.ui_updates.flush()
+        self.set_log_file(False)
+        super().closeEvent(event)
     
     def save_config(self):
         """Сохраняет текущую конфигурацию в файл"""
@@ -641,13 +3201,16 @@ class BeautifulAutoClicker(QMainWindow):
                 
                 success = self.config_manager.save_config(config_data, Path(filename).name)
                 if success:
+                    self.active_config = Path(filename).name
+                    if self.check_config(config_data) is None:
+                        self.update_profile(self.active_config, config_data)
                     self.log(f"Конфигурация сохранена: {filename}")
                     QMessageBox.information(self, "Успех", "Конфигурация успешно сохранена!")
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось сохранить конфигурацию")
                     
         except Exception as e:
-            self.log(f"Ошибка при сохранении конфигурации: {str(e)}")
+            self.log(f"Ошибка при сохранении конфигурации: {str(e)}", logging.ERROR)
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить конфигурацию: {str(e)}")
     
     def load_config(self):
@@ -668,7 +3231,7 @@ class BeautifulAutoClicker(QMainWindow):
             if filename:
                 config_data = self.config_manager.load_config(Path(filename).name)
                 if config_data:
-                    if self.apply_config(config_data):
+                    if self.apply_config_live(config_data, Path(filename).name):
                         self.log(f"Конфигурация загружена: {filename}")
                         QMessageBox.information(self, "Успех", "Конфигурация успешно загружена!")
                     else:
@@ -677,9 +3240,154 @@ class BeautifulAutoClicker(QMainWindow):
                     QMessageBox.warning(self, "Ошибка", "Не удалось загрузить конфигурацию")
                     
         except Exception as e:
-            self.log(f"Ошибка при загрузке конфигурации: {str(e)}")
+            self.log(f"Ошибка при загрузке конфигурации: {str(e)}", logging.ERROR)
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить конфигурацию: {str(e)}")
     
+    def on_config_file_changed(self, filename: str):
+        """Файл конфигурации изменен на диске; серия событий схлопывается таймером"""
+        if filename == self.active_config:
+            self.config_reload_timer.start()
+        else:
+            # Остальные файлы - профили: держим их копии в памяти актуальными
+            self.profiles.reload(filename)
+            self.window_index = WindowProfileIndex(self.profiles.profiles)
+            self.rebuild_hotkey_matcher()
+    
+    def reload_active_config(self):
+        """Перечитывает активный файл конфигурации и применяет изменения"""
+        config_data = self.config_manager.load_config(self.active_config)
+        # Недописанный или битый файл пропускаем: применится следующая версия
+        if config_data and self.apply_config_live(config_data):
+            self.log(f"Конфигурация обновлена на лету: {self.active_config}")
+    
+    def check_config(self, config_data: Dict[str, Any]) -> Optional[str]:
+        """Проверяет значения, которые нельзя отдать движку; возвращает текст ошибки"""
+        try:
+            if config_data.get("acceleration", False) and \
+                    config_data.get("min_interval", 10) >= config_data.get("start_interval", 500):
+                return "Конечный интервал должен быть меньше начального"
+            for key in ("reset_key", "lkm_key", "pkm_key", "profile_key"):
+                if config_data.get(key):
+                    parse_hotkey(config_data[key])
+            window_match = config_data.get("window_match", [])
+            if not isinstance(window_match, list) or not all(isinstance(part, str) for part in window_match):
+                return "window_match: ожидается список строк"
+        except (ValueError, TypeError, AttributeError) as e:
+            return str(e)
+        return None
+    
+    def apply_config_live(self, config_data: Dict[str, Any], name: Optional[str] = None) -> bool:
+        """
+        Применяет конфигурацию к интерфейсу и, если кликер запущен, - к движку
+        
+        Args:
+            config_data: Словарь конфигурации
+            name: Файл конфигурации; становится активным, только если
+                применение удалось (по умолчанию - текущий активный)
+        """
+        error = self.check_config(config_data)
+        if error:
+            self.log(f"Конфигурация не применена: {error}", logging.WARNING)
+            return False
+        old = self.get_current_config()
+        if not self.apply_config(config_data):
+            return False
+        if name is not None:
+            self.active_config = name
+        # Автомат профилей строится по копиям в памяти - обновляем до пересборки
+        self.profiles.put(self.active_config, config_data)
+        self.window_index = WindowProfileIndex(self.profiles.profiles)
+        self.apply_engine_changes(old, self.get_current_config())
+        return True
+    
+    def parse_profile(self, config_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Проверка файла профиля при загрузке в память"""
+        error = self.check_config(config_data)
+        if error:
+            raise ValueError(error)
+        return config_data
+    
+    def switch_profile(self, name: str):
+        """
+        Переключает на заранее загруженный профиль (поток слушателя)
+        
+        Интервалы действуют с ближайшей паузы кликера; остальное
+        (виджеты, автомат клавиш) подтягивается в GUI-потоке.
+        """
+        config_data = self.profiles.get(name)
+        if config_data is None:
+            return
+        for clicker in (self.left_clicker, self.right_clicker):
+            if clicker:
+                clicker.reconfigure(
+                    config_data.get("acceleration", False),
+                    config_data.get("base_interval", 100) / 1000,
+                    config_data.get("start_interval", 500) / 1000,
+                    config_data.get("min_interval", 10) / 1000,
+                )
+        self.profile_switched.emit(name)
+    
+    def on_active_window(self, wm_class: Tuple[str, ...], title: str):
+        """Смена активного окна: выбор профиля по индексу (GUI-поток)"""
+        name = self.window_index.lookup(wm_class, title)
+        if name is None:
+            # Окно без профиля: возвращаемся к выбранному вручную
+            name, self.manual_profile = self.manual_profile, None
+            if name is None:
+                return
+        elif self.manual_profile is None:
+            self.manual_profile = self.active_config
+        if name != self.active_config:
+            self.switch_profile(name)
+    
+    def on_profile_switched(self, name: str):
+        """Применяет переключенный профиль к интерфейсу и автомату клавиш"""
+        config_data = self.profiles.get(name)
+        if config_data is None:
+            return
+        self.active_config = name
+        # Окно при переключении профиля остается на месте
+        config_data = {key: value for key, value in config_data.items() if key != "window_geometry"}
+        if self.apply_config_live(config_data):
+            self.log(f"Профиль: {Path(name).stem}")
+    
+    def apply_engine_changes(self, old: Dict[str, Any], new: Dict[str, Any]):
+        """
+        Переносит разницу настроек в работающий движок без перезапуска
+        
+        Кликеры перенастраиваются на месте (их поток не останавливается),
+        автомат горячих клавиш пересобирается и подменяется одним присваиванием.
+        """
+        # Тема и геометрия уже применены к интерфейсу, движок они не касаются
+        changed = {key for key, value in new.items() if old.get(key) != value} - {"theme", "window_geometry"}
+        if not self.clicker_active or not changed:
+            return
+        
+        if changed & INTERVAL_CONFIG_KEYS:
+            for clicker in (self.left_clicker, self.right_clicker):
+                if clicker:
+                    clicker.reconfigure(
+                        new["acceleration"],
+                        new["base_interval"] / 1000,
+                        new["start_interval"] / 1000,
+                        new["min_interval"] / 1000,
+                    )
+        
+        if "optimization" in changed:
+            self.loop_sleep = 0.001 if new["optimization"] else 0.0001
+        
+        if changed & HOTKEY_CONFIG_KEYS:
+            if "hold_mode" in changed:
+                # Отпускание старой привязки уже не придет
+                for clicker in (self.left_clicker, self.right_clicker):
+                    if clicker:
+                        clicker.set_active(False)
+            self.rebuild_hotkey_matcher()
+        
+        if changed & {"passive_hotkeys", "grab_device"}:
+            self.log("Режим захвата клавиатуры применится после перезапуска кликера")
+        self.log(f"Движок обновлен: {', '.join(sorted(changed))}")
+    
     def load_default_config(self):
         """Загружает конфигурацию по умолчанию при запуске"""
         config_data = self.config_manager.load_config()
@@ -689,9 +3397,54 @@ class BeautifulAutoClicker(QMainWindow):
         else:
             self.log("Используются настройки по умолчанию")
     
-    def log(self, message):
-        timestamp = time.strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
+    def update_devices(self, names):
+        """Показывает текущий набор слушаемых устройств"""
+        text = ", ".join(names) if names else "не найдены"
+        self.devices_label.setText(f"Устройства ввода: {text}")
+        for name in names:
+            if self.grab_device.findData(name) < 0:
+                self.grab_device.addItem(name, name)
+        self.log(f"Устройства ввода: {text}")
+    
+    def log(self, message, level: int = logging.INFO):
+        """Добавляет запись в лог (из любого потока, через очередь обновлений)"""
+        self.ui_updates.post("log", (level, time.time(), message))
+    
+    def append_log_records(self, records: List[Tuple[int, float, str]]):
+        """Пачка записей из очереди: в кольцевой буфер и, если включено, в файл"""
+        self.log_view.refresh(self.log_buffer.extend(records))
+        
+        if self.log_file_handler is not None:
+            for level, created, message in records:
+                record = logging.LogRecord("autoclicker", level, __file__, 0, message, None, None)
+                record.created = created
+                self.log_file_handler.handle(record)
+    
+    def change_log_level(self):
+        """Фильтр лога по уровню"""
+        self.log_buffer.set_min_level(self.log_level.currentData())
+        # После смены фильтра показываем самые новые записи
+        scrollbar = self.log_view.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+        self.log_view.refresh()
+    
+    def set_log_file(self, enabled: bool):
+        """Включает запись лога в файл с ротацией по размеру"""
+        if enabled and self.log_file_handler is None:
+            try:
+                LOG_FILE.parent.mkdir(exist_ok=True)
+                handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES,
+                                              backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+            except OSError as e:
+                self.log(f"Файл лога недоступен: {str(e)}", logging.ERROR)
+                self.log_to_file.setChecked(False)
+                return
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+            self.log_file_handler = handler
+            self.log(f"Лог пишется в {LOG_FILE}")
+        elif not enabled and self.log_file_handler is not None:
+            self.log_file_handler.close()
+            self.log_file_handler = None
     
     def start_clicker(self):
         try:
@@ -718,7 +3471,8 @@ class BeautifulAutoClicker(QMainWindow):
                 base_interval=base_interval,
                 start_interval=start_interval,
                 min_interval=min_interval,
-                mouse_controller=self.linux_mouse
+                mouse_controller=self.linux_mouse,
+                injection_log=self.injection_log
             )
             self.right_clicker = Clicker(
                 button="right", 
@@ -726,16 +3480,34 @@ class BeautifulAutoClicker(QMainWindow):
                 base_interval=base_interval,
                 start_interval=start_interval,
                 min_interval=min_interval,
-                mouse_controller=self.linux_mouse
+                mouse_controller=self.linux_mouse,
+                injection_log=self.injection_log
             )
             
+            try:
+                self.hotkey_matcher = self.build_hotkey_matcher()
+            except ValueError as e:
+                QMessageBox.warning(self, "Ошибка", f"Некорректная горячая клавиша: {str(e)}")
+                return
+            
             # Запускаем слушатель клавиатуры для Linux
-            self.keyboard_listener = LinuxKeyboardListener(self.keyboard_callback)
+            listener_class = LinuxKeyboardListener
+            if self.helper is not None:
+                listener_class = functools.partial(HelperKeyboardListener, self.helper)
+            self.keyboard_listener = listener_class(
+                self.keyboard_callback,
+                self.devices_changed.emit,
+                hotkey_codes=self.hotkey_codes(self.hotkey_matcher),
+                passive=self.passive_hotkeys.isChecked(),
+                grab_device=self.grab_device.currentData()
+            )
             if not self.keyboard_listener.start():
                 QMessageBox.warning(self, "Предупреждение", "Не удалось запустить слушатель клавиатуры")
             
             self.clicker_active = True
-            self.clicker_thread = threading.Thread(target=self.clicker_loop, args=(optimization,))
+            self.clicker_wake.clear()
+            self.loop_sleep = 0.001 if optimization else 0.0001
+            self.clicker_thread = threading.Thread(target=self.clicker_loop)
             self.clicker_thread.daemon = True
             self.clicker_thread.start()
             
@@ -744,7 +3516,7 @@ class BeautifulAutoClicker(QMainWindow):
             self.status_label.setText("Кликер активен")
             
             self.log("Автокликер запущен!")
-            self.log(f"ЛКМ: {lkm_key}, ПКМ: {pkm_key}")
+            self.log(f"ЛКМ: {lkm_key}, ПКМ: {pkm_key}{' (удержание)' if self.hold_mode.isChecked() else ''}")
             if acceleration:
                 self.log(f"Ускорение: ВКЛ (от {start_interval*1000:.3f}мс до {min_interval*1000:.3f}мс)")
                 if reset_key:
@@ -752,12 +3524,18 @@ class BeautifulAutoClicker(QMainWindow):
             else:
                 self.log(f"Ускорение: ВЫКЛ (интервал: {base_interval*1000:.3f}мс)")
             self.log(f"Оптимизация: {'ВКЛ' if optimization else 'ВЫКЛ'}")
+            self.log(f"Клавиатура: {'пассивно, фильтр в ядре' if self.passive_hotkeys.isChecked() else 'захват (grab): ' + self.grab_device.currentText()}")
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось запустить кликер: {str(e)}")
     
     def stop_clicker(self):
         self.clicker_active = False
+        self.hotkey_matcher = None
+        for clicker in (self.left_clicker, self.right_clicker):
+            if clicker:
+                clicker.set_active(False)
+        self.clicker_wake.set()
         
         if self.keyboard_listener:
             self.keyboard_listener.stop()
@@ -772,16 +3550,94 @@ class BeautifulAutoClicker(QMainWindow):
     
     def toggle_left_clicker(self):
         if self.left_clicker:
-            self.left_clicker.active = not self.left_clicker.active
+            self.left_clicker.set_active(not self.left_clicker.active)
+            self.clicker_wake.set()
             status = "ВКЛ" if self.left_clicker.active else "ВЫКЛ"
             self.log(f"ЛКМ {status}")
     
     def toggle_right_clicker(self):
         if self.right_clicker:
-            self.right_clicker.active = not self.right_clicker.active
+            self.right_clicker.set_active(not self.right_clicker.active)
+            self.clicker_wake.set()
             status = "ВКЛ" if self.right_clicker.active else "ВЫКЛ"
             self.log(f"ПКМ {status}")
     
+    def hold_clicker(self, clicker, held: bool):
+        """Режим удержания: кликер работает, пока зажата клавиша (поток слушателя)"""
+        if clicker:
+            clicker.set_active(held)
+            # Будим цикл сразу: первый клик - в момент нажатия
+            self.clicker_wake.set()
+    
+    def run_latency_probe(self):
+        """Запускает замер задержки горячая клавиша -> первый клик"""
+        if not self.clicker_active or not self.left_clicker:
+            QMessageBox.warning(self, "Ошибка", "Сначала запустите кликер")
+            return
+        if not isinstance(self.uinput_mouse, UInputMouse):
+            QMessageBox.warning(self, "Ошибка", "Для замера нужна своя виртуальная мышь uinput "
+                                "(при запуске через sudo устройства принадлежат помощнику)")
+            return
+        if self.latency_probe is not None or self.macro_player.playing:
+            return
+        try:
+            steps = parse_hotkey(self.lkm_key.currentText())
+        except ValueError as e:
+            QMessageBox.warning(self, "Ошибка", f"Некорректная горячая клавиша: {str(e)}")
+            return
+        mods, key = steps[0]
+        names = [name for name, bit in MODIFIER_BITS.items() if mods & bit] + [key]
+        if len(steps) > 1 or key in MOUSE_TRIGGER_NAMES or not all(name in self.key_codes for name in names):
+            QMessageBox.warning(self, "Ошибка", "Для замера клавиша ЛКМ должна быть одной клавишей или сочетанием")
+            return
+        trials = 200
+        reply = QMessageBox.question(
+            self, "Замер задержки",
+            f"Будет выполнено {trials} кликов ЛКМ в текущей позиции курсора. Продолжить?",
+            QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        try:
+            probe = LatencyProbe([min(self.key_codes[name]) for name in names], self.uinput_mouse,
+                                 hold=self.hold_mode.isChecked(), trials=trials)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось подготовить замер: {str(e)}")
+            return
+        self.latency_btn.setEnabled(False)
+        self.log(f"Замер задержки: {trials} нажатий {self.lkm_key.currentText()}...")
+        thread = threading.Thread(target=self._latency_probe_thread, args=(probe,))
+        thread.daemon = True
+        thread.start()
+    
+    def _latency_probe_thread(self, probe: LatencyProbe):
+        clicker = self.left_clicker
+        controller = clicker.mouse_controller
+        results = []
+        try:
+            # Ждем, пока слушатель подхватит виртуальную клавиатуру (inotify)
+            deadline = time.monotonic() + 2.0
+            while LatencyProbe.NAME not in self.keyboard_listener.device_names():
+                if time.monotonic() > deadline:
+                    raise OSError("слушатель не подключил виртуальную клавиатуру")
+                time.sleep(0.01)
+            clicker.set_active(False)
+            clicker.mouse_controller = probe
+            self.latency_probe = probe
+            results = probe.run()
+        except Exception as e:
+            self.log(f"Ошибка замера задержки: {str(e)}", logging.ERROR)
+        finally:
+            self.latency_probe = None
+            clicker.set_active(False)
+            clicker.mouse_controller = controller
+            probe.close()
+        
+        self.log(f"Замер задержки: {len(results)} из {probe.trials} успешно")
+        for line in LatencyProbe.summarize(results):
+            self.log(f"  {line}")
+        self.latency_probe_finished.emit()
+    
     def reset_acceleration(self):
         if self.left_clicker:
             self.left_clicker.reset_interval()
@@ -789,21 +3645,154 @@ class BeautifulAutoClicker(QMainWindow):
             self.right_clicker.reset_interval()
         self.log("Ускорение сброшено!")
     
-    def clicker_loop(self, optimization):
+    def clicker_loop(self):
         while self.clicker_active:
             try:
+                # Оба кликера выключены - спим до переключения, а не опрашиваем
+                self.clicker_wake.clear()
+                if not ((self.left_clicker and self.left_clicker.active) or
+                        (self.right_clicker and self.right_clicker.active)):
+                    self.clicker_wake.wait()
+                    continue
+                
                 if self.left_clicker and self.left_clicker.active:
                     self.left_clicker.click()
                 if self.right_clicker and self.right_clicker.active:
                     self.right_clicker.click()
                 
-                time.sleep(0.001 if optimization else 0.0001)
+                time.sleep(self.loop_sleep)
             except Exception as e:
-                self.log(f"Ошибка в цикле кликера: {str(e)}")
+                self.log(f"Ошибка в цикле кликера: {str(e)}", logging.ERROR)
                 break
 
+    def toggle_macro_recording(self):
+        """Начинает или останавливает запись макроса через XRecord"""
+        if not LINUX_SUPPORT:
+            QMessageBox.critical(self, "Ошибка", "Linux-библиотеки не установлены!")
+            return
+        try:
+            if not self.macro_recorder.recording:
+                self.update_record_exclusion()
+                self.macro_recorder.start()
+                self.record_macro_btn.setText("⏹️ Стоп записи")
+                self.log("Запись макроса...")
+                return
+            
+            self.macro_recorder.stop()
+            self.record_macro_btn.setText("⏺️ Запись")
+            recorded = self.macro_recorder.recorded
+            self.macro_player.load_recorded(recorded)
+            self.log(f"Запись завершена: {len(recorded)} событий, {self.macro_recorder.blocks} блоков XRecord")
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка записи макроса: {str(e)}")
+    
+    def update_record_exclusion(self):
+        """Передает записи прямоугольник кнопки записи в координатах X (пиксели экрана)"""
+        button = self.record_macro_btn
+        ratio = button.devicePixelRatioF()
+        origin = button.mapToGlobal(QPoint(0, 0))
+        self.macro_recorder.exclude = ((round(origin.x() * ratio), round(origin.y() * ratio),
+                                        math.ceil(button.width() * ratio), math.ceil(button.height() * ratio)),)
+    
+    def save_macro(self):
+        """Сохраняет текущий макрос в файл"""
+        try:
+            if not self.macro_player.has_macro():
+                QMessageBox.warning(self, "Предупреждение", "Нет записанных событий для сохранения")
+                return
+            
+            filename, _ = QFileDialog.getSaveFileName(
+                self, "Сохранить макрос", 
+                str(self.macro_manager.macro_dir),
+                "JSON Files (*.json)"
+            )
+            
+            if filename:
+                if not filename.endswith('.json'):
+                    filename += '.json'
+                
+                if self.macro_manager.save_macro(self.macro_player.macro, Path(filename).name):
+                    self.log(f"Макрос сохранен: {filename}")
+                else:
+                    QMessageBox.warning(self, "Ошибка", "Не удалось сохранить макрос")
+                    
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить макрос: {str(e)}")
+    
+    def load_macro(self):
+        """Загружает макрос из файла"""
+        try:
+            filename, _ = QFileDialog.getOpenFileName(
+                self, "Загрузить макрос", 
+                str(self.macro_manager.macro_dir),
+                "JSON Files (*.json)"
+            )
+            
+            if filename:
+                macro = self.macro_manager.load_macro(Path(filename).name)
+                if macro is None:
+                    QMessageBox.warning(self, "Ошибка", "Не удалось загрузить макрос")
+                    return
+                try:
+                    self.macro_player.load(macro, self.macro_manager.load_macro)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    QMessageBox.warning(self, "Ошибка", f"Некорректный макрос: {str(e)}")
+                    return
+                self.log(f"Макрос загружен: {filename}")
+                
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить макрос: {str(e)}")
+    
+    def play_macro(self):
+        """Воспроизводит загруженный макрос"""
+        if self.macro_player.backend is None:
+            QMessageBox.critical(self, "Ошибка", "Linux-библиотеки не установлены!")
+            return
+        if not self.macro_player.has_macro():
+            QMessageBox.warning(self, "Предупреждение", "Сначала загрузите макрос")
+            return
+        
+        self.macro_player.play_macro()
+        self.play_macro_btn.setEnabled(False)
+        self.pause_macro_btn.setEnabled(True)
+        self.stop_macro_btn.setEnabled(True)
+        backend = "uinput" if self.macro_player.backend is self.uinput_mouse else "Xlib"
+        self.log(f"Воспроизведение макроса ({backend})")
+    
+    def pause_macro(self):
+        """Приостанавливает или возобновляет воспроизведение макроса"""
+        if self.macro_player.paused:
+            self.macro_player.resume_macro()
+            self.pause_macro_btn.setText("⏸️ Пауза")
+            self.log("Макрос возобновлен")
+        else:
+            self.macro_player.pause_macro()
+            self.pause_macro_btn.setText("▶️ Продолжить")
+            self.log("Макрос на паузе")
+    
+    def stop_macro(self):
+        """Останавливает воспроизведение макроса"""
+        self.macro_player.stop_macro()
+        self.play_macro_btn.setEnabled(True)
+        self.pause_macro_btn.setEnabled(False)
+        self.stop_macro_btn.setEnabled(False)
+        self.pause_macro_btn.setText("⏸️ Пауза")
+        self.log("Макрос остановлен")
+    
+    def on_macro_finished(self):
+        """Макрос доигран до конца: кнопки возвращаются в исходное состояние"""
+        # Сигнал из очереди мог опоздать: уже запущено новое воспроизведение или нажат Стоп
+        if self.macro_player.playing or not self.stop_macro_btn.isEnabled():
+            return
+        self.play_macro_btn.setEnabled(True)
+        self.pause_macro_btn.setEnabled(False)
+        self.stop_macro_btn.setEnabled(False)
+        self.pause_macro_btn.setText("⏸️ Пауза")
+        self.log("Воспроизведение макроса завершено")
+
 class Clicker:
-    def __init__(self, button, acceleration, base_interval, start_interval, min_interval, mouse_controller):
+    def __init__(self, button, acceleration, base_interval, start_interval, min_interval, mouse_controller,
+                 injection_log=None):
         self.button = button
         self.acceleration = acceleration
         self.base_interval = base_interval
@@ -813,11 +3802,35 @@ class Clicker:
         self.active = False
         self.mouse_controller = mouse_controller
         self.button_code = 1 if button == "left" else 3  # 1 = left, 3 = right
+        self.button_index = X_BUTTONS.index(self.button_code)
+        self.injection_log = injection_log
+        # Взводится при выключении: прерывает паузы клика без ожидания интервала
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def set_active(self, active: bool) -> None:
+        """Включает/выключает кликер; выключение сразу обрывает текущую паузу"""
+        self.active = active
+        if active:
+            self.idle.clear()
+        else:
+            self.idle.set()
 
     def click(self):
+        if not self.active:
+            return
         if self.mouse_controller:
-            self.mouse_controller.click(self.button_code)
-        time.sleep(self.get_interval())
+            try:
+                if self.injection_log is not None:
+                    self.injection_log.note(OP_PRESS, self.button_index)
+                self.mouse_controller.press(self.button_code)
+                self.idle.wait(0.01)
+                if self.injection_log is not None:
+                    self.injection_log.note(OP_RELEASE, self.button_index)
+                self.mouse_controller.release(self.button_code)
+            except Exception as e:
+                print(f"Ошибка эмуляции клика: {e}")
+        self.idle.wait(self.get_interval())
         self.update_interval()
 
     def get_interval(self):
@@ -832,14 +3845,31 @@ class Clicker:
     def reset_interval(self):
         self.current_interval = self.start_interval
 
+    def reconfigure(self, acceleration, base_interval, start_interval, min_interval):
+        """Меняет интервалы на лету (поток кликера продолжает работу)"""
+        if acceleration and not self.acceleration:
+            self.current_interval = start_interval
+        self.acceleration = acceleration
+        self.base_interval = base_interval
+        self.start_interval = start_interval
+        self.min_interval = min_interval
+        self.current_interval = min(max(self.current_interval, min_interval), start_interval)
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    app.setStyle("Fusion")
-    window = BeautifulAutoClicker()
-    window.show()
+    if "--benchmark-ipc" in sys.argv:
+        benchmark_ipc()
+        sys.exit(0)
     
     # Проверка прав доступа
     if os.geteuid() != 0 and LINUX_SUPPORT:
         print("Предупреждение: Для полной функциональности запустите с sudo")
     
+    # Под sudo устройства ввода остаются у root-помощника, GUI работает от пользователя
+    helper = start_input_helper()
+    
+    app = QApplication(sys.argv)
+    app.setStyle("Fusion")
+    window = BeautifulAutoClicker(helper)
+    window.show()
+    
     sys.exit(app.exec_())
@@ -1,52 +1,150 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
+import importlib.util
+import ctypes
+import select
+import struct
 import subprocess
 import time
 import threading
 import json
+import functools
+from array import array
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Any, Dict, Optional, List, Tuple
+from string import Template
+from typing import Any, Callable, Dict, Optional, List, Tuple, Union
 import logging
 
-# Функция для установки библиотек
-def install_packages():
-    required_packages = ['pyqt5', 'keyboard', 'mouse']
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            print(f"Устанавливаю {package}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+# Модуль -> пакет pip
+REQUIRED_PACKAGES = {'PyQt5': 'pyqt5', 'keyboard': 'keyboard', 'mouse': 'mouse'}
+
+def check_dependencies():
+    """Проверяет зависимости без импорта (find_spec) и ничего не устанавливает"""
+    missing = [package for module, package in REQUIRED_PACKAGES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"Не установлены пакеты: {', '.join(missing)}")
+        print(f"Установите их: {sys.executable} -m pip install {' '.join(missing)}")
+        sys.exit(1)
 
-# Устанавливаем необходимые библиотеки
-install_packages()
+check_dependencies()
 
 # Теперь импортируем библиотеки
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                              QTextEdit, QCheckBox, QGroupBox, QMessageBox,
                              QSpinBox, QDoubleSpinBox, QComboBox, QFileDialog)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QPalette, QColor
-import keyboard
-import mouse
+from PyQt5.QtCore import Qt, QEvent, QObject, QPointF, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter, QPalette, QPixmap, QColor
+
+def lazy_import(name: str):
+    """Модуль, который выполнится при первом обращении к его атрибуту"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
 
-# Скрываем консольное окно (для Windows)
-if os.name == 'nt':
-    import ctypes
+# Бэкенды ввода грузятся при первом клике или хуке, а не до показа окна
+keyboard = lazy_import('keyboard')
+mouse = lazy_import('mouse')
+
+# Бюджет запуска (медиана, сек): старт процесса -> окно показано / движок без окна готов
+STARTUP_BUDGETS = {"gui": 1.0, "headless": 0.3}
+
+# Скрываем консольное окно (для Windows; без окна консоль нужна для Ctrl+C)
+if os.name == 'nt' and "--headless" not in sys.argv:
     ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
 
+class Inotify:
+    """Минимальная обертка над inotify(7) через ctypes"""
+    
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    # struct inotify_event: int wd, uint32 mask, uint32 cookie, uint32 len, char name[len]
+    EVENT = struct.Struct('iIII')
+    
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify есть только в Linux")
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+    
+    def add_watch(self, path: str, mask: int) -> int:
+        """Добавляет наблюдение за путем"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+    
+    def read(self) -> List[Tuple[int, str]]:
+        """Читает накопившиеся события: список (mask, имя файла)"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        
+        events = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].split(b"\0", 1)[0].decode(errors="replace")
+            offset += length
+            events.append((mask, name))
+        return events
+    
+    def close(self) -> None:
+        os.close(self.fd)
+
 class ConfigManager:
     """
     Менеджер конфигураций для сохранения и загрузки настроек в формате JSON
     """
     
-    def __init__(self, config_dir: str = "config", default_filename: str = "autoclicker_config.json"):
+    def __init__(self, config_dir: str = "config", default_filename: str = "autoclicker_config.json",
+                 save_delay: float = 0.5, max_save_delay: float = 3.0):
+        """
+        Args:
+            config_dir: Директория конфигураций
+            default_filename: Файл конфигурации по умолчанию
+            save_delay: Пауза без изменений, после которой отложенная запись уходит на диск, сек
+            max_save_delay: Предел откладывания при непрерывных изменениях, сек
+        """
         self.config_dir = Path(config_dir)
         self.default_filename = default_filename
         self.config_path = self.config_dir / default_filename
         self._ensure_config_dir()
+        self._watch_thread = None
+        self._stop_watch = threading.Event()
+        
+        # Отложенная запись: последние данные по именам файлов и фоновый писатель
+        self.save_delay = save_delay
+        self.max_save_delay = max_save_delay
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._save_event = threading.Event()
+        self._writer_thread = None
+        # Файл -> mtime_ns нашей последней записи (слежение их пропускает)
+        self._own_writes: Dict[str, int] = {}
         
         # Настройка логирования
         logging.basicConfig(level=logging.INFO)
@@ -69,10 +167,7 @@ class ConfigManager:
         """
         try:
             config_path = self.config_dir / (filename or self.default_filename)
-            
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=4, ensure_ascii=False)
-            
+            self._write_atomic(config_path, json.dumps(config_data, indent=4, ensure_ascii=False))
             self.logger.info(f"Конфигурация сохранена: {config_path}")
             return True
             
@@ -80,6 +175,88 @@ class ConfigManager:
             self.logger.error(f"Ошибка сохранения конфигурации: {e}")
             return False
     
+    def _write_atomic(self, config_path: Path, text: str) -> None:
+        """
+        Пишет файл целиком или не пишет вовсе: временный файл, fsync, rename
+        
+        Временное имя не оканчивается на .json, поэтому слежение видит
+        только готовый файл после переименования.
+        """
+        tmp_path = config_path.with_name(f".{config_path.name}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            # rename сохраняет mtime, поэтому отметку можно поставить заранее
+            self._own_writes[config_path.name] = os.stat(tmp_path).st_mtime_ns
+            os.replace(tmp_path, config_path)
+        except BaseException:
+            self._own_writes.pop(config_path.name, None)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        
+        # Запись о переименовании тоже должна пережить сбой питания
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.config_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def save_config_later(self, config_data: Dict[str, Any], filename: Optional[str] = None) -> None:
+        """
+        Откладывает сохранение: частые изменения схлопываются в одну запись
+        
+        Не блокирует вызывающий поток: файл пишет фоновый поток, когда
+        изменения затихнут на save_delay (но не позже max_save_delay).
+        
+        Args:
+            config_data: Словарь с данными конфигурации (дальше не изменяется)
+            filename: Имя файла (если None, используется имя по умолчанию)
+        """
+        with self._pending_lock:
+            self._pending[filename or self.default_filename] = config_data
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._writer_loop)
+                self._writer_thread.daemon = True
+                self._writer_thread.start()
+        self._save_event.set()
+    
+    def flush(self) -> None:
+        """Сразу записывает отложенные конфигурации (например, при выходе)"""
+        # Писатель и выход не должны писать один файл одновременно
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for filename, config_data in pending.items():
+                self.save_config(config_data, filename)
+    
+    def _writer_loop(self) -> None:
+        while True:
+            self._save_event.wait()
+            first = time.monotonic()
+            # Каждое новое изменение продлевает паузу
+            while True:
+                self._save_event.clear()
+                remaining = self.max_save_delay - (time.monotonic() - first)
+                if remaining <= 0 or not self._save_event.wait(min(self.save_delay, remaining)):
+                    break
+            self.flush()
+    
+    def _is_own_write(self, name: str) -> bool:
+        """Файл не менялся с нашей последней записи"""
+        mtime = self._own_writes.get(name)
+        if mtime is None:
+            return False
+        try:
+            return os.stat(self.config_dir / name).st_mtime_ns == mtime
+        except OSError:
+            return False
+    
     def load_config(self, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Загружает конфигурацию из JSON файла
@@ -107,6 +284,66 @@ class ConfigManager:
             self.logger.error(f"Ошибка загрузки конфигурации: {e}")
             return None
     
+    def watch(self, callback: Callable[[str], None], poll_interval: float = 0.5) -> None:
+        """
+        Следит за директорией конфигураций в фоновом потоке
+        
+        Args:
+            callback: Вызывается с именем измененного .json файла (из фонового потока);
+                      собственные записи менеджера не сообщаются
+            poll_interval: Период опроса, если inotify недоступен (не Linux)
+        """
+        if self._watch_thread is not None:
+            return
+        self._stop_watch.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, args=(callback, poll_interval))
+        self._watch_thread.daemon = True
+        self._watch_thread.start()
+    
+    def stop_watching(self) -> None:
+        """Останавливает слежение за директорией"""
+        self._stop_watch.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=1.0)
+            self._watch_thread = None
+    
+    def _watch_loop(self, callback: Callable[[str], None], poll_interval: float) -> None:
+        try:
+            inotify = Inotify()
+            inotify.add_watch(str(self.config_dir), Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO)
+        except (OSError, AttributeError) as e:
+            self.logger.info(f"inotify недоступен, опрос директории конфигураций: {e}")
+            self._poll_loop(callback, poll_interval)
+            return
+        
+        try:
+            while not self._stop_watch.is_set():
+                # Таймаут - только чтобы заметить остановку
+                if not select.select([inotify.fd], [], [], poll_interval)[0]:
+                    continue
+                for name in {name for _, name in inotify.read() if name.endswith(".json")}:
+                    if not self._is_own_write(name):
+                        callback(name)
+        finally:
+            inotify.close()
+    
+    def _poll_loop(self, callback: Callable[[str], None], poll_interval: float) -> None:
+        """Запасной вариант: сравнение mtime файлов раз в poll_interval"""
+        def snapshot() -> Dict[str, int]:
+            try:
+                return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(self.config_dir)
+                        if entry.name.endswith(".json")}
+            except OSError:
+                return {}
+        
+        known = snapshot()
+        while not self._stop_watch.wait(poll_interval):
+            current = snapshot()
+            for name, mtime in current.items():
+                if known.get(name) != mtime and not self._is_own_write(name):
+                    callback(name)
+            known = current
+    
     def get_config_list(self) -> list:
         """Возвращает список доступных конфигурационных файлов"""
         config_files = []
@@ -114,139 +351,1559 @@ class ConfigManager:
             config_files.append(file.name)
         return sorted(config_files)
 
+class ProfileStore:
+    """
+    Профили - все конфигурации директории, заранее загруженные в память.
+    
+    Файлы проверяются при загрузке и обновляются по событиям слежения,
+    поэтому переключение профиля не читает диск и не разбирает JSON.
+    Словарь профилей заменяется целиком, и потоки хуков читают его без блокировок.
+    """
+    
+    def __init__(self, config_manager: ConfigManager, parse: Callable[[Dict[str, Any]], Any]):
+        """
+        Args:
+            config_manager: Источник файлов конфигураций
+            parse: Проверка словаря конфигурации (ValueError - файл пропускается)
+        """
+        self.config_manager = config_manager
+        self.parse = parse
+        self.profiles: Dict[str, Any] = {}
+    
+    def load_all(self) -> None:
+        """Загружает все конфигурации директории"""
+        profiles = {}
+        for name in self.config_manager.get_config_list():
+            profile = self._load(name)
+            if profile is not None:
+                profiles[name] = profile
+        self.profiles = profiles
+    
+    def reload(self, name: str) -> Optional[Any]:
+        """Перечитывает один файл; некорректный или удаленный файл убирается из профилей"""
+        profile = self._load(name)
+        profiles = dict(self.profiles)
+        if profile is None:
+            profiles.pop(name, None)
+        else:
+            profiles[name] = profile
+        self.profiles = profiles
+        return profile
+    
+    def put(self, name: str, profile: Any) -> Optional[Any]:
+        """Обновляет профиль без чтения файла; возвращает прежний"""
+        profiles = dict(self.profiles)
+        old = profiles.get(name)
+        profiles[name] = profile
+        self.profiles = profiles
+        return old
+    
+    def get(self, name: str) -> Optional[Any]:
+        return self.profiles.get(name)
+    
+    def _load(self, name: str) -> Optional[Any]:
+        config_data = self.config_manager.load_config(name)
+        if config_data is None:
+            return None
+        try:
+            return self.parse(config_data)
+        except ValueError as e:
+            self.config_manager.logger.warning(f"Профиль {name} пропущен: {e}")
+            return None
+
 class MacroManager:
     """Менеджер для работы с макросами"""
     
-    def __init__(self, macro_dir: str = "macros"):
+    def __init__(self, macro_dir: str = "macros", cache_budget: int = 32 * 1024 * 1024):
         self.macro_dir = Path(macro_dir)
         self._ensure_macro_dir()
+        self.cache = MacroCache(cache_budget)
+        
+    def _ensure_macro_dir(self) -> None:
+        """Создает директорию для макросов, если она не существует"""
+        self.macro_dir.mkdir(exist_ok=True, parents=True)
+    
+    def save_macro(self, macro: Union[List[Dict], Dict[str, Any]], filename: str) -> bool:
+        """Сохраняет макрос в файл (список событий или структуру с блоками)"""
+        try:
+            macro_path = self.macro_dir / filename
+            with open(macro_path, 'w', encoding='utf-8') as f:
+                json.dump(macro, f, indent=4, ensure_ascii=False)
+            # Скомпилированные макросы включают вызванные под-макросы, поэтому
+            # после перезаписи файла кэш сбрасывается целиком
+            self.cache.clear()
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения макроса: {e}")
+            return False
+    
+    def load_macro(self, filename: str) -> Optional[Union[List[Dict], Dict[str, Any]]]:
+        """Загружает макрос из файла"""
+        try:
+            macro_path = self.macro_dir / filename
+            with open(macro_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Ошибка загрузки макроса: {e}")
+            return None
+    
+    def get_macro_list(self) -> list:
+        """Возвращает список доступных макросов"""
+        macro_files = []
+        for file in self.macro_dir.glob("*.json"):
+            macro_files.append(file.name)
+        return sorted(macro_files)
+    
+    def preload(self, filename: str) -> Optional['MacroBlock']:
+        """
+        Загружает и компилирует макрос в кэш.
+        
+        Если файл не менялся с прошлой загрузки, используется готовая
+        скомпилированная версия из кэша.
+        """
+        try:
+            mtime = (self.macro_dir / filename).stat().st_mtime_ns
+            program = self.cache.get(filename, mtime)
+            if program is not None:
+                return program
+            
+            macro = self.load_macro(filename)
+            if macro is None:
+                return None
+            program = compile_macro(macro, self.load_macro)
+            self.cache.put(filename, program, mtime)
+            return program
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logging.error(f"Ошибка предзагрузки макроса {filename}: {e}")
+            return None
+    
+    def preload_async(self, filenames: List[str]) -> threading.Thread:
+        """Предзагружает макросы в фоновом потоке"""
+        thread = threading.Thread(target=lambda: [self.preload(name) for name in filenames])
+        thread.daemon = True
+        thread.start()
+        return thread
+
+# Коды операций скомпилированного макроса
+OP_PRESS = 0
+OP_RELEASE = 1
+OP_CLICK = 2
+OP_MOVE = 3
+OP_WAIT = 4
+OP_LOOP = 5
+OP_CALL = 6
+
+EVENT_OPS = {'press': OP_PRESS, 'release': OP_RELEASE, 'click': OP_CLICK, 'move': OP_MOVE}
+MACRO_BUTTONS = ('left', 'right', 'middle', 'x', 'x2')
+MACRO_SLOT_COUNT = 4
+
+class MacroBlock:
+    """
+    Скомпилированный блок макроса.
+    
+    Операции хранятся по колонкам в массивах array, а циклы и вызовы
+    под-макросов ссылаются на вложенные блоки. Повторы исполняются
+    движком воспроизведения и не копируют события в памяти.
+    """
+    
+    __slots__ = ('ops', 'delays', 'args_a', 'args_b', 'children')
+    
+    def __init__(self):
+        self.ops = array('B')      # код операции
+        self.delays = array('d')   # задержка перед операцией, сек
+        self.args_a = array('i')   # x / индекс кнопки / индекс вложенного блока
+        self.args_b = array('i')   # y / число повторов вложенного блока
+        self.children: List['MacroBlock'] = []
+    
+    def __len__(self) -> int:
+        return len(self.ops)
+    
+    def add(self, op: int, delay: float, a: int = 0, b: int = 0) -> None:
+        """Добавляет операцию в конец блока"""
+        self.ops.append(op)
+        self.delays.append(delay)
+        self.args_a.append(a)
+        self.args_b.append(b)
+    
+    def add_block(self, op: int, delay: float, block: 'MacroBlock', count: int) -> None:
+        """Добавляет цикл или вызов под-макроса"""
+        self.children.append(block)
+        self.add(op, delay, len(self.children) - 1, count)
+
+def compile_macro(macro: Union[List[Dict], Dict[str, Any]],
+                  loader: Optional[Callable[[str], Any]] = None) -> MacroBlock:
+    """
+    Компилирует макрос в дерево блоков MacroBlock
+    
+    Макрос - либо список записанных событий, либо словарь {"body": [...]},
+    где кроме событий допускаются элементы:
+        {"type": "loop", "count": N, "body": [...]}  - повтор N раз (0 - до остановки)
+        {"type": "wait", "duration": сек}            - пауза
+        {"type": "call", "macro": "имя.json", "count": N} - вызов под-макроса
+    Метки "timestamp" отсчитываются от начала своего блока; пока исполняется
+    вложенный элемент, часы родительского блока стоят.
+    
+    Args:
+        macro: Данные макроса
+        loader: Функция загрузки под-макроса по имени файла
+    
+    Raises:
+        ValueError: Некорректная структура макроса или рекурсивный вызов
+    """
+    body = macro.get('body') if isinstance(macro, dict) else macro
+    return _compile_body(body, loader, {}, ())
+
+def _compile_body(body, loader, called: Dict[str, MacroBlock], stack: Tuple[str, ...]) -> MacroBlock:
+    """Компилирует список элементов одного блока"""
+    if not isinstance(body, list):
+        raise ValueError("Тело блока макроса должно быть списком")
+    
+    block = MacroBlock()
+    prev = 0.0
+    pending = 0.0  # задержка пропущенных пустых блоков переносится на следующую операцию
+    for item in body:
+        kind = item.get('type')
+        timestamp = float(item.get('timestamp', prev))
+        delay = pending + max(0.0, timestamp - prev)
+        prev = max(prev, timestamp)
+        pending = 0.0
+        
+        if kind in EVENT_OPS:
+            op = EVENT_OPS[kind]
+            if op == OP_MOVE:
+                block.add(op, delay, int(item['x']), int(item['y']))
+            else:
+                button = item.get('button') or 'left'
+                if button not in MACRO_BUTTONS:
+                    raise ValueError(f"Неизвестная кнопка мыши: {button}")
+                block.add(op, delay, MACRO_BUTTONS.index(button))
+        elif kind == 'wait':
+            block.add(OP_WAIT, delay + max(0.0, float(item.get('duration', 0))))
+        elif kind in ('loop', 'call'):
+            count = int(item.get('count', 0 if kind == 'loop' else 1))
+            if count < 0:
+                raise ValueError("Число повторов не может быть отрицательным")
+            if kind == 'loop':
+                child = _compile_body(item.get('body'), loader, called, stack)
+            else:
+                child = _compile_call(item.get('macro'), loader, called, stack)
+            if len(child):
+                block.add_block(OP_LOOP if kind == 'loop' else OP_CALL, delay, child, count)
+            else:
+                pending = delay
+        else:
+            raise ValueError(f"Неизвестный тип элемента макроса: {kind}")
+    
+    if pending and len(block):
+        block.add(OP_WAIT, pending)
+    return block
+
+def _compile_call(name, loader, called: Dict[str, MacroBlock], stack: Tuple[str, ...]) -> MacroBlock:
+    """Компилирует под-макрос один раз; повторные вызовы разделяют один блок"""
+    if not name or loader is None:
+        raise ValueError("Вызов под-макроса недоступен: не указано имя или загрузчик")
+    if name in stack:
+        raise ValueError(f"Рекурсивный вызов макроса: {' -> '.join(stack + (name,))}")
+    if name not in called:
+        macro = loader(name)
+        if macro is None:
+            raise ValueError(f"Под-макрос не найден: {name}")
+        body = macro.get('body') if isinstance(macro, dict) else macro
+        called[name] = _compile_body(body, loader, called, stack + (name,))
+    return called[name]
+
+class MacroCache:
+    """
+    LRU-кэш скомпилированных макросов с ограничением по памяти.
+    
+    Чтение из кэша не делает файлового ввода-вывода и разбора JSON, поэтому
+    его можно вызывать прямо из обработчика горячей клавиши.
+    """
+    
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.size = 0
+        self._entries: 'OrderedDict[str, Tuple[MacroBlock, int, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def measure(program: MacroBlock) -> int:
+        """Оценивает объем памяти блока вместе с вложенными (общие блоки учитываются один раз)"""
+        seen = set()
+        stack = [program]
+        total = 0
+        while stack:
+            block = stack.pop()
+            if id(block) in seen:
+                continue
+            seen.add(id(block))
+            total += sys.getsizeof(block) + sum(
+                sys.getsizeof(column) for column in (block.ops, block.delays, block.args_a, block.args_b)
+            )
+            stack.extend(block.children)
+        return total
+    
+    def get(self, name: str, mtime: Optional[int] = None) -> Optional[MacroBlock]:
+        """Возвращает макрос из кэша (и помечает его как недавно использованный)"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or (mtime is not None and entry[1] != mtime):
+                return None
+            self._entries.move_to_end(name)
+            return entry[0]
+    
+    def put(self, name: str, program: MacroBlock, mtime: int = 0) -> None:
+        """Кладет макрос в кэш, вытесняя давно не использованные при превышении бюджета"""
+        size = self.measure(program)
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[name] = (program, mtime, size)
+            self.size += size
+            while self.size > self.budget and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+    
+    def clear(self) -> None:
+        """Удаляет все макросы из кэша"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+class InjectionLog:
+    """
+    Журнал событий, которые программа сама отправила в систему.
+    
+    Хук мыши видит и синтетические события кликера и макросов. Перед
+    инъекцией бэкенд отмечает событие в журнале, а обработчик хука
+    отбрасывает событие, если находит для него пару не старше window секунд.
+    Время - в шкале time.time(), как поле .time событий библиотеки mouse.
+    """
+    
+    def __init__(self, capacity: int = 256, window: float = 0.05):
+        self.window = window
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+    
+    def note(self, kind: int, button: int = -1, x: int = 0, y: int = 0) -> None:
+        """Отмечает событие перед инъекцией"""
+        entry = (time.time(), kind, button, x, y)
+        with self._lock:
+            self._entries.append(entry)
+    
+    def consume(self, kind: int, button: int, x: int, y: int, event_time: float) -> bool:
+        """
+        Ищет и удаляет запись о синтетическом событии
+        
+        Returns:
+            bool: True если событие было отправлено самой программой
+        """
+        with self._lock:
+            entries = self._entries
+            # Устаревшие записи (событие так и не пришло в хук) выбрасываем
+            while entries and entries[0][0] < event_time - self.window:
+                entries.popleft()
+            for entry in entries:
+                if entry[0] - self.window > event_time:
+                    break
+                if entry[1] == kind and (entry[2] == button if kind != OP_MOVE else entry[3:] == (x, y)):
+                    entries.remove(entry)
+                    return True
+        return False
+
+class EventColumns:
+    """
+    Колоночное хранилище записываемых событий.
+    
+    Время хранится в наносекундах монотонных часов от начала записи.
+    """
+    
+    __slots__ = ('kinds', 'buttons', 'xs', 'ys', 'times')
+    
+    def __init__(self):
+        self.kinds = array('B')    # OP_PRESS / OP_RELEASE / OP_CLICK / OP_MOVE
+        self.buttons = array('b')  # индекс в MACRO_BUTTONS, -1 - без кнопки
+        self.xs = array('i')
+        self.ys = array('i')
+        self.times = array('q')    # нс от начала записи
+    
+    def __len__(self) -> int:
+        return len(self.kinds)
+    
+    def append(self, kind: int, button: int, x: int, y: int, t_ns: int) -> None:
+        """Добавляет событие; время не может идти назад"""
+        if self.times and t_ns < self.times[-1]:
+            t_ns = self.times[-1]
+        self.kinds.append(kind)
+        self.buttons.append(button)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.times.append(t_ns)
+    
+    def compile(self) -> MacroBlock:
+        """Компилирует запись в блок макроса без промежуточных словарей"""
+        block = MacroBlock()
+        prev = 0
+        for kind, button, x, y, t_ns in zip(self.kinds, self.buttons, self.xs, self.ys, self.times):
+            if kind == OP_MOVE:
+                block.add(kind, (t_ns - prev) / 1e9, x, y)
+            else:
+                block.add(kind, (t_ns - prev) / 1e9, button)
+            prev = t_ns
+        return block
+    
+    def to_events(self) -> List[Dict]:
+        """Возвращает события в формате JSON-файла макроса"""
+        kind_names = {op: name for name, op in EVENT_OPS.items()}
+        return [
+            {
+                'type': kind_names[kind],
+                'button': MACRO_BUTTONS[button] if button >= 0 else None,
+                'x': x if kind == OP_MOVE else None,
+                'y': y if kind == OP_MOVE else None,
+                'timestamp': t_ns / 1e9
+            }
+            for kind, button, x, y, t_ns in zip(self.kinds, self.buttons, self.xs, self.ys, self.times)
+        ]
+
+class MacroRecorder:
+    """Класс для записи и воспроизведения макросов"""
+    
+    def __init__(self, injection_log: Optional[InjectionLog] = None):
+        self.recording = False
+        self.playing = False
+        self.paused = False
+        self.injection_log = injection_log
+        self.recorded = EventColumns()
+        self.macro = None
+        self.program: Optional[MacroBlock] = None
+        self.start_ns = 0
+        self.wall_offset_ns = 0
+        self.thread = None
+        self._generation = 0
+        # Исполненные события мыши (для графика; пишет поток воспроизведения)
+        self.events_played = 0
+    
+    def start_recording(self):
+        """Начинает запись макроса"""
+        self.recorded = EventColumns()
+        self.macro = None
+        self.program = None
+        # Смещение между системными и монотонными часами: метки событий
+        # приходят в системном времени, а запись ведется в монотонном
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.start_ns = time.monotonic_ns()
+        self.recording = True
+    
+    def stop_recording(self):
+        """Останавливает запись макроса"""
+        self.recording = False
+    
+    def load(self, macro: Union[List[Dict], Dict[str, Any]],
+             loader: Optional[Callable[[str], Any]] = None) -> None:
+        """Загружает и компилирует макрос (ValueError при ошибке структуры)"""
+        program = compile_macro(macro, loader)
+        self.macro = macro
+        self.recorded = EventColumns()
+        self.program = program
+    
+    def has_macro(self) -> bool:
+        """Есть ли что воспроизводить"""
+        return len(self.recorded) > 0 or (self.program is not None and len(self.program) > 0)
+    
+    def get_macro_data(self) -> Union[List[Dict], Dict[str, Any]]:
+        """Возвращает данные для сохранения: загруженную структуру или записанные события"""
+        return self.macro if self.macro is not None else self.recorded.to_events()
+    
+    def record_event(self, event_type: str, button: str = None, x: int = None, y: int = None,
+                     event_time: Optional[float] = None):
+        """
+        Записывает событие мыши
+        
+        Args:
+            event_type: 'press', 'release', 'click' или 'move'
+            button: Имя кнопки мыши
+            x, y: Координаты для перемещения
+            event_time: Метка времени самого события (time.time()-шкала, поле .time
+                        событий библиотеки mouse). Без нее берется момент вызова.
+        """
+        kind = EVENT_OPS[event_type]
+        if not self.recording or (kind != OP_MOVE and button not in MACRO_BUTTONS):
+            return
+        
+        if event_time is not None:
+            event_ns = int(event_time * 1e9) - self.wall_offset_ns
+        else:
+            event_ns = time.monotonic_ns()
+        
+        self.recorded.append(
+            kind,
+            MACRO_BUTTONS.index(button) if kind != OP_MOVE else -1,
+            x or 0,
+            y or 0,
+            max(0, event_ns - self.start_ns)
+        )
+    
+    def play_macro(self, repeat: bool = False):
+        """Воспроизводит макрос (repeat - повторять до остановки)"""
+        if self.program is None:
+            if not len(self.recorded):
+                return
+            self.program = self.recorded.compile()
+        self.play_program(self.program, repeat)
+    
+    def play_program(self, program: MacroBlock, repeat: bool = False):
+        """Запускает уже скомпилированный макрос, прерывая текущее воспроизведение"""
+        if not len(program):
+            return
+        
+        self._generation += 1
+        self.playing = True
+        self.paused = False
+        
+        self.thread = threading.Thread(target=self._play_thread, args=(program, 0 if repeat else 1, self._generation))
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def _is_current(self, generation: int) -> bool:
+        """Проверяет, что поток воспроизведения не остановлен и не заменен новым"""
+        return self.playing and self._generation == generation
+    
+    def _play_thread(self, program: MacroBlock, count: int, generation: int):
+        """
+        Исполняет скомпилированный макрос.
+        
+        Вложенные блоки исполняются через явный стек кадров [блок, позиция,
+        оставшиеся повторы], поэтому циклы не разворачиваются в памяти.
+        """
+        stack = [[program, 0, count]]
+        deadline = time.perf_counter()
+        
+        while stack and self._is_current(generation):
+            frame = stack[-1]
+            block, pc = frame[0], frame[1]
+            
+            if pc >= len(block.ops):
+                if frame[2] == 1:
+                    stack.pop()
+                else:
+                    if frame[2] > 1:
+                        frame[2] -= 1
+                    frame[1] = 0
+                continue
+            
+            frame[1] = pc + 1
+            deadline = self._wait_until(deadline + block.delays[pc], generation)
+            if deadline is None:
+                break
+            
+            op = block.ops[pc]
+            if op <= OP_MOVE and self.injection_log is not None:
+                if op == OP_CLICK:
+                    self.injection_log.note(OP_PRESS, block.args_a[pc])
+                    self.injection_log.note(OP_RELEASE, block.args_a[pc])
+                elif op == OP_MOVE:
+                    self.injection_log.note(OP_MOVE, -1, block.args_a[pc], block.args_b[pc])
+                else:
+                    self.injection_log.note(op, block.args_a[pc])
+            
+            if op == OP_MOVE:
+                mouse.move(block.args_a[pc], block.args_b[pc])
+            elif op == OP_PRESS:
+                mouse.press(MACRO_BUTTONS[block.args_a[pc]])
+            elif op == OP_RELEASE:
+                mouse.release(MACRO_BUTTONS[block.args_a[pc]])
+            elif op == OP_CLICK:
+                mouse.click(MACRO_BUTTONS[block.args_a[pc]])
+            elif op == OP_LOOP or op == OP_CALL:
+                stack.append([block.children[block.args_a[pc]], 0, block.args_b[pc]])
+            
+            if op <= OP_MOVE:
+                self.events_played += 1
+        
+        if self._generation == generation:
+            self.playing = False
+            self.paused = False
+    
+    def _wait_until(self, deadline: float, generation: int) -> Optional[float]:
+        """
+        Ждет наступления момента deadline (perf_counter).
+        
+        Время, проведенное на паузе, сдвигает deadline. Возвращает
+        скорректированный deadline или None, если воспроизведение остановлено.
+        """
+        while self._is_current(generation):
+            if self.paused:
+                paused_at = time.perf_counter()
+                while self.paused and self._is_current(generation):
+                    time.sleep(0.01)
+                deadline += time.perf_counter() - paused_at
+                continue
+            
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return deadline
+            time.sleep(min(remaining, 0.01))
+        return None
+    
+    def pause_macro(self):
+        """Приостанавливает воспроизведение макроса"""
+        self.paused = True
+    
+    def resume_macro(self):
+        """Возобновляет воспроизведение макроса"""
+        self.paused = False
+    
+    def stop_macro(self):
+        """Останавливает воспроизведение макроса"""
+        self.playing = False
+        self.paused = False
+
+# Модификаторы горячих клавиш: имя -> бит маски
+MODIFIER_BITS = {'ctrl': 1, 'shift': 2, 'alt': 4, 'win': 8}
+KEY_ALIASES = {
+    'control': 'ctrl', 'left ctrl': 'ctrl', 'right ctrl': 'ctrl', 'leftctrl': 'ctrl', 'rightctrl': 'ctrl',
+    'left shift': 'shift', 'right shift': 'shift', 'leftshift': 'shift', 'rightshift': 'shift',
+    'left alt': 'alt', 'right alt': 'alt', 'alt gr': 'alt', 'leftalt': 'alt', 'rightalt': 'alt',
+    'windows': 'win', 'left windows': 'win', 'right windows': 'win', 'super': 'win', 'meta': 'win',
+    'leftmeta': 'win', 'rightmeta': 'win', 'cmd': 'win', 'command': 'win',
+    'escape': 'esc', 'return': 'enter',
+}
+# Кнопки мыши как триггеры (в порядке MACRO_BUTTONS)
+MOUSE_TRIGGER_NAMES = ('mouse1', 'mouse2', 'mouse3', 'mouse4', 'mouse5')
+
+def normalize_key_name(name: str) -> str:
+    """Приводит имя клавиши к каноническому виду"""
+    name = name.strip().lower()
+    return KEY_ALIASES.get(name, name)
+
+def parse_hotkey(spec: str) -> List[Tuple[int, str]]:
+    """
+    Разбирает запись горячей клавиши
+    
+    Примеры: "F6", "ctrl+shift+x", "mouse4", последовательность "ctrl+k, ctrl+c".
+    
+    Returns:
+        List[Tuple[int, str]]: Шаги (маска модификаторов, основная клавиша)
+    
+    Raises:
+        ValueError: Некорректная запись
+    """
+    steps = []
+    for step in spec.split(','):
+        names = [normalize_key_name(part) for part in step.split('+')]
+        *modifiers, key = names
+        if not key or not all(modifiers):
+            raise ValueError(f"Пустая клавиша в '{spec}'")
+        if key in MODIFIER_BITS:
+            raise ValueError(f"Шаг '{step.strip()}' должен заканчиваться не модификатором")
+        mods = 0
+        for name in modifiers:
+            if name not in MODIFIER_BITS:
+                raise ValueError(f"В шаге '{step.strip()}' больше одной основной клавиши")
+            mods |= MODIFIER_BITS[name]
+        steps.append((mods, key))
+    return steps
+
+class HotkeyMatcher:
+    """
+    Инкрементальный автомат сопоставления горячих клавиш.
+    
+    Привязки компилируются в префиксное дерево по шагам (модификаторы,
+    клавиша). Автомат хранит маску зажатых модификаторов и текущий узел
+    дерева, поэтому любое событие обходится одним-двумя поисками в словаре.
+    Источник событий не важен: хуки keyboard/mouse и evdev подают сюда
+    одинаково нормализованные имена.
+    
+    Привязка с действием на отпускание работает как удержание: действие
+    нажатия вызывается сразу при нажатии, действие отпускания - при
+    отпускании последней клавиши привязки.
+    """
+    
+    def __init__(self, bindings: List[Tuple], sequence_timeout: float = 1.0):
+        """
+        Args:
+            bindings: Кортежи (запись горячей клавиши, действие) или
+                      (запись, действие нажатия, действие отпускания);
+                      при совпадении записей срабатывает привязка, указанная раньше
+            sequence_timeout: Максимальная пауза между шагами последовательности, сек
+        
+        Raises:
+            ValueError: Некорректная или конфликтующая запись
+        """
+        self.root: Dict[Tuple[int, str], Any] = {}
+        self.keys = set()
+        for spec, action, *on_release in bindings:
+            steps = parse_hotkey(spec)
+            node = self.root
+            for step in steps[:-1]:
+                node = node.setdefault(step, {})
+                if not isinstance(node, dict):
+                    raise ValueError(f"Последовательность '{spec}' начинается с другой горячей клавиши")
+            if isinstance(node.get(steps[-1]), dict):
+                raise ValueError(f"Горячая клавиша '{spec}' - начало другой последовательности")
+            node.setdefault(steps[-1], (action, on_release[0] if on_release else None))
+            for mods, key in steps:
+                self.keys.add(key)
+                self.keys.update(name for name, bit in MODIFIER_BITS.items() if mods & bit)
+        
+        self.uses_mouse = any(key in MOUSE_TRIGGER_NAMES for key in self.keys)
+        self.sequence_timeout = sequence_timeout
+        self.node = self.root
+        self.mods = 0
+        self.pressed = set()
+        self.held: Dict[str, Callable[[], None]] = {}
+        self.step_time = 0.0
+        self._lock = threading.Lock()
+    
+    def feed(self, key: str, down: bool) -> bool:
+        """
+        Обрабатывает нажатие или отпускание (имя уже нормализовано)
+        
+        Returns:
+            bool: True если событие вызвало действие
+        """
+        bit = MODIFIER_BITS.get(key)
+        with self._lock:
+            if bit:
+                self.mods = (self.mods | bit) if down else (self.mods & ~bit)
+                return False
+            if not down:
+                self.pressed.discard(key)
+                action = self.held.pop(key, None)
+            elif key in self.pressed:
+                return False  # автоповтор зажатой клавиши
+            else:
+                self.pressed.add(key)
+                action = self._match(key)
+        
+        if action is None:
+            return False
+        action()
+        return True
+    
+    def adopt(self, other: Optional['HotkeyMatcher']) -> None:
+        """
+        Перенимает состояние клавиш у заменяемого автомата
+        
+        Зажатые клавиши остаются зажатыми: автоповтор не сработает повторно,
+        а отпускание выполнит действие отпускания старой привязки.
+        """
+        if other is None:
+            return
+        with other._lock:
+            self.mods = other.mods
+            self.pressed = set(other.pressed)
+            self.held = dict(other.held)
+    
+    def _match(self, key: str) -> Optional[Callable[[], None]]:
+        """Шаг автомата по нажатию (под блокировкой); возвращает действие"""
+        step = (self.mods, key)
+        node = self.node
+        if node is not self.root and time.monotonic() - self.step_time > self.sequence_timeout:
+            node = self.root
+        target = node.get(step)
+        if target is None and node is not self.root:
+            target = self.root.get(step)
+        
+        if isinstance(target, dict):
+            self.node = target
+            self.step_time = time.monotonic()
+            return None
+        self.node = self.root
+        if target is None:
+            return None
+        action, on_release = target
+        if on_release is not None:
+            self.held[key] = on_release
+        return action
+
+# Темы оформления - данные: новая тема добавляется записью в этот словарь.
+# palette - цвета QPalette, colors - подстановки в THEME_QSS,
+# buttons - роль кнопки (свойство role) -> (фон, рамка и нажатие, наведение)
+THEME_DATA: Dict[str, Dict[str, Any]] = {
+    'purple': {
+        'title': "Фиолетово-чёрная",
+        'palette': {
+            'Window': '#1e1b2e', 'WindowText': '#e0e0e0', 'Base': '#2d2b55', 'AlternateBase': '#3b3054',
+            'ToolTipBase': '#bb86fc', 'ToolTipText': '#000000', 'Text': '#e0e0e0', 'Button': '#3b3054',
+            'ButtonText': '#e0e0e0', 'BrightText': '#ffffff', 'Link': '#9c27b0', 'Highlight': '#7b1fa2',
+            'HighlightedText': '#ffffff',
+        },
+        'colors': {
+            'window': '#1e1b2e', 'heading': '#bb86fc', 'border': '#7b1fa2', 'text': '#e0e0e0',
+            'input': '#2d2b55', 'selection': '#7b1fa2', 'status': '#03dac6', 'status_bg': '#2d2b55',
+        },
+        'buttons': {
+            'accent': ('#7b1fa2', '#6a1b9a', '#9c27b0'),
+            'accent_alt': ('#9c27b0', '#7b1fa2', '#bb86fc'),
+            'success': ('#4CAF50', '#45a049', '#66BB6A'),
+            'danger': ('#f44336', '#d32f2f', '#ef5350'),
+            'warning': ('#FF9800', '#F57C00', '#FFA726'),
+            'info': ('#2196F3', '#1976D2', '#42A5F5'),
+        },
+    },
+    'pink': {
+        'title': "Розово-белая",
+        'palette': {
+            'Window': '#fff0f5', 'WindowText': '#4b0082', 'Base': '#ffffff', 'AlternateBase': '#ffe4e1',
+            'ToolTipBase': '#ffb6c1', 'ToolTipText': '#000000', 'Text': '#4b0082', 'Button': '#ffb6c1',
+            'ButtonText': '#4b0082', 'BrightText': '#ff1493', 'Link': '#c71585', 'Highlight': '#ff69b4',
+            'HighlightedText': '#ffffff',
+        },
+        'colors': {
+            'window': '#fff0f5', 'heading': '#ff69b4', 'border': '#ffb6c1', 'text': '#4b0082',
+            'input': '#ffffff', 'selection': '#ffb6c1', 'status': '#ff1493', 'status_bg': '#ffffff',
+        },
+        'buttons': {
+            'accent': ('#ff69b4', '#ff1493', '#ff85a2'),
+            'accent_alt': ('#ff85a2', '#ff69b4', '#ffa7b6'),
+            'success': ('#66BB6A', '#4CAF50', '#81C784'),
+            'danger': ('#ff6b6b', '#ff4757', '#ff8f8f'),
+            'warning': ('#FFA726', '#FF9800', '#FFB74D'),
+            'info': ('#42A5F5', '#2196F3', '#64B5F6'),
+        },
+    },
+}
+
+# Таблица стилей всего приложения; заголовок и статус выбираются по objectName
+THEME_QSS = """
+QMainWindow {
+    background-color: $window;
+}
+QLabel#title {
+    color: $heading;
+    margin: 10px;
+}
+QGroupBox {
+    color: $heading;
+    font-weight: bold;
+    border: 2px solid $border;
+    border-radius: 8px;
+    margin-top: 10px;
+    padding-top: 15px;
+}
+QGroupBox::title {
+    subcontrol-origin: margin;
+    left: 10px;
+    padding: 0 5px 0 5px;
+}
+QComboBox, QDoubleSpinBox, QTextEdit {
+    color: $text;
+    background-color: $input;
+    border: 1px solid $border;
+    border-radius: 4px;
+    padding: 5px;
+}
+QComboBox QAbstractItemView {
+    color: $text;
+    background-color: $input;
+    selection-background-color: $selection;
+}
+QCheckBox {
+    color: $text;
+    spacing: 5px;
+}
+QPushButton[role] {
+    color: #ffffff;
+    padding: 8px;
+    font-weight: bold;
+    border-radius: 6px;
+    min-width: 100px;
+    font-size: 11px;
+}
+$buttons
+QPushButton[role]:disabled {
+    background-color: #cccccc;
+    color: #666666;
+    border-color: #999999;
+}
+QLabel#status {
+    color: $status;
+    font-weight: bold;
+    padding: 8px;
+    background-color: $status_bg;
+    border-radius: 6px;
+    border: 1px solid $border;
+}
+"""
+
+THEME_BUTTON_QSS = """
+QPushButton[role="$role"] {
+    background-color: $background;
+    border: 2px solid $border;
+}
+QPushButton[role="$role"]:hover {
+    background-color: $hover;
+    border-color: $hover;
+}
+QPushButton[role="$role"]:pressed {
+    background-color: $border;
+    border-color: $border;
+}"""
+
+@functools.lru_cache(maxsize=None)
+def compile_theme(name: str) -> Tuple[str, QPalette]:
+    """
+    Собирает таблицу стилей и палитру темы (один раз, дальше из кэша)
+    
+    Raises:
+        KeyError: Неизвестная тема
+    """
+    theme = THEME_DATA[name]
+    buttons = "".join(
+        Template(THEME_BUTTON_QSS).substitute(role=role, background=background, border=border, hover=hover)
+        for role, (background, border, hover) in theme['buttons'].items()
+    )
+    stylesheet = Template(THEME_QSS).substitute(theme['colors'], buttons=buttons)
+    
+    palette = QPalette()
+    for role, color in theme['palette'].items():
+        palette.setColor(getattr(QPalette, role), QColor(color))
+    return stylesheet, palette
+
+class ClickerConfig:
+    """
+    Типизированные настройки автокликера.
+    
+    Словарь из JSON проверяется один раз в from_dict; дальше движок и
+    интерфейс читают готовые поля без .get() и преобразований.
+    """
+    
+    __slots__ = (
+        'theme', 'acceleration', 'start_interval', 'min_interval', 'base_interval',
+        'reset_key', 'lkm_key', 'pkm_key', 'play_macro_key', 'pause_macro_key', 'stop_macro_key',
+        'record_macro_key', 'stop_record_key', 'pause_record_key', 'profile_key',
+        'macro_slots', 'hold_mode', 'optimization', 'window_geometry',
+    )
+    
+    THEMES = tuple(THEME_DATA)
+    BOOL_FIELDS = ('acceleration', 'hold_mode', 'optimization')
+    # Интервал (мс) -> верхняя граница, как у полей ввода
+    INTERVAL_LIMITS = {'start_interval': 2000.0, 'min_interval': 1000.0, 'base_interval': 2000.0}
+    HOTKEY_FIELDS = (
+        'reset_key', 'lkm_key', 'pkm_key', 'play_macro_key', 'pause_macro_key', 'stop_macro_key',
+        'record_macro_key', 'stop_record_key', 'pause_record_key', 'profile_key',
+    )
+    # Поля, от которых зависят кликеры и автомат горячих клавиш движка
+    CLICKER_FIELDS = frozenset(('acceleration',) + tuple(INTERVAL_LIMITS))
+    MATCHER_FIELDS = frozenset(('acceleration', 'hold_mode', 'macro_slots') + HOTKEY_FIELDS)
+    GEOMETRY_DEFAULTS = {'x': 100, 'y': 100, 'width': 600, 'height': 500}
+    
+    DEFAULTS = {
+        'theme': 'purple', 'acceleration': False,
+        'start_interval': 500.0, 'min_interval': 10.0, 'base_interval': 100.0,
+        'reset_key': '', 'lkm_key': 'F6', 'pkm_key': 'F7',
+        'play_macro_key': '', 'pause_macro_key': '', 'stop_macro_key': '',
+        'record_macro_key': '', 'stop_record_key': '', 'pause_record_key': '', 'profile_key': '',
+        'macro_slots': (), 'hold_mode': False, 'optimization': True, 'window_geometry': None,
+    }
+    
+    def __init__(self, **fields):
+        unknown = fields.keys() - self.DEFAULTS.keys()
+        if unknown:
+            raise TypeError(f"Неизвестные поля конфигурации: {', '.join(sorted(unknown))}")
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name, self.DEFAULTS[name]))
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ClickerConfig':
+        """
+        Проверяет словарь конфигурации и строит объект
+        
+        Неизвестные ключи игнорируются, отсутствующие берутся по умолчанию.
+        
+        Raises:
+            ValueError: Значение неверного типа или некорректная горячая клавиша
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Конфигурация должна быть объектом JSON")
+        fields = {}
+        
+        theme = data.get('theme', cls.DEFAULTS['theme'])
+        if theme not in cls.THEMES:
+            raise ValueError(f"theme: неизвестная тема '{theme}'")
+        fields['theme'] = theme
+        
+        for name in cls.BOOL_FIELDS:
+            value = data.get(name, cls.DEFAULTS[name])
+            if not isinstance(value, bool):
+                raise ValueError(f"{name}: ожидается true или false")
+            fields[name] = value
+        
+        for name, limit in cls.INTERVAL_LIMITS.items():
+            value = data.get(name, cls.DEFAULTS[name])
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0.001 <= value <= limit:
+                raise ValueError(f"{name}: ожидается число от 0.001 до {limit:g} мс")
+            fields[name] = float(value)
+        
+        for name in cls.HOTKEY_FIELDS:
+            fields[name] = cls._hotkey(name, data.get(name, cls.DEFAULTS[name]))
+        
+        slots = data.get('macro_slots', [])
+        if not isinstance(slots, list) or not all(isinstance(slot, dict) for slot in slots):
+            raise ValueError("macro_slots: ожидается список объектов")
+        fields['macro_slots'] = tuple(
+            (str(slot.get('macro') or ''), cls._hotkey('macro_slots', slot.get('key') or ''))
+            for slot in slots[:MACRO_SLOT_COUNT]
+        )
+        
+        geometry = data.get('window_geometry')
+        if geometry is not None:
+            try:
+                fields['window_geometry'] = tuple(
+                    int(geometry.get(key, default)) for key, default in cls.GEOMETRY_DEFAULTS.items())
+            except (AttributeError, TypeError, ValueError):
+                raise ValueError("window_geometry: ожидаются целые x, y, width, height")
+        
+        return cls(**fields)
+    
+    @staticmethod
+    def _hotkey(name: str, value: Any) -> str:
+        if not isinstance(value, str):
+            raise ValueError(f"{name}: ожидается строка")
+        if value:
+            try:
+                parse_hotkey(value)
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}")
+        return value
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь для сохранения в JSON"""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data['macro_slots'] = [{'macro': macro, 'key': key} for macro, key in self.macro_slots]
+        if self.window_geometry is not None:
+            data['window_geometry'] = dict(zip(self.GEOMETRY_DEFAULTS, self.window_geometry))
+        return data
+    
+    def diff(self, other: Optional['ClickerConfig']) -> set:
+        """Имена полей, которыми конфигурация отличается от other"""
+        if other is None:
+            return set(self.__slots__)
+        return {name for name in self.__slots__ if getattr(self, name) != getattr(other, name)}
+    
+    def engine_error(self) -> Optional[str]:
+        """Сочетания значений, с которыми движок не запускается"""
+        if self.acceleration and self.min_interval >= self.start_interval:
+            return "Конечный интервал должен быть меньше начального"
+        return None
+
+class ClickerEngine:
+    """
+    Движок автокликера: два кликера, их поток и автомат горячих клавиш.
+    
+    Работает только с ClickerConfig и не читает виджеты, поэтому запуск
+    не зависит от окна. Действия макросов передаются снаружи.
+    """
+    
+    def __init__(self, actions: Optional[Dict[str, Callable[[], None]]] = None,
+                 slot_action: Optional[Callable[[str], None]] = None,
+                 injection_log: Optional[InjectionLog] = None,
+                 on_status: Optional[Callable[[str], None]] = None,
+                 profiles: Optional[ProfileStore] = None,
+                 on_profile: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            actions: Поле горячей клавиши (play_macro_key и т.п.) -> действие
+            slot_action: Запуск макроса слота по имени файла
+            injection_log: Журнал синтетических событий для кликеров
+            on_status: Сообщения о переключениях (вызывается из потока хука)
+            profiles: Профили, переключаемые по их profile_key
+            on_profile: Профиль переключен (вызывается из потока хука)
+        """
+        self.actions = actions or {}
+        self.slot_action = slot_action
+        self.injection_log = injection_log
+        self.on_status = on_status or (lambda text: None)
+        self.profiles = profiles
+        self.on_profile = on_profile or (lambda name: None)
+        # Движок меняют и GUI-поток (перезагрузка), и поток хука (профили)
+        self._apply_lock = threading.Lock()
+        self.config: Optional[ClickerConfig] = None
+        self.active = False
+        self.left_clicker: Optional[Clicker] = None
+        self.right_clicker: Optional[Clicker] = None
+        self.hotkey_matcher: Optional[HotkeyMatcher] = None
+        # Будит цикл кликера при включении (без опроса в простое)
+        self.wake = threading.Event()
+        # Пауза цикла кликера (читается на каждой итерации, меняется на лету)
+        self.loop_sleep = 0.001
+        self.thread = None
+    
+    def _make_clicker(self, button: str, config: ClickerConfig) -> 'Clicker':
+        return Clicker(
+            button=button,
+            acceleration=config.acceleration,
+            base_interval=config.base_interval / 1000,
+            start_interval=config.start_interval / 1000,
+            min_interval=config.min_interval / 1000,
+            injection_log=self.injection_log
+        )
+    
+    def build_matcher(self, config: ClickerConfig) -> HotkeyMatcher:
+        """
+        Собирает автомат всех горячих клавиш конфигурации
+        
+        Raises:
+            ValueError: Конфликтующие горячие клавиши
+        """
+        # Порядок задает приоритет при совпадении
+        if config.hold_mode:
+            bindings = [
+                (config.lkm_key, lambda: self.hold(self.left_clicker, True),
+                 lambda: self.hold(self.left_clicker, False)),
+                (config.pkm_key, lambda: self.hold(self.right_clicker, True),
+                 lambda: self.hold(self.right_clicker, False)),
+            ]
+        else:
+            bindings = [
+                (config.lkm_key, lambda: self.toggle(self.left_clicker, "ЛКМ")),
+                (config.pkm_key, lambda: self.toggle(self.right_clicker, "ПКМ")),
+            ]
+        if config.acceleration:
+            bindings.append((config.reset_key, self.reset_acceleration))
+        bindings += [(getattr(config, name), action) for name, action in self.actions.items()]
+        if self.slot_action is not None:
+            bindings += [(key, lambda name=macro: self.slot_action(name))
+                         for macro, key in config.macro_slots if macro and key]
+        if self.profiles is not None:
+            bindings += [(profile.profile_key, lambda name=name: self.switch_profile(name))
+                         for name, profile in self.profiles.profiles.items()]
+        return HotkeyMatcher([binding for binding in bindings if binding[0]])
+    
+    def start(self, config: ClickerConfig) -> None:
+        """
+        Запускает кликеры с конфигурацией
+        
+        Raises:
+            ValueError: Некорректные горячие клавиши (движок не запускается)
+        """
+        matcher = self.build_matcher(config)
+        self.config = config
+        self.left_clicker = self._make_clicker("left", config)
+        self.right_clicker = self._make_clicker("right", config)
+        self.hotkey_matcher = matcher
+        self.loop_sleep = 0.001 if config.optimization else 0.0001
+        
+        self.active = True
+        self.wake.clear()
+        self.thread = threading.Thread(target=self._loop)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def stop(self) -> None:
+        self.active = False
+        for clicker in (self.left_clicker, self.right_clicker):
+            if clicker:
+                clicker.set_active(False)
+        self.wake.set()
+        self.hotkey_matcher = None
+    
+    def apply(self, config: ClickerConfig) -> set:
+        """
+        Переносит разницу настроек в работающий движок без перезапуска
+        
+        Кликеры перенастраиваются на месте (их поток не останавливается),
+        автомат горячих клавиш пересобирается и подменяется одним присваиванием.
+        
+        Returns:
+            set: Имена измененных полей
+        
+        Raises:
+            ValueError: Конфликтующие горячие клавиши (ничего не применено)
+        """
+        with self._apply_lock:
+            return self._apply(config)
+    
+    def _apply(self, config: ClickerConfig) -> set:
+        changed = config.diff(self.config)
+        if not self.active:
+            self.config = config
+            return changed
+        
+        matcher = self.build_matcher(config) if changed & ClickerConfig.MATCHER_FIELDS else None
+        self.config = config
+        
+        if changed & ClickerConfig.CLICKER_FIELDS:
+            for clicker in (self.left_clicker, self.right_clicker):
+                clicker.reconfigure(config.acceleration, config.base_interval / 1000,
+                                    config.start_interval / 1000, config.min_interval / 1000)
+        if "optimization" in changed:
+            self.loop_sleep = 0.001 if config.optimization else 0.0001
+        if matcher is not None:
+            if "hold_mode" in changed:
+                # Отпускание старой привязки уже не придет
+                for clicker in (self.left_clicker, self.right_clicker):
+                    clicker.set_active(False)
+            matcher.adopt(self.hotkey_matcher)
+            self.hotkey_matcher = matcher
+        return changed
+    
+    def refresh_profiles(self) -> None:
+        """Пересобирает автомат после изменения набора профилей или их клавиш"""
+        with self._apply_lock:
+            if not self.active:
+                return
+            try:
+                matcher = self.build_matcher(self.config)
+            except ValueError as e:
+                self.on_status(f"Клавиши профилей не обновлены: {str(e)}")
+                return
+            matcher.adopt(self.hotkey_matcher)
+            self.hotkey_matcher = matcher
+    
+    def switch_profile(self, name: str) -> None:
+        """
+        Переключает на заранее загруженный профиль (поток хука)
+        
+        Кликеры не перезапускаются: новые интервалы действуют с ближайшей паузы.
+        """
+        config = self.profiles.get(name) if self.profiles is not None else None
+        if config is None:
+            return
+        error = config.engine_error()
+        if error:
+            self.on_status(f"Профиль {Path(name).stem} не применен: {error}")
+            return
+        try:
+            self.apply(config)
+        except ValueError as e:
+            self.on_status(f"Профиль {Path(name).stem} не применен: {str(e)}")
+            return
+        self.on_profile(name)
+    
+    def toggle(self, clicker: Optional['Clicker'], name: str) -> None:
+        if clicker:
+            clicker.set_active(not clicker.active)
+            self.wake.set()
+            self.on_status(f"{name} {'ВКЛ' if clicker.active else 'ВЫКЛ'}")
+    
+    def hold(self, clicker: Optional['Clicker'], held: bool) -> None:
+        """Режим удержания: кликер работает, пока зажата клавиша (поток хука)"""
+        if clicker:
+            clicker.set_active(held)
+            # Будим цикл сразу: первый клик - в момент нажатия
+            self.wake.set()
+    
+    def click_counts(self) -> Tuple[int, int]:
+        """Счетчики кликов ЛКМ и ПКМ (из любого потока, без блокировок)"""
+        left, right = self.left_clicker, self.right_clicker
+        return (left.clicks if left else 0, right.clicks if right else 0)
+    
+    def reset_acceleration(self) -> None:
+        for clicker in (self.left_clicker, self.right_clicker):
+            if clicker:
+                clicker.reset_interval()
+        self.on_status("Ускорение сброшено")
+    
+    def _loop(self) -> None:
+        while self.active:
+            try:
+                # Оба кликера выключены - спим до переключения, а не опрашиваем
+                self.wake.clear()
+                if not ((self.left_clicker and self.left_clicker.active) or
+                        (self.right_clicker and self.right_clicker.active)):
+                    self.wake.wait()
+                    continue
+                
+                if self.left_clicker and self.left_clicker.active:
+                    self.left_clicker.click()
+                if self.right_clicker and self.right_clicker.active:
+                    self.right_clicker.click()
+                
+                time.sleep(self.loop_sleep)
+            except Exception as e:
+                logging.error(f"Ошибка в цикле кликера: {e}")
+                self.on_status(f"Ошибка кликера: {e}")
+                break
+
+class GuiUpdateQueue(QObject):
+    """
+    Обновления интерфейса из фоновых потоков.
+    
+    post() вызывается из любого потока: запись добавляется в deque (append
+    атомарен, блокировок нет). GUI-поток разбирает очередь таймером не чаще
+    max_rate раз в секунду. Значения одного ключа схлопываются до последнего,
+    пакетные ключи получают все значения списком, поэтому спам горячими
+    клавишами дает не больше одной перерисовки за тик.
+    """
+    
+    # Очередь ожила (испускается из потока, вызвавшего post)
+    _wakeup = pyqtSignal()
+    
+    def __init__(self, max_rate: int = 20, parent: Optional[QObject] = None):
+        """
+        Args:
+            max_rate: Максимум разборов очереди в секунду
+            parent: Владелец из GUI-потока
+        """
+        super().__init__(parent)
+        self._queue = deque()
+        self._handlers: Dict[str, Tuple[Callable[[Any], None], bool]] = {}
+        self._scheduled = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(max(1, round(1000 / max_rate)))
+        self.timer.timeout.connect(self.flush)
+        self._wakeup.connect(self._on_wakeup)
+    
+    def register(self, key: str, handler: Callable[[Any], None], batch: bool = False) -> None:
+        """
+        Назначает обработчик ключа
         
-    def _ensure_macro_dir(self) -> None:
-        """Создает директорию для макросов, если она не существует"""
-        self.macro_dir.mkdir(exist_ok=True, parents=True)
+        Args:
+            key: Ключ обновления
+            handler: Получает последнее значение, а при batch - список всех по порядку
+            batch: Не схлопывать значения (например, строки лога)
+        """
+        self._handlers[key] = (handler, batch)
     
-    def save_macro(self, events: List[Dict], filename: str) -> bool:
-        """Сохраняет макрос в файл"""
-        try:
-            macro_path = self.macro_dir / filename
-            with open(macro_path, 'w', encoding='utf-8') as f:
-                json.dump(events, f, indent=4, ensure_ascii=False)
-            return True
-        except Exception as e:
-            logging.error(f"Ошибка сохранения макроса: {e}")
-            return False
+    def post(self, key: str, value: Any) -> None:
+        """Ставит обновление в очередь (любой поток)"""
+        self._queue.append((key, value))
+        if not self._scheduled:
+            self._scheduled = True
+            self._wakeup.emit()
     
-    def load_macro(self, filename: str) -> Optional[List[Dict]]:
-        """Загружает макрос из файла"""
-        try:
-            macro_path = self.macro_dir / filename
-            with open(macro_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            logging.error(f"Ошибка загрузки макроса: {e}")
-            return None
+    def _on_wakeup(self) -> None:
+        # Таймер стоит - с прошлого разбора прошел хотя бы интервал, разбираем сразу
+        if not self.timer.isActive():
+            self.timer.start()
+            self.flush()
     
-    def get_macro_list(self) -> list:
-        """Возвращает список доступных макросов"""
-        macro_files = []
-        for file in self.macro_dir.glob("*.json"):
-            macro_files.append(file.name)
-        return sorted(macro_files)
+    def flush(self) -> None:
+        """Применяет накопленные обновления (GUI-поток)"""
+        self._scheduled = False
+        queue = self._queue
+        if not queue:
+            # Тик без обновлений: таймер не крутится в простое
+            self.timer.stop()
+            return
+        pending: Dict[str, Any] = {}
+        # Только уже поставленное: поток, который пишет без остановки, не задержит GUI
+        for _ in range(len(queue)):
+            key, value = queue.popleft()
+            if self._handlers[key][1]:
+                pending.setdefault(key, []).append(value)
+            else:
+                pending[key] = value
+        for key, value in pending.items():
+            self._handlers[key][0](value)
 
-class MacroRecorder:
-    """Класс для записи и воспроизведения макросов"""
-    
-    def __init__(self):
-        self.recording = False
-        self.playing = False
-        self.paused = False
-        self.events = []
-        self.start_time = 0
-        self.thread = None
+class CpsGraph(QWidget):
+    """
+    График скорости по каналам (КПС ЛКМ/ПКМ, события макроса) за последние
+    HISTORY секунд.
     
-    def start_recording(self):
-        """Начинает запись макроса"""
-        self.recording = True
-        self.events = []
-        self.start_time = time.time()
+    Таймер GUI-потока FPS раз в секунду читает счетчики (без блокировок,
+    поток кликера ничего не ждет) и пишет скорость в заранее выделенные
+    кольцевые массивы. Каждая колонка пикселей - корзина из bin_size
+    отсчетов, нарисованная отрезком от минимума до максимума. График
+    хранится в QPixmap: новая корзина сдвигает его на колонку и дорисовывает
+    одну колонку, поэтому кадр не зависит от частоты кликов и длины истории.
+    """
     
-    def stop_recording(self):
-        """Останавливает запись макроса"""
-        self.recording = False
+    FPS = 30
+    HISTORY = 30.0
+    # Скорость - по событиям за последнюю секунду
+    RATE_WINDOW = 1.0
+    CHANNELS = (("ЛКМ", QColor("#4CAF50")), ("ПКМ", QColor("#2196F3")), ("Макрос", QColor("#FF9800")))
+    # Верх шкалы - ближайшее значение не меньше пика
+    SCALES = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
     
-    def record_event(self, event_type: str, button: str = None, x: int = None, y: int = None):
-        """Записывает событие мыши"""
-        if self.recording:
-            timestamp = time.time() - self.start_time
-            self.events.append({
-                'type': event_type,
-                'button': button,
-                'x': x,
-                'y': y,
-                'timestamp': timestamp
-            })
+    def __init__(self, read_counters: Callable[[], Tuple[int, ...]], parent: Optional[QWidget] = None):
+        """
+        Args:
+            read_counters: Текущие значения счетчиков каналов (по порядку CHANNELS)
+            parent: Родительский виджет
+        """
+        super().__init__(parent)
+        self.read_counters = read_counters
+        self.capacity = int(self.FPS * self.HISTORY)
+        self.window = int(self.FPS * self.RATE_WINDOW)
+        # Время отсчета, накопленные события и скорость по каналам; позиция - count % capacity
+        self.times = array('d', [0.0]) * self.capacity
+        self.totals = [array('d', [0.0]) * self.capacity for _ in self.CHANNELS]
+        self.rates = [array('d', [0.0]) * self.capacity for _ in self.CHANNELS]
+        self.count = 0
+        self.last_counts = (0,) * len(self.CHANNELS)
+        self.running = [0] * len(self.CHANNELS)
+        
+        self.pixmap = QPixmap()
+        self.bin_size = 1
+        # Скользящий максимум видимых корзин: (корзина, пик) с убывающими пиками
+        self.peaks = deque()
+        # Верх шкалы; 0 - в истории одни нули, график - пустой фон
+        self.scale = 0
+        self.setMinimumHeight(110)
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(round(1000 / self.FPS))
+        self.timer.timeout.connect(self.sample)
     
-    def play_macro(self, repeat: bool = False):
-        """Воспроизводит записанный макрос"""
-        if not self.events:
+    def sample(self) -> None:
+        """Отсчет счетчиков (по таймеру)"""
+        now = time.perf_counter()
+        counts = tuple(self.read_counters())
+        pos = self.count % self.capacity
+        self.times[pos] = now
+        if not self.scale and counts == self.last_counts:
+            # Простой: событий нет ни сейчас, ни во всей истории - рисовать нечего
+            for channel in range(len(counts)):
+                self.totals[channel][pos] = self.running[channel]
+                self.rates[channel][pos] = 0.0
+            self.count += 1
             return
         
-        self.playing = True
-        self.paused = False
-        
-        def play_thread():
-            while self.playing and (repeat or not self.paused):
-                start_time = time.time()
-                for event in self.events:
-                    if not self.playing or self.paused:
-                        break
-                    
-                    # Ждем нужное время перед выполнением события
-                    while time.time() - start_time < event['timestamp']:
-                        if not self.playing or self.paused:
-                            break
-                        time.sleep(0.001)
-                    
-                    if not self.playing or self.paused:
-                        break
-                    
-                    # Выполняем событие
-                    if event['type'] == 'click':
-                        mouse.click(event['button'])
-                    elif event['type'] == 'press':
-                        mouse.press(event['button'])
-                    elif event['type'] == 'release':
-                        mouse.release(event['button'])
-                    elif event['type'] == 'move':
-                        mouse.move(event['x'], event['y'])
-                
-                if not repeat:
-                    break
-            
-            self.playing = False
-            self.paused = False
-        
-        self.thread = threading.Thread(target=play_thread)
-        self.thread.daemon = True
-        self.thread.start()
+        back = min(self.count, self.window)
+        old = (self.count - back) % self.capacity
+        span = now - self.times[old] if back else 0.0
+        for channel, value in enumerate(counts):
+            last = self.last_counts[channel]
+            # Кликеры пересоздаются при запуске движка - их счетчики начинаются с нуля
+            self.running[channel] += value - last if value >= last else value
+            self.totals[channel][pos] = self.running[channel]
+            self.rates[channel][pos] = (self.running[channel] - self.totals[channel][old]) / span if span > 0 else 0.0
+        self.last_counts = counts
+        self.count += 1
+        
+        # Шкала растет сразу, а уменьшается только на границе корзины
+        completed = self.count % self.bin_size == 0
+        if completed:
+            self._push_peak(self.count // self.bin_size - 1)
+        latest = max(rates[pos] for rates in self.rates)
+        if completed or latest > self.scale:
+            scale = self._scale_for(max(latest, self.peaks[0][1] if self.peaks else 0.0))
+            if scale != self.scale:
+                self.scale = scale
+                self.redraw()
+                return
+        if completed:
+            self.pixmap.scroll(-1, 0, self.pixmap.rect())
+            painter = QPainter(self.pixmap)
+            self._draw_column(painter, self.pixmap.width() - 1, self.count // self.bin_size - 1)
+            painter.end()
+            self.update()
+        else:
+            # Между колонками меняются только подписи
+            self.update(0, 0, self.width(), self.fontMetrics().height() + 4)
     
-    def pause_macro(self):
-        """Приостанавливает воспроизведение макроса"""
-        self.paused = True
+    def _scale_for(self, peak: float) -> int:
+        if peak <= 0:
+            return 0
+        return next((value for value in self.SCALES if value >= peak), self.SCALES[-1])
     
-    def resume_macro(self):
-        """Возобновляет воспроизведение макроса"""
-        self.paused = False
+    def _push_peak(self, index: int) -> None:
+        """Добавляет пик корзины index и убирает корзины, ушедшие за левый край"""
+        peak = 0.0
+        for channel in range(len(self.CHANNELS)):
+            values = self._bin_values(channel, index)
+            if values is not None:
+                peak = max(peak, max(values))
+        while self.peaks and self.peaks[-1][1] <= peak:
+            self.peaks.pop()
+        self.peaks.append((index, peak))
+        while self.peaks[0][0] <= index - max(1, self.pixmap.width()):
+            self.peaks.popleft()
     
-    def stop_macro(self):
-        """Останавливает воспроизведение макроса"""
-        self.playing = False
-        self.paused = False
+    def _bin_values(self, channel: int, index: int) -> Optional[List[float]]:
+        """Отсчеты корзины index, если они еще в кольцевом буфере"""
+        start = index * self.bin_size
+        if start < 0 or start < self.count - self.capacity:
+            return None
+        rates = self.rates[channel]
+        return [rates[i % self.capacity] for i in range(start, start + self.bin_size)]
+    
+    def _draw_column(self, painter: QPainter, x: int, index: int) -> None:
+        """Колонка x: фон и отрезки min..max корзины index (с концом предыдущей - без разрывов)"""
+        height = self.pixmap.height()
+        painter.fillRect(x, 0, 1, height, self.palette().color(QPalette.Base))
+        if not self.scale:
+            return
+        usable = height - 20
+        for channel, (_, color) in enumerate(self.CHANNELS):
+            values = self._bin_values(channel, index)
+            if values is None:
+                continue
+            previous = self._bin_values(channel, index - 1)
+            if previous is not None:
+                values.append(previous[-1])
+            low = height - 1 - min(values) / self.scale * usable
+            high = height - 1 - max(values) / self.scale * usable
+            painter.setPen(color)
+            painter.drawLine(QPointF(x, low), QPointF(x, high))
+    
+    def redraw(self) -> None:
+        """Полная перерисовка из кольцевого буфера (размер, шкала или тема сменились)"""
+        width = max(1, self.width())
+        if self.pixmap.size() != self.size():
+            self.pixmap = QPixmap(width, max(1, self.height()))
+        # Корзина - колонка: вся история помещается в ширину
+        self.bin_size = max(1, -(-self.capacity // width))
+        last = self.count // self.bin_size - 1
+        self.peaks.clear()
+        for index in range(last - width + 1, last + 1):
+            self._push_peak(index)
+        
+        painter = QPainter(self.pixmap)
+        for x in range(width):
+            self._draw_column(painter, x, last - (width - 1 - x))
+        painter.end()
+        self.update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.pixmap)
+        pos = (self.count - 1) % self.capacity
+        x = 6
+        metrics = painter.fontMetrics()
+        for channel, (name, color) in enumerate(self.CHANNELS):
+            text = f"{name}: {self.rates[channel][pos]:.0f}/с"
+            painter.setPen(color)
+            painter.drawText(x, metrics.ascent() + 2, text)
+            x += metrics.horizontalAdvance(text) + 14
+        if self.scale:
+            painter.setPen(self.palette().color(QPalette.Text))
+            label = f"макс. {self.scale}/с"
+            painter.drawText(self.width() - metrics.horizontalAdvance(label) - 6, metrics.ascent() + 2, label)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.redraw()
+        # Видимых корзин стало больше или меньше - шкала по новому окну
+        scale = self._scale_for(self.peaks[0][1] if self.peaks else 0.0)
+        if scale != self.scale:
+            self.scale = scale
+            self.redraw()
+    
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() in (QEvent.PaletteChange, QEvent.StyleChange):
+            self.redraw()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.timer.start()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        # Окно свернуто или скрыто - счетчики не опрашиваются
+        self.timer.stop()
 
 class BeautifulAutoClicker(QMainWindow):
+    # Файл в директории конфигураций изменился (испускается из потока слежения)
+    config_changed = pyqtSignal(str)
+    # Движок переключил профиль по горячей клавише (испускается из потока хука)
+    profile_switched = pyqtSignal(str)
+    # Действие горячей клавиши (испускается из потока хука, выполняется в GUI-потоке)
+    hotkey_action = pyqtSignal(object)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("DUHA5656 Autoclicker")
+        # Автосохранение включается в конце __init__, когда виджеты заполнены
+        self.autosave = False
         
         # Устанавливаем минимальный размер окна
         self.setMinimumSize(600, 500)
@@ -264,6 +1921,7 @@ class BeautifulAutoClicker(QMainWindow):
         title = QLabel("DUHA5656 AUTOCLICKER")
         title.setFont(QFont("Arial", 16, QFont.Bold))
         title.setAlignment(Qt.AlignCenter)
+        title.setObjectName("title")
         layout.addWidget(title)
         
         # Группа переключения темы
@@ -271,8 +1929,8 @@ class BeautifulAutoClicker(QMainWindow):
         theme_layout = QHBoxLayout(theme_group)
         
         self.theme_combo = QComboBox()
-        self.theme_combo.addItem("Фиолетово-чёрная", "purple")
-        self.theme_combo.addItem("Розово-белая", "pink")
+        for name, theme in THEME_DATA.items():
+            self.theme_combo.addItem(theme['title'], name)
         self.theme_combo.currentIndexChanged.connect(self.change_theme)
         theme_layout.addWidget(QLabel("Тема:"))
         theme_layout.addWidget(self.theme_combo)
@@ -395,6 +2053,19 @@ class BeautifulAutoClicker(QMainWindow):
         pause_record_layout.addWidget(self.pause_record_key)
         hotkey_layout.addLayout(pause_record_layout)
         
+        # Клавиша профиля: из любого профиля переключает на этот файл конфигурации
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Клавиша профиля:"))
+        self.profile_key = QComboBox()
+        self.profile_key.addItems(["", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9", "F10", "F11", "F12"])
+        profile_layout.addWidget(self.profile_key)
+        hotkey_layout.addLayout(profile_layout)
+        
+        # Режим удержания: кликает, только пока клавиша ЛКМ/ПКМ зажата
+        self.hold_mode = QCheckBox("Кликать только при удержании клавиши")
+        self.hold_mode.setToolTip("Клавиши ЛКМ/ПКМ (например, mouse4) включают кликер на время удержания")
+        hotkey_layout.addWidget(self.hold_mode)
+        
         # Оптимизация
         self.optimization = QCheckBox("Включить оптимизацию (меньше КПС, но стабильнее)")
         self.optimization.setChecked(True)
@@ -446,6 +2117,21 @@ class BeautifulAutoClicker(QMainWindow):
         macro_save_load_layout.addWidget(self.load_macro_btn)
         macro_layout.addLayout(macro_save_load_layout)
         
+        # Слоты макросов с горячими клавишами (макросы держатся в памяти)
+        self.macro_slot_files = []
+        self.macro_slot_keys = []
+        for i in range(MACRO_SLOT_COUNT):
+            slot_layout = QHBoxLayout()
+            slot_layout.addWidget(QLabel(f"Слот {i + 1}:"))
+            slot_file = QComboBox()
+            slot_layout.addWidget(slot_file, 1)
+            slot_key = QComboBox()
+            slot_key.addItems(["", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9", "F10", "F11", "F12"])
+            slot_layout.addWidget(slot_key)
+            macro_layout.addLayout(slot_layout)
+            self.macro_slot_files.append(slot_file)
+            self.macro_slot_keys.append(slot_key)
+        
         layout.addWidget(macro_group)
         
         # Кнопки управления конфигурациями
@@ -475,27 +2161,102 @@ class BeautifulAutoClicker(QMainWindow):
         
         layout.addLayout(button_layout)
         
+        # График скорости: КПС кликеров и события макроса за последние 30 секунд
+        graph_group = QGroupBox("Скорость")
+        graph_layout = QVBoxLayout(graph_group)
+        self.cps_graph = CpsGraph(self.read_rate_counters)
+        graph_layout.addWidget(self.cps_graph)
+        # Снятый флажок скрывает график - скрытый график не опрашивает счетчики
+        graph_group.setCheckable(True)
+        graph_group.toggled.connect(self.cps_graph.setVisible)
+        layout.addWidget(graph_group)
+        
+        # Роль задает цвета кнопки в таблице стилей темы
+        button_roles = {
+            self.save_config_btn: "accent", self.load_config_btn: "accent_alt",
+            self.start_btn: "success", self.play_macro_btn: "success",
+            self.stop_btn: "danger", self.record_start_btn: "danger",
+            self.record_stop_btn: "danger", self.stop_macro_btn: "danger",
+            self.pause_macro_btn: "warning",
+            self.save_macro_btn: "info", self.load_macro_btn: "info",
+        }
+        for button, role in button_roles.items():
+            button.setProperty("role", role)
+        
         # Статус
         self.status_label = QLabel("Готов к работе")
         self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setObjectName("status")
         layout.addWidget(self.status_label)
         
-        # Инициализация кликера
-        self.clicker_active = False
-        self.left_clicker = None
-        self.right_clicker = None
-        
-        # Хуки для записи мыши
-        self.mouse_hooks = []
-        
         # Инициализация менеджера конфигураций
         self.config_manager = ConfigManager()
         
         # Инициализация менеджера макросов
         self.macro_manager = MacroManager()
         
+        # Горячие клавиши можно вводить вручную: сочетания, последовательности, кнопки мыши
+        self.hotkey_combos = [
+            self.reset_key, self.lkm_key, self.pkm_key,
+            self.play_macro_key, self.pause_macro_key, self.stop_macro_key,
+            self.record_macro_key, self.stop_record_key, self.pause_record_key, self.profile_key,
+        ] + self.macro_slot_keys
+        for combo in self.hotkey_combos:
+            combo.setEditable(True)
+            # Список пунктов не меняется, поэтому индексы ниже можно посчитать один раз
+            combo.setInsertPolicy(QComboBox.NoInsert)
+            combo.setToolTip("F6, ctrl+shift+x, mouse4 или последовательность: ctrl+k, ctrl+c")
+        self.mouse_hook = None
+        
+        # Поле конфигурации -> (виджет, текст пункта -> индекс)
+        self.hotkey_widgets = {
+            field: (combo, self.combo_index(combo))
+            for field, combo in zip(ClickerConfig.HOTKEY_FIELDS, self.hotkey_combos)
+        }
+        self.slot_key_index = self.combo_index(self.macro_slot_keys[0])
+        self.theme_index = {self.theme_combo.itemData(i): i for i in range(self.theme_combo.count())}
+        self.slot_file_index: Dict[str, int] = {}
+        
+        # Журнал синтетических событий (чтобы не записывать свои же клики)
+        self.injection_log = InjectionLog()
+        
+        # Профили: все конфигурации загружаются заранее и переключаются по клавише
+        self.profiles = ProfileStore(self.config_manager, ClickerConfig.from_dict)
+        self.profiles.load_all()
+        self.profile_switched.connect(self.on_profile_switched)
+        
+        # Статус из любого потока: не больше 20 перерисовок в секунду
+        self.ui_updates = GuiUpdateQueue(parent=self)
+        self.ui_updates.register("status", self.status_label.setText)
+        
+        # Действия макросов меняют кнопки и показывают диалоги - только в GUI-потоке
+        self.hotkey_action.connect(lambda action: action())
+        actions = {
+            "play_macro_key": self.play_macro,
+            "pause_macro_key": self.pause_macro,
+            "stop_macro_key": self.stop_macro,
+            "record_macro_key": self.start_macro_recording,
+            "stop_record_key": self.stop_macro_recording,
+            "pause_record_key": self.toggle_macro_recording,
+        }
+        
+        # Движок кликера: получает готовую конфигурацию, виджеты не читает
+        self.engine = ClickerEngine(
+            actions={field: functools.partial(self.hotkey_action.emit, action)
+                     for field, action in actions.items()},
+            slot_action=self.play_macro_slot,
+            injection_log=self.injection_log,
+            on_status=self.set_status,
+            profiles=self.profiles,
+            on_profile=self.profile_switched.emit
+        )
+        
         # Инициализация макрорекордера
-        self.macro_recorder = MacroRecorder()
+        self.macro_recorder = MacroRecorder(self.injection_log)
+        # Файлы слотов, которые сейчас загружаются в фоне
+        self.slot_loads = set()
+        self.slot_loads_lock = threading.Lock()
+        self.refresh_macro_slots()
         
         # Применяем тему по умолчанию
         self.apply_theme("purple")
@@ -503,343 +2264,52 @@ class BeautifulAutoClicker(QMainWindow):
         # Загрузка конфигурации по умолчанию при запуске
         self.load_default_config()
         
+        # Горячая перезагрузка: изменения активного файла конфигурации применяются на лету
+        self.active_config = self.config_manager.default_filename
+        self.config_reload_timer = QTimer(self)
+        self.config_reload_timer.setSingleShot(True)
+        self.config_reload_timer.setInterval(100)
+        self.config_reload_timer.timeout.connect(self.reload_active_config)
+        self.config_changed.connect(self.on_config_file_changed)
+        self.config_manager.watch(self.config_changed.emit)
+        
         # Устанавливаем начальную геометрию окна (минимальный размер)
         self.setGeometry(100, 100, 600, 1000)
-    
-    def apply_theme(self, theme_name):
-        """Применяет выбранную тему оформления"""
-        self.current_theme = theme_name
         
-        if theme_name == "purple":
-            self.set_dark_purple_palette()
-        elif theme_name == "pink":
-            self.set_pink_white_palette()
-        
-        # Обновляем стили элементов
-        self.update_widget_styles()
-    
-    def set_dark_purple_palette(self):
-        """Устанавливает тёмно-фиолетовую цветовую палитру"""
-        dark_purple_palette = QPalette()
-        
-        # Основные цвета
-        dark_purple_palette.setColor(QPalette.Window, QColor(30, 27, 46))        # Основной фон
-        dark_purple_palette.setColor(QPalette.WindowText, QColor(224, 224, 224)) # Текст
-        dark_purple_palette.setColor(QPalette.Base, QColor(45, 43, 85))          # Фон полей ввода
-        dark_purple_palette.setColor(QPalette.AlternateBase, QColor(59, 48, 84)) # Альтернативный фон
-        dark_purple_palette.setColor(QPalette.ToolTipBase, QColor(187, 134, 252))# Подсказки
-        dark_purple_palette.setColor(QPalette.ToolTipText, QColor(0, 0, 0))      # Текст подсказок
-        dark_purple_palette.setColor(QPalette.Text, QColor(224, 224, 224))       # Основной текст
-        dark_purple_palette.setColor(QPalette.Button, QColor(59, 48, 84))        # Кнопки
-        dark_purple_palette.setColor(QPalette.ButtonText, QColor(224, 224, 224)) # Текст кнопок
-        dark_purple_palette.setColor(QPalette.BrightText, QColor(255, 255, 255)) # Яркий текст
-        dark_purple_palette.setColor(QPalette.Link, QColor(156, 39, 176))        # Ссылки
-        dark_purple_palette.setColor(QPalette.Highlight, QColor(123, 31, 162))   # Выделение
-        dark_purple_palette.setColor(QPalette.HighlightedText, QColor(255, 255, 255)) # Текст выделения
-        
-        QApplication.setPalette(dark_purple_palette)
-        
-        # Дополнительные стили для приложения
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1e1b2e;
-            }
-        """)
-    
-    def set_pink_white_palette(self):
-        """Устанавливает розово-белую цветовую палитру"""
-        pink_white_palette = QPalette()
-        
-        # Основные цвета
-        pink_white_palette.setColor(QPalette.Window, QColor(255, 240, 245))      # Основной фон
-        pink_white_palette.setColor(QPalette.WindowText, QColor(75, 0, 130))     # Текст
-        pink_white_palette.setColor(QPalette.Base, QColor(255, 255, 255))        # Фон полей ввода
-        pink_white_palette.setColor(QPalette.AlternateBase, QColor(255, 228, 225)) # Альтернативный фон
-        pink_white_palette.setColor(QPalette.ToolTipBase, QColor(255, 182, 193)) # Подсказки
-        pink_white_palette.setColor(QPalette.ToolTipText, QColor(0, 0, 0))       # Текст подсказок
-        pink_white_palette.setColor(QPalette.Text, QColor(75, 0, 130))           # Основной текст
-        pink_white_palette.setColor(QPalette.Button, QColor(255, 182, 193))      # Кнопки
-        pink_white_palette.setColor(QPalette.ButtonText, QColor(75, 0, 130))     # Текст кнопок
-        pink_white_palette.setColor(QPalette.BrightText, QColor(255, 20, 147))   # Яркий текст
-        pink_white_palette.setColor(QPalette.Link, QColor(199, 21, 133))         # Ссылки
-        pink_white_palette.setColor(QPalette.Highlight, QColor(255, 105, 180))   # Выделение
-        pink_white_palette.setColor(QPalette.HighlightedText, QColor(255, 255, 255)) # Текст выделения
-        
-        QApplication.setPalette(pink_white_palette)
-        
-        # Дополнительные стили для приложения
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #fff0f5;
-            }
-        """)
+        # Изменения настроек сохраняются в активный файл отложенно, в фоновом потоке
+        self.theme_combo.currentIndexChanged.connect(self.schedule_config_save)
+        for checkbox in (self.accel_checkbox, self.hold_mode, self.optimization):
+            checkbox.toggled.connect(self.schedule_config_save)
+        for spinbox in (self.start_interval, self.min_interval, self.base_interval):
+            spinbox.valueChanged.connect(self.schedule_config_save)
+        for combo in self.hotkey_combos + self.macro_slot_files:
+            combo.currentTextChanged.connect(self.schedule_config_save)
+        self.autosave = True
     
-    def update_widget_styles(self):
-        """Обновляет стили всех виджетов в соответствии с текущей темой"""
-        if self.current_theme == "purple":
-            self.apply_purple_styles()
-        elif self.current_theme == "pink":
-            self.apply_pink_styles()
+    def read_rate_counters(self) -> Tuple[int, int, int]:
+        """Счетчики для графика скорости: клики ЛКМ, ПКМ, события макроса"""
+        left, right = self.engine.click_counts()
+        return left, right, self.macro_recorder.events_played
     
-    def apply_purple_styles(self):
-        """Применяет стили для фиолетовой темы"""
-        # Заголовок
-        self.findChild(QLabel, None).setStyleSheet("color: #bb86fc; margin: 10px;")
-        
-        # Группы
-        group_style = """
-            QGroupBox { 
-                color: #bb86fc; 
-                font-weight: bold; 
-                border: 2px solid #7b1fa2;
-                border-radius: 8px;
-                margin-top: 10px;
-                padding-top: 15px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }
-        """
-        for group in self.findChildren(QGroupBox):
-            group.setStyleSheet(group_style)
-        
-        # Текстовые поля и выпадающие списки
-        input_style = """
-            QComboBox, QDoubleSpinBox, QTextEdit {
-                color: #e0e0e0;
-                background-color: #2d2b55;
-                border: 1px solid #7b1fa2;
-                border-radius: 4px;
-                padding: 5px;
-            }
-            QComboBox QAbstractItemView {
-                color: #e0e0e0;
-                background-color: #2d2b55;
-                selection-background-color: #7b1fa2;
-            }
-        """
-        for widget in self.findChildren((QComboBox, QDoubleSpinBox)):
-            widget.setStyleSheet(input_style)
-        
-        # Чекбоксы
-        checkbox_style = "color: #e0e0e0; spacing: 5px;"
-        for checkbox in self.findChildren(QCheckBox):
-            checkbox.setStyleSheet(checkbox_style)
-        
-        # Кнопки (без градиента)
-        button_style = """
-            QPushButton {
-                background-color: %s;
-                color: %s;
-                border: 2px solid %s;
-                padding: 8px;
-                font-weight: bold;
-                border-radius: 6px;
-                min-width: 100px;
-                font-size: 11px;
-            }
-            QPushButton:hover {
-                background-color: %s;
-                border-color: %s;
-            }
-            QPushButton:pressed {
-                background-color: %s;
-                border-color: %s;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-                color: #666666;
-                border-color: #999999;
-            }
+    def set_status(self, text: str):
+        """Показывает статус (из любого потока, через очередь обновлений)"""
+        self.ui_updates.post("status", text)
+    
+    def apply_theme(self, theme_name):
         """
+        Применяет выбранную тему оформления
         
-        # Применяем стили к кнопкам
-        self.save_config_btn.setStyleSheet(button_style % (
-            "#7b1fa2", "#ffffff", "#6a1b9a", 
-            "#9c27b0", "#9c27b0", "#6a1b9a", "#6a1b9a"
-        ))
-        self.load_config_btn.setStyleSheet(button_style % (
-            "#9c27b0", "#ffffff", "#7b1fa2",
-            "#bb86fc", "#bb86fc", "#7b1fa2", "#7b1fa2"
-        ))
-        self.start_btn.setStyleSheet(button_style % (
-            "#4CAF50", "#ffffff", "#45a049",
-            "#66BB6A", "#66BB6A", "#45a049", "#45a049"
-        ))
-        self.stop_btn.setStyleSheet(button_style % (
-            "#f44336", "#ffffff", "#d32f2f",
-            "#ef5350", "#ef5350", "#d32f2f", "#d32f2f"
-        ))
-        self.record_start_btn.setStyleSheet(button_style % (
-            "#f44336", "#ffffff", "#d32f2f",
-            "#ef5350", "#ef5350", "#d32f2f", "#d32f2f"
-        ))
-        self.record_stop_btn.setStyleSheet(button_style % (
-            "#f44336", "#ffffff", "#d32f2f",
-            "#ef5350", "#ef5350", "#d32f2f", "#d32f2f"
-        ))
-        self.play_macro_btn.setStyleSheet(button_style % (
-            "#4CAF50", "#ffffff", "#45a049",
-            "#66BB6A", "#66BB6A", "#45a049", "#45a049"
-        ))
-        self.pause_macro_btn.setStyleSheet(button_style % (
-            "#FF9800", "#ffffff", "#F57C00",
-            "#FFA726", "#FFA726", "#F57C00", "#F57C00"
-        ))
-        self.stop_macro_btn.setStyleSheet(button_style % (
-            "#f44336", "#ffffff", "#d32f2f",
-            "#ef5350", "#ef5350", "#d32f2f", "#d32f2f"
-        ))
-        self.save_macro_btn.setStyleSheet(button_style % (
-            "#2196F3", "#ffffff", "#1976D2",
-            "#42A5F5", "#42A5F5", "#1976D2", "#1976D2"
-        ))
-        self.load_macro_btn.setStyleSheet(button_style % (
-            "#2196F3", "#ffffff", "#1976D2",
-            "#42A5F5", "#42A5F5", "#1976D2", "#1976D2"
-        ))
-        
-        # Статус
-        self.status_label.setStyleSheet("""
-            color: #03dac6; 
-            font-weight: bold; 
-            padding: 8px;
-            background-color: #2d2b55;
-            border-radius: 6px;
-            border: 1px solid #7b1fa2;
-        """)
-    
-    def apply_pink_styles(self):
-        """Применяет стили для розовой темы"""
-        # Заголовок
-        self.findChild(QLabel, None).setStyleSheet("color: #ff69b4; margin: 10px;")
-        
-        # Группы
-        group_style = """
-            QGroupBox { 
-                color: #ff69b4; 
-                font-weight: bold; 
-                border: 2px solid #ffb6c1;
-                border-radius: 8px;
-                margin-top: 10px;
-                padding-top: 15px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }
-        """
-        for group in self.findChildren(QGroupBox):
-            group.setStyleSheet(group_style)
-        
-        # Текстовые поля и выпадающие списки
-        input_style = """
-            QComboBox, QDoubleSpinBox, QTextEdit {
-                color: #4b0082;
-                background-color: #ffffff;
-                border: 1px solid #ffb6c1;
-                border-radius: 4px;
-                padding: 5px;
-            }
-            QComboBox QAbstractItemView {
-                color: #4b0082;
-                background-color: #ffffff;
-                selection-background-color: #ffb6c1;
-            }
-        """
-        for widget in self.findChildren((QComboBox, QDoubleSpinBox)):
-            widget.setStyleSheet(input_style)
-        
-        # Чекбоксы
-        checkbox_style = "color: #4b0082; spacing: 5px;"
-        for checkbox in self.findChildren(QCheckBox):
-            checkbox.setStyleSheet(checkbox_style)
-        
-        # Кнопки (без градиента)
-        button_style = """
-            QPushButton {
-                background-color: %s;
-                color: %s;
-                border: 2px solid %s;
-                padding: 8px;
-                font-weight: bold;
-                border-radius: 6px;
-                min-width: 100px;
-                font-size: 11px;
-            }
-            QPushButton:hover {
-                background-color: %s;
-                border-color: %s;
-            }
-            QPushButton:pressed {
-                background-color: %s;
-                border-color: %s;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-                color: #666666;
-                border-color: #999999;
-            }
+        Палитра и таблица стилей темы собираются один раз (compile_theme) и
+        ставятся всему приложению одним вызовом, без обхода виджетов.
         """
-        
-        # Применяем стили к кнопкам
-        self.save_config_btn.setStyleSheet(button_style % (
-            "#ff69b4", "#ffffff", "#ff1493", 
-            "#ff85a2", "#ff85a2", "#ff1493", "#ff1493"
-        ))
-        self.load_config_btn.setStyleSheet(button_style % (
-            "#ff85a2", "#ffffff", "#ff69b4",
-            "#ffa7b6", "#ffa7b6", "#ff69b4", "#ff69b4"
-        ))
-        self.start_btn.setStyleSheet(button_style % (
-            "#66BB6A", "#ffffff", "#4CAF50",
-            "#81C784", "#81C784", "#4CAF50", "#4CAF50"
-        ))
-        self.stop_btn.setStyleSheet(button_style % (
-            "#ff6b6b", "#ffffff", "#ff4757",
-            "#ff8f8f", "#ff8f8f", "#ff4757", "#ff4757"
-        ))
-        self.record_start_btn.setStyleSheet(button_style % (
-            "#ff6b6b", "#ffffff", "#ff4757",
-            "#ff8f8f", "#ff8f8f", "#ff4757", "#ff4757"
-        ))
-        self.record_stop_btn.setStyleSheet(button_style % (
-            "#ff6b6b", "#ffffff", "#ff4757",
-            "#ff8f8f", "#ff8f8f", "#ff4757", "#ff4757"
-        ))
-        self.play_macro_btn.setStyleSheet(button_style % (
-            "#66BB6A", "#ffffff", "#4CAF50",
-            "#81C784", "#81C784", "#4CAF50", "#4CAF50"
-        ))
-        self.pause_macro_btn.setStyleSheet(button_style % (
-            "#FFA726", "#ffffff", "#FF9800",
-            "#FFB74D", "#FFB74D", "#FF9800", "#FF9800"
-        ))
-        self.stop_macro_btn.setStyleSheet(button_style % (
-            "#ff6b6b", "#ffffff", "#ff4757",
-            "#ff8f8f", "#ff8f8f", "#ff4757", "#ff4757"
-        ))
-        self.save_macro_btn.setStyleSheet(button_style % (
-            "#42A5F5", "#ffffff", "#2196F3",
-            "#64B5F6", "#64B5F6", "#2196F3", "#2196F3"
-        ))
-        self.load_macro_btn.setStyleSheet(button_style % (
-            "#42A5F5", "#ffffff", "#2196F3",
-            "#64B5F6", "#64B5F6", "#2196F3", "#2196F3"
-        ))
-        
-        # Статус
-        self.status_label.setStyleSheet("""
-            color: #ff1493; 
-            font-weight: bold; 
-            padding: 8px;
-            background-color: #ffffff;
-            border-radius: 6px;
-            border: 1px solid #ffb6c1;
-        """)
+        started = time.perf_counter()
+        stylesheet, palette = compile_theme(theme_name)
+        self.current_theme = theme_name
+        QApplication.setPalette(palette)
+        QApplication.instance().setStyleSheet(stylesheet)
+        logging.getLogger(__name__).debug(
+            f"Тема '{theme_name}' применена за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
     
     def change_theme(self):
         """Обработчик изменения темы"""
@@ -847,23 +2317,31 @@ class BeautifulAutoClicker(QMainWindow):
         if theme_data:
             self.apply_theme(theme_data)
     
+    @staticmethod
+    def combo_index(combo: QComboBox) -> Dict[str, int]:
+        """Текст пункта -> индекс (строится один раз на список пунктов)"""
+        return {combo.itemText(i): i for i in range(combo.count())}
+    
+    def config_from_widgets(self) -> ClickerConfig:
+        """
+        Снимает настройки с виджетов
+        
+        Raises:
+            ValueError: Некорректное значение (горячая клавиша, интервал, тема)
+        """
+        return ClickerConfig.from_dict(self.get_current_config())
+    
     def get_current_config(self) -> Dict[str, Any]:
         """Возвращает текущие настройки в виде словаря"""
-        return {
+        config = {field: combo.currentText() for field, (combo, _) in self.hotkey_widgets.items()}
+        config.update({
             "theme": self.current_theme,
             "acceleration": self.accel_checkbox.isChecked(),
             "start_interval": self.start_interval.value(),
             "min_interval": self.min_interval.value(),
             "base_interval": self.base_interval.value(),
-            "reset_key": self.reset_key.currentText(),
-            "lkm_key": self.lkm_key.currentText(),
-            "pkm_key": self.pkm_key.currentText(),
-            "play_macro_key": self.play_macro_key.currentText(),
-            "pause_macro_key": self.pause_macro_key.currentText(),
-            "stop_macro_key": self.stop_macro_key.currentText(),
-            "record_macro_key": self.record_macro_key.currentText(),
-            "stop_record_key": self.stop_record_key.currentText(),
-            "pause_record_key": self.pause_record_key.currentText(),
+            "macro_slots": self.get_macro_slots(),
+            "hold_mode": self.hold_mode.isChecked(),
             "optimization": self.optimization.isChecked(),
             "window_geometry": {
                 "x": self.x(),
@@ -871,82 +2349,101 @@ class BeautifulAutoClicker(QMainWindow):
                 "width": self.width(),
                 "height": self.height()
             }
-        }
+        })
+        return config
     
-    def apply_config(self, config_data: Dict[str, Any]) -> bool:
-        """Применяет настройки из словаря конфигурации"""
+    def apply_config(self, config: ClickerConfig, geometry: bool = True) -> None:
+        """Переносит проверенную конфигурацию в виджеты"""
+        # Конфигурация пришла из файла - записывать ее обратно незачем
+        autosave, self.autosave = self.autosave, False
         try:
-            # Тема оформления
-            theme = config_data.get("theme", "purple")
-            self.apply_theme(theme)
-            
-            # Устанавливаем выбранную тему в комбобокс
-            index = self.theme_combo.findData(theme)
-            if index >= 0:
-                self.theme_combo.setCurrentIndex(index)
-            
-            # Основные настройки
-            self.accel_checkbox.setChecked(config_data.get("acceleration", False))
-            self.start_interval.setValue(config_data.get("start_interval", 500))
-            self.min_interval.setValue(config_data.get("min_interval", 10))
-            self.base_interval.setValue(config_data.get("base_interval", 100))
-            
-            # Клавиши
-            reset_key = config_data.get("reset_key", "")
-            if reset_key in [self.reset_key.itemText(i) for i in range(self.reset_key.count())]:
-                self.reset_key.setCurrentText(reset_key)
-            
-            lkm_key = config_data.get("lkm_key", "F6")
-            if lkm_key in [self.lkm_key.itemText(i) for i in range(self.lkm_key.count())]:
-                self.lkm_key.setCurrentText(lkm_key)
-            
-            pkm_key = config_data.get("pkm_key", "F7")
-            if pkm_key in [self.pkm_key.itemText(i) for i in range(self.pkm_key.count())]:
-                self.pkm_key.setCurrentText(pkm_key)
-            
-            # Макрос клавиши
-            play_macro_key = config_data.get("play_macro_key", "")
-            if play_macro_key in [self.play_macro_key.itemText(i) for i in range(self.play_macro_key.count())]:
-                self.play_macro_key.setCurrentText(play_macro_key)
-            
-            pause_macro_key = config_data.get("pause_macro_key", "")
-            if pause_macro_key in [self.pause_macro_key.itemText(i) for i in range(self.pause_macro_key.count())]:
-                self.pause_macro_key.setCurrentText(pause_macro_key)
-            
-            stop_macro_key = config_data.get("stop_macro_key", "")
-            if stop_macro_key in [self.stop_macro_key.itemText(i) for i in range(self.stop_macro_key.count())]:
-                self.stop_macro_key.setCurrentText(stop_macro_key)
-            
-            # Клавиши записи макроса
-            record_macro_key = config_data.get("record_macro_key", "")
-            if record_macro_key in [self.record_macro_key.itemText(i) for i in range(self.record_macro_key.count())]:
-                self.record_macro_key.setCurrentText(record_macro_key)
-            
-            stop_record_key = config_data.get("stop_record_key", "")
-            if stop_record_key in [self.stop_record_key.itemText(i) for i in range(self.stop_record_key.count())]:
-                self.stop_record_key.setCurrentText(stop_record_key)
-            
-            pause_record_key = config_data.get("pause_record_key", "")
-            if pause_record_key in [self.pause_record_key.itemText(i) for i in range(self.pause_record_key.count())]:
-                self.pause_record_key.setCurrentText(pause_record_key)
-            
-            # Оптимизация
-            self.optimization.setChecked(config_data.get("optimization", True))
-            
-            # Геометрия окна (опционально)
-            geometry = config_data.get("window_geometry")
-            if geometry:
-                self.setGeometry(
-                    geometry.get("x", 100),
-                    geometry.get("y", 100),
-                    geometry.get("width", 600),
-                    geometry.get("height", 500)
-                )
-            
-            return True
-            
-        except Exception as e:
-            return False
+            self._apply_config(config, geometry)
+        finally:
+            self.autosave = autosave
+    
+    def _apply_config(self, config: ClickerConfig, geometry: bool) -> None:
+        if config.theme != self.current_theme:
+            self.apply_theme(config.theme)
+        self.theme_combo.setCurrentIndex(self.theme_index[config.theme])
+        
+        # Основные настройки
+        self.accel_checkbox.setChecked(config.acceleration)
+        self.start_interval.setValue(config.start_interval)
+        self.min_interval.setValue(config.min_interval)
+        self.base_interval.setValue(config.base_interval)
+        
+        # Клавиши
+        for field, (combo, index) in self.hotkey_widgets.items():
+            self.set_hotkey_text(combo, index, getattr(config, field))
+        
+        # Слоты макросов (файл, которого нет в списке, не меняет выбор)
+        for (macro, key), slot_file, slot_key in zip(config.macro_slots,
+                                                     self.macro_slot_files, self.macro_slot_keys):
+            if macro in self.slot_file_index:
+                slot_file.setCurrentIndex(self.slot_file_index[macro])
+            self.set_hotkey_text(slot_key, self.slot_key_index, key)
+        
+        self.hold_mode.setChecked(config.hold_mode)
+        
+        # Оптимизация
+        self.optimization.setChecked(config.optimization)
+        
+        # Геометрия окна (опционально)
+        if geometry and config.window_geometry:
+            self.setGeometry(*config.window_geometry)
+    
+    def set_hotkey_text(self, combo: QComboBox, index: Dict[str, int], value: str) -> None:
+        """Ставит горячую клавишу: пункт списка по индексу или свой текст"""
+        if value in index:
+            combo.setCurrentIndex(index[value])
+        else:
+            combo.setEditText(value)
+    
+    def schedule_config_save(self, *_):
+        """
+        Отложенное автосохранение сеанса (GUI-поток не ждет диск)
+        
+        Пишется только файл по умолчанию. Именованные профили меняются лишь
+        кнопкой сохранения; пока загружен такой профиль, в файл по умолчанию
+        уходит только положение окна.
+        """
+        if not self.autosave:
+            return
+        default = self.config_manager.default_filename
+        if self.active_config == default:
+            try:
+                config = self.config_from_widgets()
+            except ValueError:
+                return  # горячая клавиша еще не дописана
+        else:
+            session = self.profiles.get(default)
+            if session is None:
+                return
+            config_data = session.to_dict()
+            config_data["window_geometry"] = self.get_current_config()["window_geometry"]
+            config = ClickerConfig.from_dict(config_data)
+        self.update_profile(default, config)
+        self.config_manager.save_config_later(config.to_dict(), default)
+    
+    def update_profile(self, name: str, config: ClickerConfig):
+        """Свои записи слежение не сообщает - профиль в памяти обновляем сами"""
+        old = self.profiles.put(name, config)
+        if old is None or old.profile_key != config.profile_key:
+            self.engine.refresh_profiles()
+    
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.schedule_config_save()
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_config_save()
+    
+    def closeEvent(self, event):
+        """Дописывает отложенную конфигурацию перед выходом"""
+        self.config_manager.stop_watching()
+        self.config_manager.flush()
+        super().closeEvent(event)
     
     def save_config(self):
         """Сохраняет текущую конфигурацию в файл"""
@@ -966,6 +2463,11 @@ class BeautifulAutoClicker(QMainWindow):
                 
                 success = self.config_manager.save_config(config_data, Path(filename).name)
                 if success:
+                    self.active_config = Path(filename).name
+                    try:
+                        self.update_profile(self.active_config, ClickerConfig.from_dict(config_data))
+                    except ValueError:
+                        pass
                     QMessageBox.information(self, "Успех", "Конфигурация успешно сохранена!")
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось сохранить конфигурацию")
@@ -993,7 +2495,7 @@ class BeautifulAutoClicker(QMainWindow):
             if filename:
                 config_data = self.config_manager.load_config(Path(filename).name)
                 if config_data:
-                    if self.apply_config(config_data):
+                    if self.apply_config_live(config_data, Path(filename).name):
                         QMessageBox.information(self, "Успех", "Конфигурация успешно загружена!")
                     else:
                         QMessageBox.warning(self, "Ошибка", "Не удалось применить конфигурацию")
@@ -1003,136 +2505,133 @@ class BeautifulAutoClicker(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить конфигурацию: {str(e)}")
     
+    def on_config_file_changed(self, filename: str):
+        """Файл конфигурации изменен на диске; серия событий схлопывается таймером"""
+        if filename == self.active_config:
+            self.config_reload_timer.start()
+        else:
+            # Остальные файлы - профили: держим их копии в памяти актуальными
+            self.profiles.reload(filename)
+            self.engine.refresh_profiles()
+    
+    def reload_active_config(self):
+        """Перечитывает активный файл конфигурации и применяет изменения"""
+        config_data = self.config_manager.load_config(self.active_config)
+        # Недописанный или битый файл пропускаем: применится следующая версия
+        if config_data and self.apply_config_live(config_data):
+            self.set_status(f"Конфигурация обновлена: {self.active_config}")
+    
+    def apply_config_live(self, config_data: Dict[str, Any], name: Optional[str] = None) -> bool:
+        """
+        Применяет конфигурацию к интерфейсу и, если кликер запущен, - к движку
+        
+        Args:
+            config_data: Словарь конфигурации
+            name: Файл конфигурации; становится активным, только если
+                применение удалось (по умолчанию - текущий активный)
+        """
+        try:
+            config = ClickerConfig.from_dict(config_data)
+            error = config.engine_error()
+            if error:
+                raise ValueError(error)
+            if self.engine.active:
+                changed = self.engine.apply(config)
+                if "macro_slots" in changed:
+                    self.preload_slot_macros(config)
+                self.update_mouse_hook()
+        except ValueError as e:
+            self.set_status(f"Конфигурация не применена: {str(e)}")
+            return False
+        self.apply_config(config)
+        if name is not None:
+            self.active_config = name
+        self.update_profile(self.active_config, config)
+        return True
+    
+    def on_profile_switched(self, name: str):
+        """Движок уже работает с новым профилем; подтягиваем к нему интерфейс"""
+        config = self.profiles.get(name)
+        if config is None:
+            return
+        self.active_config = name
+        self.preload_slot_macros(config)
+        self.update_mouse_hook()
+        # Окно при переключении профиля остается на месте
+        self.apply_config(config, geometry=False)
+        self.set_status(f"Профиль: {Path(name).stem}")
+    
     def load_default_config(self):
         """Загружает конфигурацию по умолчанию при запуске"""
         config_data = self.config_manager.load_config()
         if config_data:
-            self.apply_config(config_data)
+            try:
+                self.apply_config(ClickerConfig.from_dict(config_data))
+            except ValueError as e:
+                self.set_status(f"Конфигурация не применена: {str(e)}")
     
     def start_clicker(self):
         try:
-            acceleration = self.accel_checkbox.isChecked()
-            base_interval = self.base_interval.value() / 1000
-            start_interval = self.start_interval.value() / 1000
-            min_interval = self.min_interval.value() / 1000
-            reset_key = self.reset_key.currentText()
-            lkm_key = self.lkm_key.currentText()
-            pkm_key = self.pkm_key.currentText()
-            optimization = self.optimization.isChecked()
-            
-            # Макрос горячие клавиши
-            play_macro_key = self.play_macro_key.currentText()
-            pause_macro_key = self.pause_macro_key.currentText()
-            stop_macro_key = self.stop_macro_key.currentText()
-            
-            # Горячие клавиши записи макроса
-            record_macro_key = self.record_macro_key.currentText()
-            stop_record_key = self.stop_record_key.currentText()
-            pause_record_key = self.pause_record_key.currentText()
-            
-            if acceleration and min_interval >= start_interval:
-                QMessageBox.warning(self, "Ошибка", "Конечный интервал должен быть меньше начального!")
+            try:
+                config = self.config_from_widgets()
+            except ValueError as e:
+                QMessageBox.warning(self, "Некорректные настройки", str(e))
                 return
             
-            if base_interval < 0.000001 or (acceleration and (start_interval < 0.000001 or min_interval < 0.000001)):
-                QMessageBox.warning(self, "Внимание", "Слишком маленькие значения интервалов могут привести к нестабильной работе!")
-            
-            self.left_clicker = Clicker(
-                button="left", 
-                acceleration=acceleration, 
-                base_interval=base_interval,
-                start_interval=start_interval,
-                min_interval=min_interval
-            )
-            self.right_clicker = Clicker(
-                button="right", 
-                acceleration=acceleration, 
-                base_interval=base_interval,
-                start_interval=start_interval,
-                min_interval=min_interval
-            )
-            
-            keyboard.add_hotkey(lkm_key, self.toggle_left_clicker)
-            keyboard.add_hotkey(pkm_key, self.toggle_right_clicker)
-            
-            if acceleration and reset_key:
-                keyboard.add_hotkey(reset_key, self.reset_acceleration)
-            
-            # Макрос горячие клавиши
-            if play_macro_key:
-                keyboard.add_hotkey(play_macro_key, self.play_macro)
-            if pause_macro_key:
-                keyboard.add_hotkey(pause_macro_key, self.pause_macro)
-            if stop_macro_key:
-                keyboard.add_hotkey(stop_macro_key, self.stop_macro)
+            error = config.engine_error()
+            if error:
+                QMessageBox.warning(self, "Ошибка", f"{error}!")
+                return
             
-            # Горячие клавиши записи макроса
-            if record_macro_key:
-                keyboard.add_hotkey(record_macro_key, self.start_macro_recording)
-            if stop_record_key:
-                keyboard.add_hotkey(stop_record_key, self.stop_macro_recording)
-            if pause_record_key:
-                keyboard.add_hotkey(pause_record_key, self.toggle_macro_recording)
+            try:
+                self.engine.start(config)
+            except ValueError as e:
+                QMessageBox.warning(self, "Некорректные настройки", str(e))
+                return
+            self.preload_slot_macros(config)
             
-            self.clicker_active = True
-            self.clicker_thread = threading.Thread(target=self.clicker_loop, args=(optimization,))
-            self.clicker_thread.daemon = True
-            self.clicker_thread.start()
+            keyboard.hook(self.keyboard_event)
+            self.update_mouse_hook()
             
             self.start_btn.setEnabled(False)
             self.stop_btn.setEnabled(True)
-            self.status_label.setText("Кликер активен")
+            self.set_status("Кликер активен")
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось запустить кликер: {str(e)}")
     
+    def preload_slot_macros(self, config: ClickerConfig):
+        """Слоты макросов: компилируем заранее, чтобы по клавише не читать файлы"""
+        self.macro_manager.preload_async([macro for macro, _ in config.macro_slots if macro])
+    
     def stop_clicker(self):
-        self.clicker_active = False
-        if hasattr(self, 'clicker_thread') and self.clicker_thread.is_alive():
-            self.clicker_thread
+        self.engine.stop()
         
         try:
             keyboard.unhook_all()
-        except:
-            pass
+        except Exception as e:
+            logging.warning(f"Не удалось снять хук клавиатуры: {e}")
+        self.update_mouse_hook()
         
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        self.status_label.setText("Кликер остановлен")
-    
-    def toggle_left_clicker(self):
-        if self.left_clicker:
-            self.left_clicker.active = not self.left_clicker.active
-            status = "ВКЛ" if self.left_clicker.active else "ВЫКЛ"
-            self.status_label.setText(f"ЛКМ {status}")
-    
-    def toggle_right_clicker(self):
-        if self.right_clicker:
-            self.right_clicker.active = not self.right_clicker.active
-            status = "ВКЛ" if self.right_clicker.active else "ВЫКЛ"
-            self.status_label.setText(f"ПКМ {status}")
-    
-    def reset_acceleration(self):
-        if self.left_clicker:
-            self.left_clicker.reset_interval()
-        if self.right_clicker:
-            self.right_clicker.reset_interval()
-        self.status_label.setText("Ускорение сброшено")
-    
-    def clicker_loop(self, optimization):
-        while self.clicker_active:
-            try:
-                if self.left_clicker and self.left_clicker.active:
-                    self.left_clicker.click()
-                if self.right_clicker and self.right_clicker.active:
-                    self.right_clicker.click()
-                
-                if optimization:
-                    time.sleep(0.001)
-                else:
-                    time.sleep(0.0001)
-            except:
-                break
+        self.set_status("Кликер остановлен")
+    
+    def keyboard_event(self, event):
+        """Хук клавиатуры: события идут в автомат горячих клавиш"""
+        matcher = self.engine.hotkey_matcher
+        if matcher is not None and event.name:
+            matcher.feed(normalize_key_name(event.name), event.event_type == keyboard.KEY_DOWN)
+    
+    def update_mouse_hook(self):
+        """Ставит хук мыши, только пока он нужен: запись макроса или триггеры на кнопках мыши"""
+        matcher = self.engine.hotkey_matcher
+        needed = self.macro_recorder.recording or (matcher is not None and matcher.uses_mouse)
+        if needed and self.mouse_hook is None:
+            self.mouse_hook = mouse.hook(self.mouse_callback)
+        elif not needed and self.mouse_hook is not None:
+            mouse.unhook(self.mouse_hook)
+            self.mouse_hook = None
     
     def start_macro_recording(self):
         """Начинает запись макроса"""
@@ -1141,15 +2640,11 @@ class BeautifulAutoClicker(QMainWindow):
                 return
                 
             self.macro_recorder.start_recording()
-            
-            # Устанавливаем хуки для записи мыши
-            self.mouse_hooks = [
-                mouse.hook(self.mouse_callback)
-            ]
+            self.update_mouse_hook()
             
             self.record_start_btn.setEnabled(False)
             self.record_stop_btn.setEnabled(True)
-            self.status_label.setText("Запись макроса...")
+            self.set_status("Запись макроса...")
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось начать запись: {str(e)}")
@@ -1161,15 +2656,11 @@ class BeautifulAutoClicker(QMainWindow):
                 return
                 
             self.macro_recorder.stop_recording()
-            
-            # Убираем хуки
-            for hook in self.mouse_hooks:
-                mouse.unhook(hook)
-            self.mouse_hooks = []
+            self.update_mouse_hook()
             
             self.record_start_btn.setEnabled(True)
             self.record_stop_btn.setEnabled(False)
-            self.status_label.setText("Запись завершена")
+            self.set_status("Запись завершена")
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось остановить запись: {str(e)}")
@@ -1182,22 +2673,78 @@ class BeautifulAutoClicker(QMainWindow):
             self.start_macro_recording()
     
     def mouse_callback(self, event):
-        """Callback для записи событий мыши"""
+        """Хук мыши: запись макроса и триггеры горячих клавиш на кнопках мыши"""
         if isinstance(event, mouse.ButtonEvent):
-            if event.event_type == 'down':
-                self.macro_recorder.record_event('press', event.button.name)
-            elif event.event_type == 'up':
-                self.macro_recorder.record_event('release', event.button.name)
+            if event.button not in MACRO_BUTTONS:
+                return
+            down = event.event_type in ('down', 'double')
+            # События, отправленные кликером или макросом, игнорируются
+            button_index = MACRO_BUTTONS.index(event.button)
+            if self.injection_log.consume(OP_PRESS if down else OP_RELEASE, button_index, 0, 0, event.time):
+                return
+            
+            matcher = self.engine.hotkey_matcher
+            if matcher is not None and matcher.uses_mouse:
+                matcher.feed(MOUSE_TRIGGER_NAMES[button_index], down)
+            self.macro_recorder.record_event('press' if down else 'release', event.button, event_time=event.time)
         elif isinstance(event, mouse.MoveEvent):
-            self.macro_recorder.record_event('move', x=event.x, y=event.y)
+            if self.injection_log.consume(OP_MOVE, -1, event.x, event.y, event.time):
+                return
+            self.macro_recorder.record_event('move', x=event.x, y=event.y, event_time=event.time)
         elif isinstance(event, mouse.WheelEvent):
             # Пропускаем события колесика для простоты
             pass
     
+    def get_macro_slots(self) -> List[Dict[str, str]]:
+        """Возвращает настройки слотов макросов"""
+        return [
+            {"macro": slot_file.currentText(), "key": slot_key.currentText()}
+            for slot_file, slot_key in zip(self.macro_slot_files, self.macro_slot_keys)
+        ]
+    
+    def refresh_macro_slots(self):
+        """Обновляет списки макросов в слотах, сохраняя выбор"""
+        macro_files = [""] + self.macro_manager.get_macro_list()
+        for slot_file in self.macro_slot_files:
+            current = slot_file.currentText()
+            slot_file.clear()
+            slot_file.addItems(macro_files)
+            if current in macro_files:
+                slot_file.setCurrentText(current)
+        self.slot_file_index = {name: i for i, name in enumerate(macro_files)}
+    
+    def play_macro_slot(self, filename: str):
+        """Запускает макрос слота из кэша (вызывается по горячей клавише)"""
+        program = self.macro_manager.cache.get(filename)
+        if program is None:
+            # Макрос вытеснен из кэша или еще не загружен - загружаем в фоне;
+            # повторные нажатия до конца загрузки не запускают вторую
+            with self.slot_loads_lock:
+                if filename in self.slot_loads:
+                    return
+                self.slot_loads.add(filename)
+            thread = threading.Thread(target=self._preload_and_play, args=(filename,))
+            thread.daemon = True
+            thread.start()
+            return
+        
+        self.macro_recorder.play_program(program)
+        self.set_status(f"Воспроизведение слота: {filename}")
+    
+    def _preload_and_play(self, filename: str):
+        """Медленный путь слота: загрузка с диска и запуск"""
+        try:
+            program = self.macro_manager.preload(filename)
+        finally:
+            with self.slot_loads_lock:
+                self.slot_loads.discard(filename)
+        if program is not None:
+            self.macro_recorder.play_program(program)
+    
     def play_macro(self):
         """Воспроизводит записанный макрос"""
         try:
-            if not self.macro_recorder.events:
+            if not self.macro_recorder.has_macro():
                 QMessageBox.warning(self, "Предупреждение", "Нет записанных событий для воспроизведения")
                 return
             
@@ -1206,7 +2753,7 @@ class BeautifulAutoClicker(QMainWindow):
             self.play_macro_btn.setEnabled(False)
             self.pause_macro_btn.setEnabled(True)
             self.stop_macro_btn.setEnabled(True)
-            self.status_label.setText("Воспроизведение макроса")
+            self.set_status("Воспроизведение макроса")
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось воспроизвести макрос: {str(e)}")
@@ -1216,11 +2763,11 @@ class BeautifulAutoClicker(QMainWindow):
         try:
             if self.macro_recorder.paused:
                 self.macro_recorder.resume_macro()
-                self.status_label.setText("Воспроизведение макроса")
+                self.set_status("Воспроизведение макроса")
                 self.pause_macro_btn.setText("⏸️ Пауза макроса")
             else:
                 self.macro_recorder.pause_macro()
-                self.status_label.setText("Макрос на паузе")
+                self.set_status("Макрос на паузе")
                 self.pause_macro_btn.setText("▶️ Возобновить")
             
         except Exception as e:
@@ -1235,7 +2782,7 @@ class BeautifulAutoClicker(QMainWindow):
             self.pause_macro_btn.setEnabled(False)
             self.stop_macro_btn.setEnabled(False)
             self.pause_macro_btn.setText("⏸️ Пауза макроса")
-            self.status_label.setText("Макрос остановлен")
+            self.set_status("Макрос остановлен")
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось остановить макрос: {str(e)}")
@@ -1243,7 +2790,7 @@ class BeautifulAutoClicker(QMainWindow):
     def save_macro(self):
         """Сохраняет макрос в файл"""
         try:
-            if not self.macro_recorder.events:
+            if not self.macro_recorder.has_macro():
                 QMessageBox.warning(self, "Предупреждение", "Нет записанных событий для сохранения")
                 return
             
@@ -1257,7 +2804,9 @@ class BeautifulAutoClicker(QMainWindow):
                 if not filename.endswith('.json'):
                     filename += '.json'
                 
-                if self.macro_manager.save_macro(self.macro_recorder.events, Path(filename).name):
+                if self.macro_manager.save_macro(self.macro_recorder.get_macro_data(), Path(filename).name):
+                    self.refresh_macro_slots()
+                    self.macro_manager.preload_async([slot["macro"] for slot in self.get_macro_slots() if slot["macro"]])
                     QMessageBox.information(self, "Успех", "Макрос успешно сохранен!")
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось сохранить макрос")
@@ -1275,9 +2824,13 @@ class BeautifulAutoClicker(QMainWindow):
             )
             
             if filename:
-                events = self.macro_manager.load_macro(Path(filename).name)
-                if events is not None:
-                    self.macro_recorder.events = events
+                macro = self.macro_manager.load_macro(Path(filename).name)
+                if macro is not None:
+                    try:
+                        self.macro_recorder.load(macro, self.macro_manager.load_macro)
+                    except (ValueError, KeyError, TypeError, AttributeError) as e:
+                        QMessageBox.warning(self, "Ошибка", f"Некорректный макрос: {str(e)}")
+                        return
                     QMessageBox.information(self, "Успех", "Макрос успешно загружен!")
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось загрузить макрос")
@@ -1286,20 +2839,42 @@ class BeautifulAutoClicker(QMainWindow):
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить макрос: {str(e)}")
 
 class Clicker:
-    def __init__(self, button, acceleration, base_interval, start_interval, min_interval):
+    def __init__(self, button, acceleration, base_interval, start_interval, min_interval, injection_log=None):
         self.button = button
+        self.button_index = MACRO_BUTTONS.index(button)
         self.acceleration = acceleration
         self.base_interval = base_interval
         self.start_interval = start_interval
         self.min_interval = min_interval
         self.current_interval = start_interval
         self.active = False
+        self.injection_log = injection_log
+        # Счетчик кликов для графика: пишет только поток кликера, читают без блокировок
+        self.clicks = 0
+        # Взводится при выключении: прерывает паузы клика без ожидания интервала
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def set_active(self, active: bool) -> None:
+        """Включает/выключает кликер; выключение сразу обрывает текущую паузу"""
+        self.active = active
+        if active:
+            self.idle.clear()
+        else:
+            self.idle.set()
 
     def click(self):
+        if not self.active:
+            return
+        if self.injection_log is not None:
+            self.injection_log.note(OP_PRESS, self.button_index)
         mouse.hold(button=self.button)
-        time.sleep(self.get_interval())
+        self.idle.wait(self.get_interval())
+        if self.injection_log is not None:
+            self.injection_log.note(OP_RELEASE, self.button_index)
         mouse.release(button=self.button)
-        time.sleep(self.get_interval())
+        self.clicks += 1
+        self.idle.wait(self.get_interval())
         self.update_interval()
 
     def get_interval(self):
@@ -1314,9 +2889,131 @@ class Clicker:
     def reset_interval(self):
         self.current_interval = self.start_interval
 
+    def reconfigure(self, acceleration, base_interval, start_interval, min_interval):
+        """Меняет интервалы на лету (поток кликера продолжает работу)"""
+        if acceleration and not self.acceleration:
+            self.current_interval = start_interval
+        self.acceleration = acceleration
+        self.base_interval = base_interval
+        self.start_interval = start_interval
+        self.min_interval = min_interval
+        self.current_interval = min(max(self.current_interval, min_interval), start_interval)
+
+def report_startup() -> None:
+    """Отметка готовности для benchmark_startup (monotonic общий для процессов)"""
+    print(f"STARTUP_READY {time.monotonic():.6f}", flush=True)
+
+def run_headless(probe: bool = False) -> int:
+    """
+    Кликер без окна: конфигурация и профили из config/, горячие клавиши
+    через хуки keyboard/mouse. Qt-приложение не создается.
+    
+    Args:
+        probe: Замер запуска - выйти сразу после готовности движка
+    
+    Returns:
+        int: Код выхода процесса
+    """
+    config_manager = ConfigManager()
+    profiles = ProfileStore(config_manager, ClickerConfig.from_dict)
+    profiles.load_all()
+    config = profiles.get(config_manager.default_filename) or ClickerConfig()
+    error = config.engine_error()
+    if error:
+        print(f"Конфигурация не применена: {error}")
+        return 1
+    
+    injection_log = InjectionLog()
+    engine = ClickerEngine(injection_log=injection_log, on_status=print, profiles=profiles)
+    try:
+        engine.start(config)
+    except ValueError as e:
+        print(f"Некорректная горячая клавиша: {str(e)}")
+        return 1
+    
+    def keyboard_event(event):
+        matcher = engine.hotkey_matcher
+        if matcher is not None and event.name:
+            matcher.feed(normalize_key_name(event.name), event.event_type == keyboard.KEY_DOWN)
+    
+    def mouse_event(event):
+        matcher = engine.hotkey_matcher
+        if matcher is None or not isinstance(event, mouse.ButtonEvent) or event.button not in MACRO_BUTTONS:
+            return
+        down = event.event_type in ('down', 'double')
+        button_index = MACRO_BUTTONS.index(event.button)
+        # Клики самого кликера не считаются нажатиями
+        if not injection_log.consume(OP_PRESS if down else OP_RELEASE, button_index, 0, 0, event.time):
+            matcher.feed(MOUSE_TRIGGER_NAMES[button_index], down)
+    
+    keyboard.hook(keyboard_event)
+    # Хук мыши - только если кнопки мыши есть среди клавиш хоть одного профиля
+    mouse_hook = None
+    if engine.hotkey_matcher.uses_mouse or any(
+            engine.build_matcher(profile).uses_mouse for profile in profiles.profiles.values()):
+        mouse_hook = mouse.hook(mouse_event)
+    
+    try:
+        if probe:
+            report_startup()
+            return 0
+        print(f"Кликер запущен без окна: {config_manager.default_filename}. Ctrl+C - выход")
+        while True:
+            time.sleep(1)  # Event.wait() на Windows не прерывается Ctrl+C
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        engine.stop()
+        keyboard.unhook_all()
+        if mouse_hook is not None:
+            mouse.unhook(mouse_hook)
+
+def benchmark_startup(runs: int = 5) -> int:
+    """
+    Замер запуска в отдельных процессах: до показанного окна и до
+    готового движка без окна. Медиана сравнивается с STARTUP_BUDGETS.
+    
+    Returns:
+        int: 0 если все медианы в бюджете, иначе 1
+    """
+    failed = False
+    for mode, budget in STARTUP_BUDGETS.items():
+        samples = []
+        for _ in range(runs):
+            start = time.monotonic()
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-probe", mode],
+                                    capture_output=True, text=True, timeout=60)
+            ready = [line.split()[1] for line in result.stdout.splitlines() if line.startswith("STARTUP_READY ")]
+            if not ready:
+                print(f"{mode}: процесс не дошел до готовности\n{result.stdout}{result.stderr}")
+                failed = True
+                break
+            samples.append(float(ready[0]) - start)
+        if not samples:
+            continue
+        samples.sort()
+        median = samples[len(samples) // 2]
+        print(f"{mode}: медиана {median * 1000:.0f} мс, мин {samples[0] * 1000:.0f} мс, "
+              f"макс {samples[-1] * 1000:.0f} мс, бюджет {budget * 1000:.0f} мс"
+              f"{'' if median <= budget else ' - ПРЕВЫШЕН'}")
+        failed |= median > budget
+    return 1 if failed else 0
+
 if __name__ == "__main__":
+    if "--benchmark-startup" in sys.argv:
+        sys.exit(benchmark_startup())
+    
+    probe = sys.argv[sys.argv.index("--startup-probe") + 1] if "--startup-probe" in sys.argv else None
+    if "--headless" in sys.argv or probe == "headless":
+        sys.exit(run_headless(probe is not None))
+    
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     window = BeautifulAutoClicker()
+    if probe == "gui":
+        # Замер не трогает конфигурацию пользователя: геометрия при показе не сохраняется
+        window.autosave = False
+        # Срабатывает в первой итерации цикла событий, когда окно уже показано
+        QTimer.singleShot(0, lambda: (report_startup(), window.close(), app.quit()))
     window.show()
     sys.exit(app.exec_())